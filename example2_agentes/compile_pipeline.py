@@ -1,5 +1,5 @@
 import kfp
-from pipeline import spade_ping_pong_embedded_pipeline
+from pipeline import spade_ping_pong_embedded_pipeline, spade_event_loop_benchmark_pipeline, spade_transport_benchmark_pipeline, spade_ping_pong_sweep_pipeline
 
 if __name__ == '__main__':
     print("Compilando pipeline SPADE Ping-Pong EMBEBIDO...")
@@ -10,3 +10,24 @@ if __name__ == '__main__':
     )
     
     print("Pipeline compilado exitosamente en: spade_ping_pong_pipeline.yaml")
+    
+    kfp.compiler.Compiler().compile(
+        pipeline_func=spade_event_loop_benchmark_pipeline,
+        package_path='spade_event_loop_benchmark_pipeline.yaml'
+    )
+    
+    print("Pipeline compilado exitosamente en: spade_event_loop_benchmark_pipeline.yaml")
+    
+    kfp.compiler.Compiler().compile(
+        pipeline_func=spade_transport_benchmark_pipeline,
+        package_path='spade_transport_benchmark_pipeline.yaml'
+    )
+    
+    print("Pipeline compilado exitosamente en: spade_transport_benchmark_pipeline.yaml")
+    
+    kfp.compiler.Compiler().compile(
+        pipeline_func=spade_ping_pong_sweep_pipeline,
+        package_path='spade_ping_pong_sweep_pipeline.yaml'
+    )
+    
+    print("Pipeline compilado exitosamente en: spade_ping_pong_sweep_pipeline.yaml")
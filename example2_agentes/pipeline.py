@@ -1,22 +1,65 @@
 from kfp import dsl
-from kfp.dsl import Output, Dataset
+from kfp.dsl import Output, Input, Dataset
+from typing import List
 
 @dsl.component(
     base_image='python:3.12',
-    packages_to_install=['spade==4.0.3', 'pyjabber>=0.1.9,<=0.2.4', 'slixmpp>=1.8.5,<=1.9.1']
+    packages_to_install=['spade==4.0.3', 'pyjabber>=0.1.9,<=0.2.4', 'slixmpp>=1.8.5,<=1.9.1', 'uvloop', 'msgpack', 'cbor2', 'pyarrow']
 )
 def spade_ping_pong_embedded_task(
     max_pings: int = 10,
     ping_interval: int = 2,
-    results_output: Output[Dataset] = None
+    resource_sample_interval: float = 1.0,
+    metrics_port: int = 0,
+    metrics_textfile: str = "",
+    loop_lag_interval: float = 0.1,
+    slow_callback_ms: int = 0,
+    event_loop: str = "asyncio",
+    num_pairs: int = 1,
+    num_shards: int = 1,
+    body_codec: str = "text",
+    payload_bytes: int = 0,
+    codec_benchmark_iterations: int = 0,
+    record_trace: bool = False,
+    transport: str = "container",
+    scenarios: str = "",
+    scenario_concurrency: int = 1,
+    agent_start_concurrency: int = 32,
+    profile: bool = False,
+    results_output: Output[Dataset] = None,
+    message_trace: Output[Dataset] = None,
+    results_record: Output[Dataset] = None,
+    results_table: Output[Dataset] = None,
+    profile_output: Output[Dataset] = None
 ) -> None:
     """
     Ejecuta un sistema multi-agente SPADE completo con código embebido
     
     Args:
         max_pings: Número máximo de mensajes ping a enviar
-        ping_interval: Intervalo en segundos entre mensajes ping (actualmente no usado)
+        ping_interval: Intervalo en segundos entre mensajes ping (0 envía a la máxima velocidad)
+        resource_sample_interval: Segundos entre muestras de /proc de cada proceso (0 desactiva el muestreo)
+        metrics_port: Puerto local donde servir /metrics en formato Prometheus (0 desactiva el servidor)
+        metrics_textfile: Ruta de un fichero .prom que se reescribe periódicamente (vacío desactiva)
+        loop_lag_interval: Periodo en segundos del latido que mide el retraso del event loop (0 desactiva)
+        slow_callback_ms: Umbral en ms para registrar callbacks lentos; activa el modo debug de asyncio (0 desactiva)
+        event_loop: Implementación del event loop: "asyncio" o "uvloop" (si no está instalado se usa asyncio)
+        num_pairs: Número de pares PingAgent/PongAgent independientes
+        num_shards: Procesos entre los que se reparten los pares, cada uno con su event loop (0 = según el límite de CPU)
+        body_codec: Formato del cuerpo de los mensajes: "text" (cadenas ping_N/pong_N), "json", "msgpack" o "cbor"
+        payload_bytes: Bytes de relleno añadidos al cuerpo de cada ping (0 sin relleno)
+        codec_benchmark_iterations: Iteraciones del benchmark de codecs frente a JSON (0 desactiva)
+        record_trace: Graba todos los mensajes (emisor, destinatario, metadata, tamaño e instante) en message_trace
+        transport: Ruta de los mensajes: "container" (entrega local de SPADE), "xmpp" (siempre por el servidor) o "memory" (colas asyncio, sin servidor)
+        scenarios: Lista JSON de escenarios que sobrescriben max_pings, ping_interval, num_pairs, body_codec y/o payload_bytes, ejecutados contra el mismo servidor (vacío ejecuta un único escenario)
+        scenario_concurrency: Escenarios ejecutados a la vez (1 = uno tras otro)
+        agent_start_concurrency: Agentes conectándose a la vez al arrancar, tras registrar todas las cuentas en lote (1 = uno tras otro)
+        profile: Muestrea las pilas de todos los hilos (y de los shards) con las tareas asyncio en curso
         results_output: Archivo de resultados JSON como artifact
+        message_trace: Traza binaria de mensajes, reproducible con trace_replay_path del test del servidor
+        results_record: Resultado con el esquema tipado común (RunRecord) en JSON
+        results_table: El mismo RunRecord como fila Parquet
+        profile_output: Pilas muestreadas en formato collapsed (flamegraph/speedscope), vacío sin profile
     """
     import asyncio
     import subprocess
@@ -26,6 +69,20 @@ def spade_ping_pong_embedded_task(
     import json
     import time
     import os
+    import threading
+    import logging
+    import math
+    import multiprocessing
+    import fcntl
+    import tempfile
+    import base64
+    import struct
+    import zlib
+    import hashlib
+    import uuid
+    import inspect
+    from dataclasses import dataclass, field, asdict
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
     from pathlib import Path
     from datetime import datetime
     
@@ -34,6 +91,48 @@ def spade_ping_pong_embedded_task(
     # =================================================================
     # CLASE PROCESS MANAGER (del orchestrator.py)
     # =================================================================
+    def shutdown_processes(processes, grace_period=5.0, kill_timeout=2.0):
+        """Apaga procesos hijos en paralelo con un único plazo global
+        
+        Envía SIGTERM a todos a la vez, espera a todos contra el mismo deadline y escala a
+        SIGKILL del grupo de procesos con los que sigan vivos: el tiempo total está acotado
+        por grace_period + kill_timeout sea cual sea el número de procesos.
+        """
+        def signal_group(process, signum):
+            try:
+                # Solo se señala el grupo si el hijo lo lidera (start_new_session=True);
+                # si comparte grupo con el componente, killpg lo mataría también a él
+                if os.getpgid(process.pid) == process.pid:
+                    os.killpg(process.pid, signum)
+                else:
+                    process.send_signal(signum)
+            except ProcessLookupError:
+                pass
+        
+        def wait_all(pending, timeout):
+            deadline = time.monotonic() + timeout
+            for process in pending:
+                try:
+                    process.wait(timeout=max(deadline - time.monotonic(), 0))
+                except subprocess.TimeoutExpired:
+                    pass
+            return [process for process in pending if process.poll() is None]
+        
+        running = [process for process in processes if process is not None and process.poll() is None]
+        if not running:
+            return
+        started = time.monotonic()
+        print(f"🔄 Terminando {len(running)} procesos: {[process.pid for process in running]}")
+        for process in running:
+            signal_group(process, signal.SIGTERM)
+        survivors = wait_all(running, grace_period)
+        if survivors:
+            print(f"⚠️ Procesos sin responder, forzando kill del grupo: {[process.pid for process in survivors]}")
+            for process in survivors:
+                signal_group(process, signal.SIGKILL)
+            wait_all(survivors, kill_timeout)
+        print(f"✅ {len(running)} procesos terminados en {time.monotonic() - started:.2f}s")
+    
     class ProcessManager:
         """Maneja procesos de manera segura con cleanup automático"""
         
@@ -58,209 +157,1534 @@ def spade_ping_pong_embedded_task(
         def cleanup(self):
             """Termina todos los procesos de manera limpia"""
             print("🧹 Iniciando cleanup de procesos...")
-            for process in self.processes:
-                if process.poll() is None:  # Proceso aún corriendo
-                    print(f"🔄 Terminando proceso PID: {process.pid}")
-                    process.terminate()
-                    try:
-                        process.wait(timeout=5)
-                        print(f"✅ Proceso terminado correctamente")
-                    except subprocess.TimeoutExpired:
-                        print(f"⚠️ Proceso no respondió, forzando kill...")
-                        process.kill()
-                        process.wait()
+            shutdown_processes(self.processes)
+    
+    # =================================================================
+    # MUESTREO DE RECURSOS (/proc/<pid>)
+    # =================================================================
+    class ResourceSampler:
+        """Muestrea en segundo plano el consumo de los procesos gestionados y del propio componente"""
+        
+        def __init__(self, get_processes, interval=1.0):
+            self.get_processes = get_processes
+            self.interval = interval
+            self.samples = []
+            self.clock_ticks = os.sysconf("SC_CLK_TCK")
+            self.tracked = {}
+            self._last_cpu = {}
+            self._start = None
+            self._stop_event = threading.Event()
+            self._thread = None
+        
+        def track(self, name, pid):
+            """Añade un PID que no es un subprocess.Popen (p. ej. un shard de multiprocessing)"""
+            self.tracked[pid] = name
+        
+        def read_proc(self, pid):
+            """Lee CPU, memoria, fds, hilos y cambios de contexto de /proc/<pid>"""
+            try:
+                with open(f"/proc/{pid}/stat") as f:
+                    # El nombre del proceso puede contener espacios: se parte tras el último ')'
+                    fields = f.read().rsplit(")", 1)[1].split()
+                status = {}
+                with open(f"/proc/{pid}/status") as f:
+                    for line in f:
+                        key, _, value = line.partition(":")
+                        status[key] = value.split()
+                num_fds = len(os.listdir(f"/proc/{pid}/fd"))
+            except (FileNotFoundError, ProcessLookupError, PermissionError):
+                return None
+            
+            return {
+                "cpu_ticks": int(fields[11]) + int(fields[12]),
+                "rss_kb": int(status.get("VmRSS", [0])[0]),
+                "num_fds": num_fds,
+                "num_threads": int(status.get("Threads", [0])[0]),
+                "voluntary_ctxt_switches": int(status.get("voluntary_ctxt_switches", [0])[0]),
+                "nonvoluntary_ctxt_switches": int(status.get("nonvoluntary_ctxt_switches", [0])[0])
+            }
+        
+        def sample_once(self):
+            """Toma una muestra de todos los procesos vivos"""
+            now = time.monotonic()
+            targets = [("component", os.getpid())]
+            for process in self.get_processes():
+                if process.poll() is None:
+                    name = " ".join(process.args) if isinstance(process.args, list) else str(process.args)
+                    targets.append((name, process.pid))
+            targets.extend((name, pid) for pid, name in self.tracked.items())
+            
+            for name, pid in targets:
+                data = self.read_proc(pid)
+                if data is None:
+                    continue
+                
+                cpu_ticks = data.pop("cpu_ticks")
+                cpu_percent = 0.0
+                if pid in self._last_cpu:
+                    last_ticks, last_time = self._last_cpu[pid]
+                    elapsed = now - last_time
+                    if elapsed > 0:
+                        cpu_percent = 100.0 * (cpu_ticks - last_ticks) / self.clock_ticks / elapsed
+                self._last_cpu[pid] = (cpu_ticks, now)
+                
+                self.samples.append({
+                    "elapsed_seconds": round(now - self._start, 3),
+                    "pid": pid,
+                    "name": name,
+                    "cpu_percent": round(cpu_percent, 2),
+                    **data
+                })
+        
+        def _run(self):
+            while not self._stop_event.is_set():
+                self.sample_once()
+                self._stop_event.wait(self.interval)
+        
+        def start(self):
+            """Arranca el hilo de muestreo (no hace nada si interval <= 0)"""
+            if self.interval <= 0:
+                return
+            self._start = time.monotonic()
+            self._thread = threading.Thread(target=self._run, name="resource-sampler", daemon=True)
+            self._thread.start()
+        
+        def stop(self):
+            """Detiene el muestreo tomando una última muestra"""
+            if self._thread is None:
+                return
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+            self.sample_once()
+        
+        def report(self):
+            """Serie temporal completa más un resumen por proceso"""
+            summary = {}
+            for sample in self.samples:
+                entry = summary.setdefault(f"{sample['name']} ({sample['pid']})", {
+                    "samples": 0, "max_cpu_percent": 0.0, "avg_cpu_percent": 0.0,
+                    "max_rss_kb": 0, "max_num_fds": 0, "max_num_threads": 0,
+                    "voluntary_ctxt_switches": 0, "nonvoluntary_ctxt_switches": 0
+                })
+                entry["samples"] += 1
+                entry["avg_cpu_percent"] += sample["cpu_percent"]
+                entry["max_cpu_percent"] = max(entry["max_cpu_percent"], sample["cpu_percent"])
+                entry["max_rss_kb"] = max(entry["max_rss_kb"], sample["rss_kb"])
+                entry["max_num_fds"] = max(entry["max_num_fds"], sample["num_fds"])
+                entry["max_num_threads"] = max(entry["max_num_threads"], sample["num_threads"])
+                # Los contadores de /proc son acumulados: la última muestra es el total
+                entry["voluntary_ctxt_switches"] = sample["voluntary_ctxt_switches"]
+                entry["nonvoluntary_ctxt_switches"] = sample["nonvoluntary_ctxt_switches"]
+            
+            for entry in summary.values():
+                entry["avg_cpu_percent"] = round(entry["avg_cpu_percent"] / entry["samples"], 2)
+            
+            return {
+                "interval_seconds": self.interval,
+                "summary": summary,
+                "series": self.samples
+            }
+    
+    # =================================================================
+    # MÉTRICAS EN FORMATO PROMETHEUS
+    # =================================================================
+    class AgentMetrics:
+        """Registro de métricas de agentes expuesto en formato de texto de Prometheus"""
+        
+        RTT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+        
+        DESCRIPTIONS = {
+            "spade_messages_sent_total": ("counter", "Mensajes enviados por agente"),
+            "spade_messages_received_total": ("counter", "Mensajes recibidos por agente"),
+            "spade_behaviour_iterations_total": ("counter", "Iteraciones de run() por behaviour"),
+            "spade_receive_timeouts_total": ("counter", "Llamadas a receive() que agotaron el timeout"),
+            "spade_xmpp_disconnects_total": ("counter", "Desconexiones del cliente XMPP"),
+            "spade_xmpp_reconnects_total": ("counter", "Sesiones XMPP reabiertas tras la conexión inicial"),
+            "spade_message_rtt_seconds": ("histogram", "Tiempo de ida y vuelta de los mensajes")
+        }
+        
+        def __init__(self):
+            self.lock = threading.Lock()
+            self.counters = {}
+            self.histograms = {}
+            self._http_server = None
+            self._writer_stop = threading.Event()
+            self._writer_thread = None
+        
+        def reset(self):
+            """Vacía todos los contadores e histogramas"""
+            with self.lock:
+                self.counters = {}
+                self.histograms = {}
+        
+        def snapshot(self):
+            """Copia serializable de las series (para enviarla entre procesos)"""
+            with self.lock:
+                return {
+                    "counters": dict(self.counters),
+                    "histograms": {key: (list(buckets), list(total)) for key, (buckets, total) in self.histograms.items()}
+                }
+        
+        def merge(self, snapshot):
+            """Suma a este registro las series de otro proceso"""
+            with self.lock:
+                for key, value in snapshot["counters"].items():
+                    self.counters[key] = self.counters.get(key, 0) + value
+                for key, (buckets, total) in snapshot["histograms"].items():
+                    own_buckets, own_total = self.histograms.setdefault(key, ([0] * len(self.RTT_BUCKETS), [0.0, 0]))
+                    for i, count in enumerate(buckets):
+                        own_buckets[i] += count
+                    own_total[0] += total[0]
+                    own_total[1] += total[1]
+        
+        def inc(self, name, amount=1, **labels):
+            """Incrementa un contador"""
+            key = (name, tuple(sorted(labels.items())))
+            with self.lock:
+                self.counters[key] = self.counters.get(key, 0) + amount
+        
+        def observe(self, name, value, **labels):
+            """Registra una observación en un histograma"""
+            key = (name, tuple(sorted(labels.items())))
+            with self.lock:
+                buckets, total = self.histograms.setdefault(key, ([0] * len(self.RTT_BUCKETS), [0.0, 0]))
+                for i, bound in enumerate(self.RTT_BUCKETS):
+                    if value <= bound:
+                        buckets[i] += 1
+                total[0] += value
+                total[1] += 1
+        
+        def render(self):
+            """Genera el texto de exposición de Prometheus"""
+            def fmt_labels(labels, extra=()):
+                items = list(labels) + list(extra)
+                if not items:
+                    return ""
+                return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+            
+            lines = []
+            with self.lock:
+                for name, (metric_type, description) in self.DESCRIPTIONS.items():
+                    series = self.histograms if metric_type == "histogram" else self.counters
+                    keys = sorted(key for key in series if key[0] == name)
+                    if not keys:
+                        continue
+                    lines.append(f"# HELP {name} {description}")
+                    lines.append(f"# TYPE {name} {metric_type}")
+                    for key in keys:
+                        labels = key[1]
+                        if metric_type == "histogram":
+                            buckets, (total_sum, total_count) = series[key]
+                            for bound, count in zip(self.RTT_BUCKETS, buckets):
+                                lines.append(f"{name}_bucket{fmt_labels(labels, [('le', bound)])} {count}")
+                            lines.append(f"{name}_bucket{fmt_labels(labels, [('le', '+Inf')])} {total_count}")
+                            lines.append(f"{name}_sum{fmt_labels(labels)} {total_sum}")
+                            lines.append(f"{name}_count{fmt_labels(labels)} {total_count}")
+                        else:
+                            lines.append(f"{name}{fmt_labels(labels)} {series[key]}")
+            return "\n".join(lines) + "\n"
+        
+        def write_textfile(self, path):
+            """Escribe las métricas de forma atómica (formato node_exporter textfile)"""
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write(self.render())
+            os.replace(tmp_path, path)
+        
+        def start(self, port=0, textfile="", textfile_interval=5.0):
+            """Arranca el endpoint HTTP y/o la escritura periódica del textfile"""
+            metrics = self
+            
+            if port:
+                class MetricsHandler(BaseHTTPRequestHandler):
+                    def do_GET(self):
+                        body = metrics.render().encode()
+                        self.send_response(200)
+                        self.send_header("Content-Type", "text/plain; version=0.0.4")
+                        self.send_header("Content-Length", str(len(body)))
+                        self.end_headers()
+                        self.wfile.write(body)
+                    
+                    def log_message(self, format, *args):
+                        pass
+                
+                self._http_server = ThreadingHTTPServer(("0.0.0.0", port), MetricsHandler)
+                threading.Thread(target=self._http_server.serve_forever, name="metrics-http", daemon=True).start()
+                print(f"📈 Métricas Prometheus en http://localhost:{port}/metrics")
+            
+            if textfile:
+                def writer():
+                    while not self._writer_stop.wait(textfile_interval):
+                        self.write_textfile(textfile)
+                
+                self._writer_thread = threading.Thread(target=writer, name="metrics-textfile", daemon=True)
+                self._writer_thread.start()
+                print(f"📈 Métricas Prometheus en fichero: {textfile}")
+        
+        def stop(self, textfile=""):
+            """Detiene el endpoint y deja escrito el estado final del textfile"""
+            if self._http_server:
+                self._http_server.shutdown()
+                self._http_server.server_close()
+                self._http_server = None
+            if self._writer_thread:
+                self._writer_stop.set()
+                self._writer_thread.join()
+                self._writer_thread = None
+            if textfile:
+                self.write_textfile(textfile)
+        
+        def track_xmpp_connection(self, agent):
+            """Cuenta desconexiones y sesiones reabiertas del cliente XMPP del agente"""
+            agent.client.add_event_handler(
+                "disconnected", lambda _: self.inc("spade_xmpp_disconnects_total", agent=agent.name)
+            )
+            # setup() se ejecuta tras la primera session_start: cualquier otra es una reconexión
+            agent.client.add_event_handler(
+                "session_start", lambda _: self.inc("spade_xmpp_reconnects_total", agent=agent.name)
+            )
+    
+    metrics = AgentMetrics()
+    
+    # =================================================================
+    # CODEC DE CUERPOS DE MENSAJE (json / msgpack / cbor)
+    # =================================================================
+    class BodyCodec:
+        """Serializa cuerpos estructurados etiquetando formato y esquema en la metadata del mensaje
+        
+        XMPP solo transporta texto: los formatos binarios viajan en base64 (implementado en C,
+        mucho más rápido que base85 aunque ocupe algo más).
+        """
+        
+        CONTENT_TYPES = {"json": "application/json", "msgpack": "application/msgpack", "cbor": "application/cbor"}
+        
+        def __init__(self, name):
+            self.formats = {
+                "json": (lambda data: json.dumps(data, separators=(",", ":")), json.loads)
+            }
+            try:
+                import msgpack
+                self.formats["msgpack"] = self.binary_format(
+                    msgpack.packb, lambda raw: msgpack.unpackb(raw, raw=False)
+                )
+            except ImportError:
+                pass
+            try:
+                import cbor2
+                self.formats["cbor"] = self.binary_format(cbor2.dumps, cbor2.loads)
+            except ImportError:
+                pass
+            
+            if name not in self.formats:
+                print(f"⚠️ Codec '{name}' no disponible, usando json")
+                name = "json"
+            self.name = name
+            self.dumps, self.loads = self.formats[name]
+            self.names_by_content_type = {value: key for key, value in self.CONTENT_TYPES.items()}
+        
+        @staticmethod
+        def binary_format(pack, unpack):
+            """Adapta un formato binario a cuerpos de texto (base64)"""
+            def dumps(data):
+                return base64.b64encode(pack(data)).decode("ascii")
+            
+            def loads(body):
+                # Message.body es un str: b64decode siempre copia a un bytes nuevo, no hay camino sin copias
+                return unpack(base64.b64decode(body))
+            
+            return dumps, loads
+        
+        def encode(self, msg, schema, data):
+            msg.set_metadata("content-type", self.CONTENT_TYPES[self.name])
+            msg.set_metadata("schema", schema)
+            msg.body = self.dumps(data)
+        
+        def decode(self, msg, schema=None):
+            """Decodifica según el content-type del mensaje (el emisor puede usar otro codec)"""
+            if schema is not None and msg.get_metadata("schema") != schema:
+                raise ValueError(f"Esquema inesperado: {msg.get_metadata('schema')} (se esperaba {schema})")
+            name = self.names_by_content_type.get(msg.get_metadata("content-type"), "json")
+            return self.formats[name][1](msg.body)
+    
+    def codec_for(name):
+        """Codec de los cuerpos de mensaje ("text" no usa ninguno)"""
+        return BodyCodec(name) if name != "text" else None
+    
+    codec = codec_for(body_codec)
+    
+    def benchmark_codecs(iterations):
+        """Tiempo de encode/decode y tamaño del cuerpo de cada codec disponible frente a JSON"""
+        payloads = {
+            "ping/v1": {"seq": 12345, "sent": 1718000000.123456},
+            "telemetry/v1": {
+                "agent": "vehicle_00042",
+                "status": "moving",
+                "speed": 42.5,
+                "battery": 0.87,
+                "route": [[39.4699 + i * 0.001, -0.3763 - i * 0.001] for i in range(50)]
+            }
+        }
+        benchmark = BodyCodec("json")
+        report = {}
+        for schema, data in payloads.items():
+            report[schema] = {}
+            for name, (dumps, loads) in benchmark.formats.items():
+                start = time.perf_counter()
+                for _ in range(iterations):
+                    body = dumps(data)
+                encode_us = (time.perf_counter() - start) / iterations * 1e6
+                
+                start = time.perf_counter()
+                for _ in range(iterations):
+                    loads(body)
+                decode_us = (time.perf_counter() - start) / iterations * 1e6
+                
+                report[schema][name] = {
+                    "encode_us": round(encode_us, 3),
+                    "decode_us": round(decode_us, 3),
+                    "body_bytes": len(body)
+                }
+            
+            baseline = report[schema]["json"]
+            for name, row in report[schema].items():
+                row["encode_vs_json"] = round(row["encode_us"] / baseline["encode_us"], 3)
+                row["decode_vs_json"] = round(row["decode_us"] / baseline["decode_us"], 3)
+                row["size_vs_json"] = round(row["body_bytes"] / baseline["body_bytes"], 3)
+        return {"iterations": iterations, "payloads": report}
+    
+    # =================================================================
+    # TRAZAS DE MENSAJES (grabación binaria reproducible)
+    # =================================================================
+    TRACE_MAGIC = b"SPTR"
+    TRACE_VERSION = 1
+    TRACE_SEND, TRACE_RECV = 0, 1
+    TRACE_HEADER = struct.Struct("<4sBdI")   # magic, versión, instante inicial (epoch), nº de eventos
+    TRACE_RECORD = struct.Struct("<dBIIIB")  # offset, tipo, emisor, destinatario, bytes del cuerpo, nº de metadatos
+    TRACE_PAIR = struct.Struct("<II")        # clave y valor de metadata (índices en la tabla de cadenas)
+    
+    class MessageTraceRecorder:
+        """Graba la secuencia exacta de mensajes: emisor, destinatario, metadata, tamaño del cuerpo e instante
+        
+        Los envíos se capturan envolviendo Container.send (cubre la entrega local y la XMPP)
+        y las recepciones en IndexedDispatchAgent.dispatch.
+        """
+        
+        def __init__(self, enabled):
+            self.enabled = enabled
+            self.events = []
+            self.container = None
+        
+        def reset(self):
+            self.events = []
+        
+        def record(self, kind, msg):
+            if self.enabled:
+                self.events.append((
+                    time.time(), kind,
+                    msg.sender.bare if msg.sender else "", msg.to.bare if msg.to else "",
+                    dict(msg.metadata), len(msg.body.encode("utf-8")) if msg.body else 0
+                ))
+        
+        def attach(self, container):
+            """Envuelve el envío del contenedor SPADE del proceso (una sola vez)"""
+            if not self.enabled or self.container is container:
+                return
+            self.container = container
+            send = container.send
+            
+            async def traced_send(msg, behaviour):
+                self.record(TRACE_SEND, msg)
+                await send(msg, behaviour)
+            
+            container.send = traced_send
+    
+    trace_recorder = MessageTraceRecorder(record_trace)
+    
+    def write_trace(path, events):
+        """Escribe la traza: cabecera y, comprimidos con zlib, la tabla de cadenas y los registros de tamaño fijo"""
+        events = sorted(events, key=lambda event: event[0])
+        start = events[0][0] if events else time.time()
+        strings = {}
+        
+        def intern(value):
+            return strings.setdefault(value, len(strings))
+        
+        records = bytearray()
+        for timestamp, kind, sender, recipient, metadata, body_size in events:
+            records += TRACE_RECORD.pack(
+                timestamp - start, kind, intern(sender), intern(recipient), body_size, len(metadata)
+            )
+            for key, value in metadata.items():
+                records += TRACE_PAIR.pack(intern(key), intern(str(value)))
+        
+        # JIDs y claves/valores de metadata se repiten en cada mensaje: se guardan una sola vez
+        table = bytearray(struct.pack("<I", len(strings)))
+        for value in strings:
+            encoded = value.encode("utf-8")
+            table += struct.pack("<H", len(encoded)) + encoded
+        
+        with open(path, "wb") as f:
+            f.write(TRACE_HEADER.pack(TRACE_MAGIC, TRACE_VERSION, start, len(events)))
+            f.write(zlib.compress(bytes(table + records), 6))
+        return os.path.getsize(path)
+    
+    # =================================================================
+    # ESQUEMA TIPADO DE RESULTADOS (JSON + Parquet)
+    # =================================================================
+    # Mismo esquema en ping-pong, test del servidor y SimFleet: una fila por ejecución
+    RESULTS_SCHEMA_VERSION = 1
+    
+    @dataclass(slots=True)
+    class RunRecord:
+        """Resultado de una ejecución con columnas comunes a todos los componentes
+        
+        Las métricas propias de cada componente van en `metrics` (nombre -> valor numérico).
+        latency_p50/p95_seconds usan siempre el percentil por rango más cercano (el menor
+        valor con al menos p% de las muestras <= él), sin interpolar.
+        """
+        component: str
+        started_at: str
+        finished_at: str
+        success: bool
+        duration_seconds: float | None
+        config: dict
+        config_hash: str
+        messages_sent: int | None = None
+        messages_received: int | None = None
+        throughput_msgs_per_second: float | None = None
+        latency_p50_seconds: float | None = None
+        latency_p95_seconds: float | None = None
+        peak_rss_kb: int | None = None
+        metrics: dict = field(default_factory=dict)
+        error: str | None = None
+        schema_version: int = RESULTS_SCHEMA_VERSION
+        run_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    
+    def config_fingerprint(config):
+        """Hash estable de la configuración para agrupar ejecuciones comparables"""
+        canonical = json.dumps(config, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+    
+    def write_run_record(record, json_path=None, parquet_path=None):
+        """Serializa el registro a JSON y, si pyarrow está instalado, a Parquet"""
+        data = asdict(record)
+        data["metrics"] = {key: float(value) for key, value in data["metrics"].items() if value is not None}
+        if json_path:
+            with open(json_path, "w") as f:
+                json.dump(data, f, indent=2, default=str)
+        if not parquet_path:
+            return
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            print("⚠️ pyarrow no está instalado, se omite el registro Parquet")
+            return
+        schema = pa.schema([
+            ("schema_version", pa.int32()),
+            ("run_id", pa.string()),
+            ("component", pa.string()),
+            ("started_at", pa.string()),
+            ("finished_at", pa.string()),
+            ("success", pa.bool_()),
+            ("duration_seconds", pa.float64()),
+            ("config", pa.string()),
+            ("config_hash", pa.string()),
+            ("messages_sent", pa.int64()),
+            ("messages_received", pa.int64()),
+            ("throughput_msgs_per_second", pa.float64()),
+            ("latency_p50_seconds", pa.float64()),
+            ("latency_p95_seconds", pa.float64()),
+            ("peak_rss_kb", pa.int64()),
+            ("metrics", pa.map_(pa.string(), pa.float64())),
+            ("error", pa.string())
+        ])
+        # La configuración es heterogénea: en Parquet viaja como JSON canónico
+        row = {**data, "config": json.dumps(data["config"], sort_keys=True, default=str)}
+        pq.write_table(pa.Table.from_pylist([row], schema=schema), parquet_path)
+    
+    # =================================================================
+    # INSTRUMENTACIÓN DEL EVENT LOOP
+    # =================================================================
+    def percentile(values, pct):
+        """Percentil por rango más cercano: el menor valor con al menos pct% de muestras <= él"""
+        if not values:
+            return None
+        ordered = sorted(values)
+        # ceil y no round: round() redondea .5 al par y p50 de [1..5] daba 2
+        index = min(len(ordered) - 1, max(0, math.ceil(pct * len(ordered) / 100) - 1))
+        return ordered[index]
+    
+    class LoopMonitor:
+        """Mide el retraso del event loop, la duración de run() por behaviour y los callbacks lentos"""
+        
+        def __init__(self, interval=0.1, slow_callback_ms=0):
+            self.interval = interval
+            self.slow_callback_ms = slow_callback_ms
+            self.lag_samples = []
+            self.behaviour_durations = {}
+            self.slow_callbacks = []
+            self._task = None
+            self._loop = None
+            
+            monitor = self
+            
+            class SlowCallbackHandler(logging.Handler):
+                def emit(self, record):
+                    # asyncio en modo debug avisa con "Executing <handle> took X seconds"
+                    if record.msg.startswith("Executing"):
+                        monitor.slow_callbacks.append(record.getMessage())
+            
+            self._handler = SlowCallbackHandler(level=logging.WARNING)
+        
+        def reset(self):
+            """Descarta las muestras acumuladas"""
+            self.lag_samples = []
+            self.behaviour_durations = {}
+            self.slow_callbacks = []
+            self._task = None
+        
+        async def _heartbeat(self):
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            while True:
+                expected = loop.time() + self.interval
+                await asyncio.sleep(self.interval)
+                lag = max(0.0, loop.time() - expected)
+                self.lag_samples.append((round(expected - start, 3), lag))
+        
+        def start(self):
+            """Arranca el latido y, si se pide, la detección de callbacks lentos"""
+            self._loop = asyncio.get_running_loop()
+            if self.slow_callback_ms > 0:
+                self._loop.set_debug(True)
+                self._loop.slow_callback_duration = self.slow_callback_ms / 1000
+                logging.getLogger("asyncio").addHandler(self._handler)
+            if self.interval > 0:
+                self._task = asyncio.create_task(self._heartbeat())
+        
+        async def stop(self):
+            """Detiene el latido y restaura la configuración del loop"""
+            if self._task:
+                self._task.cancel()
+                try:
+                    await self._task
+                except asyncio.CancelledError:
+                    pass
+                self._task = None
+            if self.slow_callback_ms > 0 and self._loop:
+                logging.getLogger("asyncio").removeHandler(self._handler)
+                self._loop.set_debug(False)
+        
+        def instrument(self, behaviour):
+            """Envuelve run() del behaviour para medir la duración de cada iteración"""
+            name = type(behaviour).__name__
+            durations = self.behaviour_durations.setdefault(name, [])
+            original_run = behaviour.run
+            
+            async def timed_run():
+                start = time.perf_counter()
+                try:
+                    await original_run()
+                finally:
+                    durations.append(time.perf_counter() - start)
+            
+            behaviour.run = timed_run
+            return behaviour
+        
+        def report(self):
+            """Estadísticas de retraso, duración por behaviour y callbacks lentos"""
+            lags = [lag for _, lag in self.lag_samples]
+            return {
+                "loop_lag": {
+                    "interval_seconds": self.interval,
+                    "samples": len(lags),
+                    "mean_seconds": sum(lags) / len(lags) if lags else None,
+                    "p50_seconds": percentile(lags, 50),
+                    "p95_seconds": percentile(lags, 95),
+                    "p99_seconds": percentile(lags, 99),
+                    "max_seconds": max(lags) if lags else None,
+                    "series": self.lag_samples
+                },
+                # Tiempo de pared de run(): incluye las esperas de receive()/sleep()
+                "behaviour_run_durations": {
+                    name: {
+                        "iterations": len(durations),
+                        "mean_seconds": sum(durations) / len(durations) if durations else None,
+                        "p95_seconds": percentile(durations, 95),
+                        "max_seconds": max(durations) if durations else None
+                    }
+                    for name, durations in self.behaviour_durations.items()
+                },
+                "slow_callbacks": {
+                    "threshold_ms": self.slow_callback_ms,
+                    "count": len(self.slow_callbacks),
+                    "examples": self.slow_callbacks[:50]
+                }
+            }
+    
+    loop_monitor = LoopMonitor(loop_lag_interval, slow_callback_ms)
+    
+    # =================================================================
+    # PERFILADO POR MUESTREO DE PILAS (flamegraph)
+    # =================================================================
+    class StackSampler:
+        """Perfilador por muestreo: cuenta las pilas de todos los hilos en formato collapsed
+        
+        Un hilo aparte lee sys._current_frames() cada `interval` segundos. En los hilos con
+        event loop registrado (watch_loop) se inserta el marco [task <nombre>] de la tarea
+        asyncio en ejecución delante de su primera corrutina. Es tiempo de pared; las muestras
+        de un hilo cuyo tiempo de CPU (/proc/self/task/<tid>) no avanzó desde la muestra
+        anterior terminan en el marco [off-cpu], así que time.sleep u otra llamada C
+        bloqueante no cuentan como CPU.
+        """
+        
+        OFF_CPU_FRAME = "[off-cpu]"
+        
+        # Hojas que solo esperan (selector del event loop, locks, hijos): siempre fuera de CPU
+        IDLE_FRAMES = {
+            "EpollSelector.select", "_PollLikeSelector.select", "KqueueSelector.select",
+            "SelectSelector.select", "Condition.wait", "Popen._wait"
+        }
+        
+        def __init__(self, enabled, interval=0.01):
+            self.enabled = enabled
+            self.interval = interval
+            self.counts = {}
+            self.loops = {}
+            self.duration = 0.0
+            self._labels = {}
+            self._cpu_times = {}
+            self._started = None
+            self._stop_event = threading.Event()
+            self._thread = None
+        
+        def reset(self):
+            """Descarta las muestras (el hilo de muestreo no sobrevive al fork)"""
+            self.counts = {}
+            self.loops = {}
+            self.duration = 0.0
+            self._cpu_times = {}
+            self._stop_event = threading.Event()
+            self._thread = None
+        
+        def watch_loop(self):
+            """Registra el event loop en marcha para etiquetar sus muestras con la tarea actual"""
+            if self.enabled:
+                self.loops[threading.get_ident()] = asyncio.get_running_loop()
+        
+        def frame_label(self, code):
+            label = self._labels.get(code)
+            if label is None:
+                filename = code.co_filename.rsplit("site-packages/", 1)[-1]
+                if filename.startswith("/"):
+                    filename = "/".join(filename.rsplit("/", 2)[-2:])
+                label = f"{code.co_qualname} ({filename}:{code.co_firstlineno})"
+                self._labels[code] = label
+            return label
+        
+        def task_label(self, thread_id):
+            loop = self.loops.get(thread_id)
+            task = asyncio.current_task(loop) if loop is not None else None
+            if task is None:
+                return None
+            name = task.get_name()
+            # Las tareas sin nombre (Task-N) se agrupan por su corrutina, p. ej. CyclicBehaviour._step
+            if name.startswith("Task-"):
+                name = getattr(task.get_coro(), "__qualname__", name)
+            return f"[task {name}]"
+        
+        def thread_cpu_time(self, native_id):
+            """Tiempo de CPU acumulado del hilo (ns de schedstat o ticks de stat), None sin /proc"""
+            try:
+                with open(f"/proc/self/task/{native_id}/schedstat") as f:
+                    return int(f.read().split()[0])
+            except (OSError, ValueError, IndexError):
+                pass
+            try:
+                with open(f"/proc/self/task/{native_id}/stat") as f:
+                    fields = f.read().rsplit(")", 1)[1].split()
+                return int(fields[11]) + int(fields[12])
+            except (OSError, ValueError, IndexError):
+                return None
+        
+        def on_cpu(self, native_id, leaf):
+            """En CPU si no está en una espera conocida y su tiempo de CPU avanzó desde la muestra anterior"""
+            current = self.thread_cpu_time(native_id) if native_id is not None else None
+            previous = self._cpu_times.get(native_id)
+            self._cpu_times[native_id] = current
+            if leaf.split(" (", 1)[0] in self.IDLE_FRAMES:
+                return False
+            # Sin /proc, o en la primera muestra del hilo, no hay con qué comparar
+            return current is None or previous is None or current > previous
+        
+        def sample_once(self):
+            threads = {thread.ident: thread for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == threading.get_ident():
+                    continue
+                codes = []
+                while frame is not None:
+                    codes.append(frame.f_code)
+                    frame = frame.f_back
+                
+                thread = threads.get(thread_id)
+                labels = [thread.name if thread else f"thread-{thread_id}"]
+                task = self.task_label(thread_id)
+                for code in reversed(codes):
+                    if task and code.co_flags & inspect.CO_COROUTINE:
+                        labels.append(task)
+                        task = None
+                    labels.append(self.frame_label(code))
+                if not self.on_cpu(thread.native_id if thread else None, labels[-1]):
+                    labels.append(self.OFF_CPU_FRAME)
+                stack = ";".join(labels)
+                self.counts[stack] = self.counts.get(stack, 0) + 1
+        
+        def _run(self):
+            while not self._stop_event.wait(self.interval):
+                self.sample_once()
+        
+        def start(self):
+            """Arranca el hilo de muestreo (no-op si el perfilado está desactivado)"""
+            if not self.enabled or self._thread is not None:
+                return
+            self._started = time.monotonic()
+            self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+            self._thread.start()
+        
+        def stop(self):
+            if self._thread is None:
+                return
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+            self.duration += time.monotonic() - self._started
+        
+        def merge(self, counts, prefix):
+            """Añade las pilas de otro proceso (un shard) bajo un marco raíz propio"""
+            for stack, count in counts.items():
+                key = f"{prefix};{stack}"
+                self.counts[key] = self.counts.get(key, 0) + count
+        
+        def write_collapsed(self, path):
+            """Una línea "marco;marco;... muestras" por pila: flamegraph.pl, speedscope o inferno"""
+            with open(path, "w") as f:
+                for stack, count in sorted(self.counts.items()):
+                    f.write(f"{stack} {count}\n")
+            return os.path.getsize(path)
+        
+        def summary(self, top=10):
+            """Marcos hoja y tareas con más muestras en CPU (cada tick cuenta una muestra por hilo)"""
+            total = sum(self.counts.values())
+            off_cpu = 0
+            leaves = {}
+            tasks = {}
+            for stack, count in self.counts.items():
+                frames = stack.split(";")
+                if frames[-1] == self.OFF_CPU_FRAME:
+                    off_cpu += count
+                    continue
+                leaves[frames[-1]] = leaves.get(frames[-1], 0) + count
+                task = next((frame for frame in frames if frame.startswith("[task ")), None)
+                if task:
+                    tasks[task] = tasks.get(task, 0) + count
+            
+            def ranking(counter):
+                return [
+                    {"frame": frame, "samples": count, "percent": round(100 * count / total, 2)}
+                    for frame, count in sorted(counter.items(), key=lambda item: -item[1])[:top]
+                ]
+            
+            return {
+                "enabled": self.enabled,
+                "interval_seconds": self.interval,
+                "duration_seconds": round(self.duration, 3),
+                "samples": total,
+                "stacks": len(self.counts),
+                "off_cpu_percent": round(100 * off_cpu / total, 2) if total else None,
+                "top_self": ranking(leaves),
+                "top_tasks": ranking(tasks)
+            }
+    
+    stack_sampler = StackSampler(profile)
     
     # =================================================================
     # FUNCIONES DE UTILIDAD (del orchestrator.py)
     # =================================================================
-    def find_available_port(start_port=5222):
-        """Encuentra un puerto disponible empezando desde start_port"""
-        for port in range(start_port, start_port + 100):
+    # Registro de puertos reservados de los componentes que comparten /tmp (el pod): las
+    # reservas de otros pods no se ven, pero tampoco comparten su espacio de puertos
+    PORT_REGISTRY = os.path.join(tempfile.gettempdir(), "kfp_spade_ports.json")
+    
+    def read_port_registry():
+        """Lee el registro descartando las reservas de procesos que ya no existen"""
+        try:
+            with open(PORT_REGISTRY) as f:
+                registry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+        alive = {}
+        for port, pid in registry.items():
             try:
-                with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                    s.bind(('localhost', port))
-                    return port
-            except OSError:
-                continue
-        raise Exception("No hay puertos disponibles")
+                os.kill(pid, 0)
+                alive[port] = pid
+            except ProcessLookupError:
+                pass
+            except PermissionError:
+                alive[port] = pid
+        return alive
+    
+    def write_port_registry(registry):
+        tmp_path = f"{PORT_REGISTRY}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(registry, f)
+        os.replace(tmp_path, PORT_REGISTRY)
+    
+    def allocate_ports(count=1):
+        """Reserva `count` puertos efímeros asignados por el SO (bind al puerto 0)
+        
+        El lock de fichero serializa la asignación entre procesos del pod y el registro evita
+        entregar un puerto que otro proceso ya reservó pero todavía no ha abierto. Los sockets
+        se cierran antes de que el servidor haga bind: quien lo arranca debe reintentar con
+        otros puertos si el bind falla (ver start_xmpp_server).
+        """
+        with open(f"{PORT_REGISTRY}.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            registry = read_port_registry()
+            ports = []
+            held = []
+            try:
+                while len(ports) < count:
+                    # Los sockets se mantienen abiertos hasta el final para no repetir puerto
+                    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                    held.append(s)
+                    s.bind(("0.0.0.0", 0))
+                    port = s.getsockname()[1]
+                    if str(port) not in registry:
+                        ports.append(port)
+            finally:
+                for s in held:
+                    s.close()
+            registry.update({str(port): os.getpid() for port in ports})
+            write_port_registry(registry)
+        return ports
     
-    async def wait_for_xmpp_server(port=5222, max_attempts=15):
-        """Espera hasta que el servidor XMPP esté disponible"""
+    def release_ports(ports):
+        """Libera los puertos reservados con allocate_ports"""
+        with open(f"{PORT_REGISTRY}.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            registry = read_port_registry()
+            for port in ports:
+                registry.pop(str(port), None)
+            write_port_registry(registry)
+    
+    async def wait_for_xmpp_server(port=5222, process=None, timeout=30.0, poll_interval=0.1):
+        """Espera hasta que el servidor XMPP acepte conexiones en el puerto
+        
+        Devuelve True en cuanto el puerto acepta una conexión y False si el proceso del
+        servidor termina antes o se agota el timeout.
+        """
         print(f"🔍 Verificando servidor XMPP en puerto {port}...")
+        deadline = time.monotonic() + timeout
         
-        for attempt in range(max_attempts):
+        while time.monotonic() < deadline:
+            if process is not None and process.poll() is not None:
+                return False
             try:
                 with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
                     s.settimeout(2)
-                    result = s.connect_ex(('localhost', port))
-                    if result == 0:
+                    if s.connect_ex(('localhost', port)) == 0:
                         print(f"✅ Servidor XMPP disponible en puerto {port}")
                         return True
-            except Exception as e:
+            except OSError:
                 pass
-            
-            print(f"⏳ Intento {attempt + 1}/{max_attempts}, esperando...")
-            await asyncio.sleep(2)
+            await asyncio.sleep(poll_interval)
         
         return False
     
-    async def start_xmpp_server(port, process_manager):
-        """Inicia el servidor XMPP usando spade run"""
-        print(f"📡 Iniciando servidor XMPP en puerto {port}...")
+    async def start_xmpp_server(process_manager, max_attempts=3, startup_timeout=30.0):
+        """Inicia el servidor XMPP usando spade run en puertos recién reservados
         
-        try:
-            # Usar spade run sin parámetros adicionales
-            cmd = ["spade", "run"]
+        Espera a que el puerto cliente acepte conexiones en lugar de un tiempo fijo.
+        allocate_ports cierra sus sockets antes de que spade run haga bind, así que otro
+        proceso puede quedarse el puerto entre medias. spade run termina enseguida si no
+        puede enlazarlo: entonces se liberan los puertos y se reintenta con otros nuevos.
+        Devuelve el proceso y los puertos [cliente, servidor-servidor] reservados.
+        """
+        for attempt in range(1, max_attempts + 1):
+            ports = allocate_ports(2)
+            port, server_port = ports
+            print(f"📡 Iniciando servidor XMPP en puerto {port} (intento {attempt}/{max_attempts})...")
+            
+            # Puertos cliente/servidor reservados y base de datos en memoria:
+            # varios servidores pueden convivir en el mismo pod sin compartir server.db
+            # --host localhost: el dominio del servidor debe coincidir con los JIDs @localhost
+            # para que enrute los mensajes que le llegan por XMPP (transport="xmpp")
+            cmd = [
+                "spade", "run",
+                "--host", "localhost",
+                "--client_port", str(port),
+                "--server_port", str(server_port),
+                "--memory"
+            ]
             
             print(f"🔧 Comando: {' '.join(cmd)}")
             
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
+            try:
+                # Grupo de procesos propio para que el cleanup pueda matar al servidor con sus hijos
+                process = subprocess.Popen(
+                    cmd,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    text=True,
+                    start_new_session=True
+                )
+            except Exception as e:
+                release_ports(ports)
+                print(f"❌ Error iniciando servidor XMPP: {e}")
+                raise
             
             print(f"🚀 Servidor XMPP iniciado (PID: {process.pid})")
             process_manager.add_process(process)
             
-            # Dar más tiempo para que el servidor arranque
-            await asyncio.sleep(8)
+            if await wait_for_xmpp_server(port, process, startup_timeout):
+                return process, ports
+            if process.poll() is None:
+                release_ports(ports)
+                raise RuntimeError(f"El servidor XMPP no aceptó conexiones en {startup_timeout}s")
             
-            return process
+            # Puerto ocupado entre la reserva y el bind (u otro fallo de arranque): otros puertos
+            output = " ".join(part.strip() for part in process.communicate() if part)
+            release_ports(ports)
+            print(f"⚠️ spade run terminó al arrancar (código {process.returncode}): {output[-300:]}")
         
-        except Exception as e:
-            print(f"❌ Error iniciando servidor XMPP: {e}")
-            raise
+        raise RuntimeError(f"No se pudo arrancar el servidor XMPP en {max_attempts} intentos")
     
     # =================================================================
     # AGENTES SPADE (del spade_ping_pong.py)
     # =================================================================
-    from spade.agent import Agent
+    from spade.agent import Agent, AuthenticationFailure
     from spade.behaviour import CyclicBehaviour
     from spade.message import Message
     from spade.template import Template
     
-    class PingAgent(Agent):
+    class XmppTransport:
+        """Envía siempre por el servidor XMPP, también entre agentes del mismo proceso"""
+        
+        def register(self, agent):
+            pass
+        
+        async def send(self, msg, behaviour):
+            await behaviour._xmpp_send(msg)
+    
+    class MemoryTransport:
+        """Transporte en memoria sin servidor XMPP: un buzón asyncio.Queue por JID
+        
+        Sustituye al contenedor de SPADE (Behaviour.send llama a agent.container.send) y
+        entrega con agent.dispatch, así que Template y receive(timeout) no cambian.
+        """
+        
+        def __init__(self):
+            self.mailboxes = {}
+        
+        def register(self, agent):
+            self.mailboxes[str(agent.jid)] = asyncio.Queue()
+        
+        async def send(self, msg, behaviour):
+            mailbox = self.mailboxes.get(str(msg.to))
+            if mailbox is None:
+                # Como el servidor XMPP con un JID desconocido: el mensaje se pierde
+                print(f"⚠️ Transporte en memoria: destinatario desconocido {msg.to}")
+                return
+            mailbox.put_nowait(msg)
+        
+        async def deliver(self, agent):
+            mailbox = self.mailboxes[str(agent.jid)]
+            while True:
+                agent.dispatch(await mailbox.get())
+    
+    transports = {"container": lambda: None, "xmpp": XmppTransport, "memory": MemoryTransport}
+    if transport not in transports:
+        raise ValueError(f"transport desconocido: {transport}")
+    # None: se mantiene el contenedor de SPADE (entrega local si el destinatario está en el proceso)
+    message_transport = transports[transport]()
+    
+    class PortAwareAgent(Agent):
+        """Agente que se conecta al puerto XMPP reservado para este componente"""
+        
+        def __init__(self, jid, password, xmpp_port=5222):
+            super().__init__(jid, password, port=xmpp_port)
+            if message_transport is not None:
+                self.set_container(message_transport)
+                message_transport.register(self)
+            self.delivery_task = None
+        
+        async def _async_connect(self):
+            if transport == "memory":
+                # Sin servidor: el agente solo atiende su buzón
+                self.delivery_task = asyncio.create_task(message_transport.deliver(self))
+                return
+            # slixmpp resuelve el host con su puerto por defecto (5222) aunque SPADE le pase otro
+            self.client.default_port = self.xmpp_port
+            await super()._async_connect()
+        
+        async def _async_stop(self):
+            if self.delivery_task is None:
+                return await super()._async_stop()
+            # Sin conexión que cerrar ni presencia que anunciar
+            for behaviour in self.behaviours:
+                behaviour.kill()
+            self.delivery_task.cancel()
+            self._alive.clear()
+    
+    class IndexedDispatchAgent(PortAwareAgent):
+        """Agente que reparte los mensajes con un índice por performative/conversation-id
+        
+        Agent.dispatch compara cada mensaje con el template de todos los behaviours;
+        aquí solo se evalúan los behaviours cuyo template puede coincidir.
+        """
+        
+        INDEX_KEYS = ("performative", "conversation-id")
+        # Logger de spade.agent: dispatch registra lo mismo que Agent.dispatch
+        dispatch_logger = logging.getLogger("spade.Agent")
+        
+        def __init__(self, jid, password, xmpp_port=5222):
+            super().__init__(jid, password, xmpp_port)
+            self.dispatch_index = {}
+            self.unindexed_behaviours = []
+            trace_recorder.attach(self.container)
+        
+        def index_key(self, template):
+            # Solo los Template simples se indexan; AND/OR/NOT y sin template van a la lista lineal
+            if type(template) is not Template:
+                return None
+            key = tuple(template.metadata.get(name) for name in self.INDEX_KEYS)
+            return key if any(value is not None for value in key) else None
+        
+        def add_behaviour(self, behaviour, template=None):
+            super().add_behaviour(behaviour, template)
+            key = self.index_key(template)
+            if key is None:
+                self.unindexed_behaviours.append(behaviour)
+            else:
+                self.dispatch_index.setdefault(key, []).append(behaviour)
+        
+        def remove_behaviour(self, behaviour):
+            super().remove_behaviour(behaviour)
+            for bucket in [self.unindexed_behaviours, *self.dispatch_index.values()]:
+                if behaviour in bucket:
+                    bucket.remove(behaviour)
+        
+        def dispatch(self, msg):
+            trace_recorder.record(TRACE_RECV, msg)
+            # Los mensajes de debug de Agent.dispatch, formateados solo si se van a emitir
+            debug = self.dispatch_logger.isEnabledFor(logging.DEBUG)
+            if debug:
+                self.dispatch_logger.debug(f"Got message: {msg}")
+            performative, conversation = (msg.get_metadata(name) for name in self.INDEX_KEYS)
+            candidates = list(self.unindexed_behaviours)
+            for key in {(performative, conversation), (performative, None), (None, conversation)}:
+                candidates.extend(self.dispatch_index.get(key, ()))
+            
+            # match() completo sobre los candidatos: el índice solo descarta, no decide
+            tasks = []
+            for behaviour in candidates:
+                if behaviour.match(msg):
+                    tasks.append(self.submit(behaviour.enqueue(msg)))
+                    if debug:
+                        self.dispatch_logger.debug(f"Message enqueued to behaviour: {behaviour}")
+                    self.traces.append(msg, category=str(behaviour))
+            if not tasks:
+                self.dispatch_logger.warning(f"No behaviour matched for message: {msg}")
+                self.traces.append(msg)
+            return tasks
+    
+    class PingAgent(IndexedDispatchAgent):
         """Agente que envía mensajes PING"""
         
-        def __init__(self, jid, password, max_pings=10):
-            super().__init__(jid, password)
+        def __init__(self, jid, password, max_pings=10, ping_interval=2, peer_jid="pong@localhost", xmpp_port=5222,
+                     message_codec=None, payload_bytes=0):
+            super().__init__(jid, password, xmpp_port)
+            self.peer_jid = peer_jid
+            self.codec = message_codec
+            self.padding = "x" * payload_bytes
             self.ping_count = 0
             self.max_pings = max_pings
+            self.ping_interval = ping_interval
             self.start_time = None
+            self.sent_at = {}
+            self.rtts = []
+            self.first_send = None
+            self.last_reply = None
+            # Se activa al recibir el eco del fin de flujo: todas las respuestas han llegado
+            self.done = asyncio.Event()
         
         class PingBehaviour(CyclicBehaviour):
             async def run(self):
+                metrics.inc("spade_behaviour_iterations_total", agent=self.agent.name, behaviour="PingBehaviour")
                 if self.agent.start_time is None:
                     self.agent.start_time = datetime.now()
                     print(f"🏓 PingAgent iniciado: {self.agent.start_time}")
                 
                 if self.agent.ping_count < self.agent.max_pings:
                     # Enviar PING
-                    msg = Message(to="pong@localhost")
+                    msg = Message(to=self.agent.peer_jid)
                     msg.set_metadata("performative", "inform")
-                    msg.body = f"ping_{self.agent.ping_count}"
+                    msg.set_metadata("ping-id", str(self.agent.ping_count))
+                    if self.agent.codec is None:
+                        msg.body = f"ping_{self.agent.ping_count}{self.agent.padding}"
+                    else:
+                        data = {"seq": self.agent.ping_count, "sent": time.time()}
+                        if self.agent.padding:
+                            data["pad"] = self.agent.padding
+                        self.agent.codec.encode(msg, "ping/v1", data)
                     
+                    self.agent.sent_at[str(self.agent.ping_count)] = time.monotonic()
+                    if self.agent.first_send is None:
+                        self.agent.first_send = self.agent.sent_at[str(self.agent.ping_count)]
                     await self.send(msg)
-                    print(f"📤 Ping enviado #{self.agent.ping_count}: {msg.body}")
+                    metrics.inc("spade_messages_sent_total", agent=self.agent.name)
+                    print(f"📤 Ping enviado #{self.agent.ping_count}: {msg.body if self.agent.codec is None and not self.agent.padding else f'{len(msg.body)} B'}")
                     self.agent.ping_count += 1
                     
-                    await asyncio.sleep(2)  # Esperar 2 segundos entre pings
+                    await asyncio.sleep(self.agent.ping_interval)  # Esperar entre pings
                 else:
+                    # Mensaje de control de fin de flujo: el PongAgent lo devuelve tras el último pong
+                    eos = Message(to=self.agent.peer_jid)
+                    eos.set_metadata("performative", "inform")
+                    eos.set_metadata("control", "end-of-stream")
+                    # Con cuerpo: el servidor XMPP no entrega mensajes vacíos (transport="xmpp")
+                    eos.body = "end-of-stream"
+                    await self.send(eos)
                     print(f"✅ PingAgent completado. Total pings: {self.agent.ping_count}")
-                    await self.agent.stop()
+                    self.kill()
+        
+        class ReplyBehaviour(CyclicBehaviour):
+            async def run(self):
+                metrics.inc("spade_behaviour_iterations_total", agent=self.agent.name, behaviour="ReplyBehaviour")
+                msg = await self.receive(timeout=30)
+                
+                if msg and msg.get_metadata("control") == "end-of-stream":
+                    # Los mensajes llegan en orden, así que no quedan respuestas pendientes
+                    self.agent.done.set()
+                    self.kill()
+                elif msg:
+                    metrics.inc("spade_messages_received_total", agent=self.agent.name)
+                    if self.agent.codec is not None:
+                        self.agent.codec.decode(msg, "pong/v1")
+                    sent_at = self.agent.sent_at.pop(msg.get_metadata("ping-id"), None)
+                    if sent_at is not None:
+                        self.agent.last_reply = time.monotonic()
+                        rtt = self.agent.last_reply - sent_at
+                        self.agent.rtts.append(rtt)
+                        metrics.observe("spade_message_rtt_seconds", rtt, agent=self.agent.name)
+                else:
+                    metrics.inc("spade_receive_timeouts_total", agent=self.agent.name, behaviour="ReplyBehaviour")
         
         async def setup(self):
             print("🏓 PingAgent configurado")
+            metrics.track_xmpp_connection(self)
             ping_behaviour = self.PingBehaviour()
-            self.add_behaviour(ping_behaviour)
+            self.add_behaviour(loop_monitor.instrument(ping_behaviour))
+            
+            # Las respuestas PONG llegan con la misma metadata que el PING original
+            template = Template()
+            template.set_metadata("performative", "inform")
+            self.add_behaviour(loop_monitor.instrument(self.ReplyBehaviour()), template)
     
-    class PongAgent(Agent):
+    class PongAgent(IndexedDispatchAgent):
         """Agente que responde mensajes PONG"""
         
-        def __init__(self, jid, password):
-            super().__init__(jid, password)
+        def __init__(self, jid, password, xmpp_port=5222, message_codec=None):
+            super().__init__(jid, password, xmpp_port)
+            self.codec = message_codec
             self.pong_count = 0
             self.responses = []
+            self.done = asyncio.Event()
         
         class PongBehaviour(CyclicBehaviour):
             async def run(self):
+                metrics.inc("spade_behaviour_iterations_total", agent=self.agent.name, behaviour="PongBehaviour")
                 # Esperar mensajes
                 msg = await self.receive(timeout=30)
                 
-                if msg:
-                    print(f"📥 Pong recibido: {msg.body}")
+                if msg and msg.get_metadata("control") == "end-of-stream":
+                    # Devolver el fin de flujo al PingAgent y terminar sin esperar al timeout
+                    reply = msg.make_reply()
+                    reply.body = msg.body
+                    await self.send(reply)
+                    print("🏁 PongAgent: fin de flujo recibido - terminando")
+                    self.agent.done.set()
+                    self.kill()
+                elif msg:
+                    metrics.inc("spade_messages_received_total", agent=self.agent.name)
+                    received = msg.body if self.agent.codec is None else self.agent.codec.decode(msg, "ping/v1")
+                    print(f"📥 Pong recibido: {received}")
                     
                     # Responder con PONG
                     reply = msg.make_reply()
-                    reply.body = f"pong_{self.agent.pong_count}"
+                    if self.agent.codec is None:
+                        sent = reply.body = f"pong_{self.agent.pong_count}"
+                    else:
+                        sent = {"seq": received["seq"], "pong": self.agent.pong_count}
+                        self.agent.codec.encode(reply, "pong/v1", sent)
                     await self.send(reply)
+                    metrics.inc("spade_messages_sent_total", agent=self.agent.name)
                     
                     # Guardar estadísticas
                     self.agent.responses.append({
-                        "received": msg.body,
-                        "sent": reply.body,
+                        "received": received,
+                        "sent": sent,
                         "timestamp": datetime.now().isoformat()
                     })
                     
-                    print(f"📤 Pong enviado #{self.agent.pong_count}: {reply.body}")
+                    print(f"📤 Pong enviado #{self.agent.pong_count}: {sent}")
                     self.agent.pong_count += 1
                 else:
                     # Timeout - probablemente PingAgent terminó
+                    metrics.inc("spade_receive_timeouts_total", agent=self.agent.name, behaviour="PongBehaviour")
                     print("⏰ PongAgent timeout - terminando")
-                    await self.agent.stop()
+                    self.agent.done.set()
+                    self.kill()
         
         async def setup(self):
             print("🏓 PongAgent configurado")
+            metrics.track_xmpp_connection(self)
             template = Template()
             template.set_metadata("performative", "inform")
             pong_behaviour = self.PongBehaviour()
-            self.add_behaviour(pong_behaviour, template)
+            self.add_behaviour(loop_monitor.instrument(pong_behaviour), template)
+    
+    # =================================================================
+    # ARRANQUE MASIVO DE AGENTES (registro en lote + arranque concurrente)
+    # =================================================================
+    async def register_accounts(accounts, xmpp_port, timeout=60.0):
+        """Registra todas las cuentas (jid, password) en una sola conexión XMPP
+        
+        pyjabber acepta varios IQ de registro (XEP-0077) en el mismo stream antes de la
+        autenticación: se envían todos a la vez y la conexión se autentica después con la
+        primera cuenta, en lugar de negociar TLS + registro en la conexión de cada agente.
+        """
+        from spade.xmpp_client import XMPPClient
+        from slixmpp.exceptions import IqError, IqTimeout
+        
+        outcome = {"registered": 0, "existing": 0, "failed": 0}
+        
+        async def register_one(client, jid, password):
+            iq = client.Iq()
+            iq["type"] = "set"
+            iq["register"]["username"] = jid.split("@")[0]
+            iq["register"]["password"] = password
+            try:
+                await iq.send(timeout=timeout)
+                outcome["registered"] += 1
+            except IqError as e:
+                # conflict: la cuenta ya existía (p. ej. un escenario anterior con los mismos JIDs)
+                outcome["existing" if e.condition == "conflict" else "failed"] += 1
+            except IqTimeout:
+                outcome["failed"] += 1
+        
+        class BulkRegistrationClient(XMPPClient):
+            async def register(self, event):
+                await asyncio.gather(*(register_one(self, jid, password) for jid, password in accounts))
+        
+        client = BulkRegistrationClient(accounts[0][0], accounts[0][1], False, True)
+        client.default_port = xmpp_port
+        # Conexión de un solo uso: sin pings de keepalive que puedan disparar una reconexión
+        client["xep_0199"].disable_keepalive()
+        finished = asyncio.Event()
+        for event in ("session_start", "failed_all_auth", "disconnected"):
+            client.add_event_handler(event, lambda _: finished.set())
+        client.connect()
+        try:
+            await asyncio.wait_for(finished.wait(), timeout)
+        except asyncio.TimeoutError:
+            print(f"⚠️ Registro en lote sin respuesta en {timeout}s")
+        if client.is_connected():
+            await client.disconnect()
+        else:
+            client.cancel_connection_attempt()
+        return outcome
+    
+    async def start_agents(agents, concurrency, auto_register=False):
+        """Arranca los agentes con como mucho `concurrency` conexiones en curso y devuelve la latencia de cada uno"""
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        latencies = {}
+        
+        async def start_one(agent):
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    await agent.start(auto_register=auto_register)
+                except AuthenticationFailure:
+                    # Cuenta que no entró en el lote: registro in-band en su propia conexión
+                    await agent.start(auto_register=True)
+                latencies[str(agent.jid)] = time.perf_counter() - started
+        
+        await asyncio.gather(*(start_one(agent) for agent in agents))
+        return latencies
+    
+    async def bootstrap_agents(groups, xmpp_port):
+        """Registra en lote las cuentas de todos los grupos y arranca cada grupo de forma concurrente, en orden
+        
+        Los grupos respetan dependencias de arranque (p. ej. PongAgent antes que PingAgent).
+        """
+        agents = [agent for group in groups for agent in group]
+        report = {"agents": len(agents), "concurrency": max(1, agent_start_concurrency), "registration_seconds": 0.0}
+        started = time.perf_counter()
+        # En memoria no hay servidor: no hay cuentas que registrar
+        if transport != "memory" and agents:
+            report["registration"] = await register_accounts(
+                [(str(agent.jid), agent.password) for agent in agents], xmpp_port
+            )
+            report["registration_seconds"] = time.perf_counter() - started
+        
+        latencies = {}
+        for group in groups:
+            latencies.update(await start_agents(group, agent_start_concurrency))
+        report["total_seconds"] = time.perf_counter() - started
+        report["latencies"] = latencies
+        print(f"⚡ {len(agents)} agentes arrancados en {report['total_seconds']:.2f}s "
+              f"(registro en lote {report['registration_seconds']:.2f}s, concurrencia {report['concurrency']})")
+        return report
+    
+    def summarize_startup(reports):
+        """Distribución de la latencia de arranque por agente de uno o varios arranques masivos"""
+        latencies = [seconds for report in reports for seconds in report["latencies"].values()]
+        registration = {"registered": 0, "existing": 0, "failed": 0}
+        for report in reports:
+            for key, value in report.get("registration", {}).items():
+                registration[key] += value
+        return {
+            "agents": len(latencies),
+            "concurrency": max(1, agent_start_concurrency),
+            "registration": registration,
+            "registration_seconds": max((report["registration_seconds"] for report in reports), default=None),
+            "total_seconds": max((report["total_seconds"] for report in reports), default=None),
+            "latency_p50_seconds": percentile(latencies, 50),
+            "latency_p95_seconds": percentile(latencies, 95),
+            "latency_max_seconds": max(latencies) if latencies else None
+        }
     
     # =================================================================
     # FUNCIÓN PRINCIPAL DEL SISTEMA PING-PONG
     # =================================================================
-    async def run_ping_pong_system(max_pings):
-        """Función principal que ejecuta el sistema ping-pong"""
+    async def wait_for_agents(agents, timeout):
+        """Espera a que todos los agentes activen su evento `done` y los detiene"""
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(agent.done.wait() for agent in agents)),
+                timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            pending = [str(agent.jid) for agent in agents if not agent.done.is_set()]
+            print(f"⚠️ Timeout de {timeout}s esperando a los agentes: {pending}")
         
-        print("🚀 Iniciando sistema Ping-Pong...")
+        await asyncio.gather(*(agent.stop() for agent in agents if agent.is_alive()))
+    
+    async def run_agent_pairs(max_pings, ping_interval, pair_ids, xmpp_port, jid_prefix="",
+                              message_codec=codec, payload_bytes=payload_bytes):
+        """Ejecuta los pares ping/pong indicados en el event loop actual y devuelve sus estadísticas"""
         
-        # Crear agentes
-        ping_agent = PingAgent("ping@localhost", "ping_password", max_pings)
-        pong_agent = PongAgent("pong@localhost", "pong_password")
+        # Crear agentes (con un único par se mantienen los JIDs originales; cada escenario lleva su prefijo)
+        pairs = []
+        for pair_id in pair_ids:
+            suffix = "" if num_pairs == 1 and not jid_prefix else f"_{pair_id}"
+            pong_agent = PongAgent(
+                f"{jid_prefix}pong{suffix}@localhost", "pong_password", xmpp_port=xmpp_port, message_codec=message_codec
+            )
+            ping_agent = PingAgent(
+                f"{jid_prefix}ping{suffix}@localhost", "ping_password", max_pings, ping_interval,
+                peer_jid=f"{jid_prefix}pong{suffix}@localhost", xmpp_port=xmpp_port,
+                message_codec=message_codec, payload_bytes=payload_bytes
+            )
+            pairs.append((pair_id, ping_agent, pong_agent))
         
-        # Iniciar agentes
-        await ping_agent.start()
-        await pong_agent.start()
+        # Iniciar agentes (PongAgent primero para no perder los primeros pings)
+        startup = await bootstrap_agents(
+            [[pong_agent for _, _, pong_agent in pairs], [ping_agent for _, ping_agent, _ in pairs]],
+            xmpp_port
+        )
         
-        print("✅ Agentes iniciados, comenzando intercambio...")
+        print(f"✅ {len(pairs)} par(es) de agentes iniciados, comenzando intercambio...")
         
-        # Esperar hasta que terminen
-        while ping_agent.is_alive() or pong_agent.is_alive():
-            await asyncio.sleep(1)
+        # Esperar a que cada par confirme el fin de flujo (margen: todos los pings + timeout de receive)
+        agents = [agent for _, ping_agent, pong_agent in pairs for agent in (ping_agent, pong_agent)]
+        await wait_for_agents(agents, timeout=max_pings * max(ping_interval, 1) + 60)
+        
+        return [
+            {
+                "pair_id": pair_id,
+                "ping_jid": str(ping_agent.jid),
+                "pong_jid": str(pong_agent.jid),
+                "start_time": ping_agent.start_time.isoformat() if ping_agent.start_time else None,
+                "pings_sent": ping_agent.ping_count,
+                "pongs_sent": pong_agent.pong_count,
+                "rtts": ping_agent.rtts,
+                # time.monotonic() es el mismo reloj en todos los procesos del nodo
+                "first_send": ping_agent.first_send,
+                "last_reply": ping_agent.last_reply,
+                "message_history": pong_agent.responses,
+                # El informe del arranque es común a los pares del lote: se agrega una sola vez
+                "startup": startup if index == 0 else None
+            }
+            for index, (pair_id, ping_agent, pong_agent) in enumerate(pairs)
+        ]
+    
+    def build_results(pair_stats):
+        """Agrega las estadísticas de todos los pares en el formato de resultados del sistema"""
+        total_pings = sum(pair["pings_sent"] for pair in pair_stats)
+        total_pongs = sum(pair["pongs_sent"] for pair in pair_stats)
+        rtts = [rtt for pair in pair_stats for rtt in pair["rtts"]]
+        start_times = [pair["start_time"] for pair in pair_stats if pair["start_time"]]
+        
+        # Ventana de intercambio: primer ping enviado → último pong recibido (en todos los pares)
+        exchange_seconds = None
+        first_sends = [pair["first_send"] for pair in pair_stats if pair["first_send"] is not None]
+        last_replies = [pair["last_reply"] for pair in pair_stats if pair["last_reply"] is not None]
+        if first_sends and last_replies:
+            exchange_seconds = max(last_replies) - min(first_sends)
         
-        # Recopilar resultados
         results = {
             "execution_summary": {
-                "start_time": ping_agent.start_time.isoformat() if ping_agent.start_time else None,
+                "start_time": min(start_times) if start_times else None,
                 "end_time": datetime.now().isoformat(),
-                "total_pings": ping_agent.ping_count,
-                "total_pongs": pong_agent.pong_count,
-                "success": ping_agent.ping_count == pong_agent.pong_count
+                "total_pings": total_pings,
+                "total_pongs": total_pongs,
+                "success": total_pings == total_pongs
             },
-            "message_history": pong_agent.responses,
+            "message_history": [entry for pair in pair_stats for entry in pair["message_history"]],
+            "agent_startup": summarize_startup([pair["startup"] for pair in pair_stats if pair.get("startup")]),
             "agent_statistics": {
                 "ping_agent": {
-                    "messages_sent": ping_agent.ping_count,
+                    "messages_sent": total_pings,
+                    "replies_received": len(rtts),
+                    "avg_rtt_seconds": sum(rtts) / len(rtts) if rtts else None,
+                    "max_rtt_seconds": max(rtts) if rtts else None,
+                    "p50_rtt_seconds": percentile(rtts, 50),
+                    "p95_rtt_seconds": percentile(rtts, 95),
+                    "exchange_seconds": exchange_seconds,
+                    "throughput_msgs_per_second": len(rtts) / exchange_seconds if exchange_seconds else None,
                     "status": "completed"
                 },
                 "pong_agent": {
-                    "messages_received": pong_agent.pong_count,
-                    "responses_sent": len(pong_agent.responses),
+                    "messages_received": total_pongs,
+                    "responses_sent": sum(len(pair["message_history"]) for pair in pair_stats),
                     "status": "completed"
                 }
-            }
+            },
+            "pairs": [
+                {
+                    "pair_id": pair["pair_id"],
+                    "ping_jid": pair["ping_jid"],
+                    "pong_jid": pair["pong_jid"],
+                    "pings_sent": pair["pings_sent"],
+                    "pongs_sent": pair["pongs_sent"],
+                    "replies_received": len(pair["rtts"])
+                }
+                for pair in pair_stats
+            ]
         }
         
         print(f"📊 Sistema completado:")
@@ -270,6 +1694,306 @@ def spade_ping_pong_embedded_task(
         
         return results
     
+    # =================================================================
+    # ESCENARIOS EN LOTE (un único servidor XMPP ya arrancado)
+    # =================================================================
+    SCENARIO_KEYS = ("max_pings", "ping_interval", "num_pairs", "body_codec", "payload_bytes")
+    BODY_CODECS = ("text",) + tuple(BodyCodec.CONTENT_TYPES)
+    
+    def parse_scenarios(text):
+        """Valida la lista JSON de escenarios y completa cada uno con los parámetros del componente"""
+        parsed = json.loads(text)
+        if not isinstance(parsed, list) or not all(isinstance(scenario, dict) for scenario in parsed):
+            raise ValueError("scenarios debe ser una lista JSON de objetos")
+        for scenario in parsed:
+            unknown = set(scenario) - set(SCENARIO_KEYS)
+            if unknown:
+                raise ValueError(f"Claves de escenario desconocidas: {sorted(unknown)} (válidas: {list(SCENARIO_KEYS)})")
+            if scenario.get("body_codec", body_codec) not in BODY_CODECS:
+                raise ValueError(f"body_codec desconocido: {scenario['body_codec']} (válidos: {list(BODY_CODECS)})")
+        return [
+            {
+                "max_pings": max_pings, "ping_interval": ping_interval, "num_pairs": num_pairs,
+                "body_codec": body_codec, "payload_bytes": payload_bytes, **scenario
+            }
+            for scenario in parsed
+        ]
+    
+    # Se valida antes de arrancar el servidor
+    scenario_configs = parse_scenarios(scenarios) if scenarios.strip() else []
+    
+    async def run_scenario(index, config, xmpp_port):
+        """Ejecuta un escenario con JIDs propios y devuelve su fila de la tabla y las estadísticas de sus pares"""
+        print(f"🧪 Escenario {index}: {config}")
+        started = time.monotonic()
+        scenario_codec = codec_for(config["body_codec"])
+        pair_stats = await run_agent_pairs(
+            config["max_pings"], config["ping_interval"], list(range(config["num_pairs"])),
+            xmpp_port, jid_prefix=f"s{index}_", message_codec=scenario_codec, payload_bytes=config["payload_bytes"]
+        )
+        scenario_results = build_results(pair_stats)
+        ping_stats = scenario_results["agent_statistics"]["ping_agent"]
+        expected = config["max_pings"] * config["num_pairs"]
+        
+        def rounded(value, digits):
+            return round(value, digits) if value is not None else None
+        
+        row = {
+            "scenario": index,
+            **config,
+            # Codec realmente usado (json si el pedido no está instalado)
+            "body_codec": scenario_codec.name if scenario_codec else "text",
+            "success": scenario_results["execution_summary"]["success"] and ping_stats["replies_received"] == expected,
+            "expected_pings": expected,
+            "pings_sent": scenario_results["execution_summary"]["total_pings"],
+            "pongs_sent": scenario_results["execution_summary"]["total_pongs"],
+            "replies_received": ping_stats["replies_received"],
+            "throughput_msgs_per_second": rounded(ping_stats["throughput_msgs_per_second"], 3),
+            "avg_rtt_seconds": rounded(ping_stats["avg_rtt_seconds"], 6),
+            "p50_rtt_seconds": rounded(ping_stats["p50_rtt_seconds"], 6),
+            "p95_rtt_seconds": rounded(ping_stats["p95_rtt_seconds"], 6),
+            "startup_p95_seconds": rounded(scenario_results["agent_startup"]["latency_p95_seconds"], 3),
+            "duration_seconds": round(time.monotonic() - started, 3)
+        }
+        return row, pair_stats
+    
+    async def run_scenarios(configs, xmpp_port):
+        """Ejecuta los escenarios contra el mismo servidor, hasta scenario_concurrency a la vez"""
+        print(f"🚀 Iniciando {len(configs)} escenarios (concurrencia {max(1, scenario_concurrency)})...")
+        semaphore = asyncio.Semaphore(max(1, scenario_concurrency))
+        
+        async def bounded(index, config):
+            async with semaphore:
+                return await run_scenario(index, config, xmpp_port)
+        
+        start_time = datetime.now().isoformat()
+        outcomes = await asyncio.gather(*(bounded(index, config) for index, config in enumerate(configs)))
+        rows = [row for row, _ in outcomes]
+        
+        # Agregado de todos los escenarios (RTT y arranque sobre la unión de pares)
+        results = build_results([pair for _, pair_stats in outcomes for pair in pair_stats])
+        
+        # El throughput se mide sobre la unión de las ventanas de intercambio de cada escenario,
+        # sin contar el arranque de agentes entre escenarios en serie
+        windows = []
+        for _, pair_stats in outcomes:
+            first_sends = [pair["first_send"] for pair in pair_stats if pair["first_send"] is not None]
+            last_replies = [pair["last_reply"] for pair in pair_stats if pair["last_reply"] is not None]
+            if first_sends and last_replies:
+                windows.append((min(first_sends), max(last_replies)))
+        exchange_seconds = 0.0
+        covered_until = None
+        for begin, end in sorted(windows):
+            if covered_until is not None:
+                begin = max(begin, covered_until)
+            exchange_seconds += max(0.0, end - begin)
+            covered_until = end if covered_until is None else max(covered_until, end)
+        ping_stats = results["agent_statistics"]["ping_agent"]
+        ping_stats["exchange_seconds"] = exchange_seconds or None
+        ping_stats["throughput_msgs_per_second"] = ping_stats["replies_received"] / exchange_seconds if exchange_seconds else None
+        results.update({
+            "execution_summary": {
+                "start_time": start_time,
+                "end_time": datetime.now().isoformat(),
+                "total_pings": sum(row["pings_sent"] for row in rows),
+                "total_pongs": sum(row["pongs_sent"] for row in rows),
+                "expected_pings": sum(row["expected_pings"] for row in rows),
+                "success": all(row["success"] for row in rows)
+            },
+            "scenarios": rows
+        })
+        return results
+    
+    async def run_ping_pong_system(max_pings, ping_interval, xmpp_port):
+        """Función principal que ejecuta el sistema ping-pong en un único event loop"""
+        
+        print("🚀 Iniciando sistema Ping-Pong...")
+        
+        pair_stats = await run_agent_pairs(max_pings, ping_interval, list(range(num_pairs)), xmpp_port)
+        return build_results(pair_stats)
+    
+    # =================================================================
+    # MODO SHARDED: UN PROCESO (Y UN EVENT LOOP) POR SHARD
+    # =================================================================
+    def detect_cpu_limit():
+        """CPUs disponibles según el límite del cgroup (set_cpu_limit) o la afinidad del proceso"""
+        try:
+            # cgroup v2: "<quota> <period>" o "max <period>"
+            with open("/sys/fs/cgroup/cpu.max") as f:
+                quota, period = f.read().split()
+            if quota != "max":
+                return max(1, math.ceil(int(quota) / int(period)))
+        except (FileNotFoundError, ValueError):
+            pass
+        try:
+            # cgroup v1
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+                quota = int(f.read())
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                period = int(f.read())
+            if quota > 0:
+                return max(1, math.ceil(quota / period))
+        except (FileNotFoundError, ValueError):
+            pass
+        return len(os.sched_getaffinity(0))
+    
+    def shard_worker(shard_id, conn):
+        """Proceso hijo: espera la orden del padre y ejecuta sus pares en un event loop propio
+        
+        Se crea con fork antes de que el componente arranque hilos o su event loop, así que el
+        puerto XMPP llega después con la orden ("run", ...); ("stop", None) termina sin ejecutar.
+        """
+        # El hijo no debe ejecutar el cleanup del padre (mataría el servidor XMPP)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        
+        try:
+            command, payload = conn.recv()
+        except EOFError:
+            return
+        if command != "run":
+            return
+        pair_ids, max_pings, ping_interval, xmpp_port = payload
+        
+        # Métricas e instrumentación propias del shard (la copia del fork trae las del padre)
+        metrics.reset()
+        loop_monitor.reset()
+        trace_recorder.reset()
+        stack_sampler.reset()
+        
+        async def shard_main():
+            loop_monitor.start()
+            stack_sampler.watch_loop()
+            try:
+                return await run_agent_pairs(max_pings, ping_interval, pair_ids, xmpp_port)
+            finally:
+                await loop_monitor.stop()
+        
+        try:
+            stack_sampler.start()
+            pair_stats = run_with_event_loop(shard_main, event_loop)
+            stack_sampler.stop()
+            conn.send({
+                "shard_id": shard_id,
+                "pid": os.getpid(),
+                "pair_ids": pair_ids,
+                "pair_stats": pair_stats,
+                "event_loop": loop_monitor.report(),
+                "metrics": metrics.snapshot(),
+                "trace": trace_recorder.events,
+                "profile": stack_sampler.counts
+            })
+        except Exception as e:
+            conn.send({"shard_id": shard_id, "pid": os.getpid(), "pair_ids": pair_ids, "error": str(e)})
+    
+    def start_shard_workers(count):
+        """Arranca los procesos de los shards con fork antes de que el componente cree ningún hilo
+        
+        Un fork con los hilos de muestreo, /metrics o el executor en marcha puede copiar
+        locks tomados por esos hilos (stdout, logging, malloc) y bloquear al hijo.
+        """
+        context = multiprocessing.get_context("fork")
+        workers = []
+        for shard_id in range(count):
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(
+                target=shard_worker, args=(shard_id, child_conn), name=f"spade-shard-{shard_id}", daemon=True
+            )
+            process.start()
+            child_conn.close()
+            workers.append((process, parent_conn))
+        return workers
+    
+    def stop_shard_workers(workers, grace_period=5.0, kill_timeout=2.0):
+        """Libera los shards que siguen esperando orden y espera a todos bajo un único plazo"""
+        for _, conn in workers:
+            try:
+                conn.send(("stop", None))
+            except OSError:
+                pass
+        join_deadline = time.monotonic() + grace_period
+        for process, _ in workers:
+            process.join(timeout=max(join_deadline - time.monotonic(), 0))
+        for process, _ in workers:
+            if process.is_alive():
+                process.terminate()
+        join_deadline = time.monotonic() + kill_timeout
+        for process, _ in workers:
+            process.join(timeout=max(join_deadline - time.monotonic(), 0))
+    
+    def run_shards(max_pings, ping_interval, shards, xmpp_port, timeout, resource_sampler):
+        """Envía a cada shard ya arrancado sus pares y espera sus resultados (fuera del event loop)"""
+        for (process, conn), (shard_id, pair_ids) in zip(shard_workers, enumerate(shards)):
+            conn.send(("run", (pair_ids, max_pings, ping_interval, xmpp_port)))
+            resource_sampler.track(f"shard-{shard_id}", process.pid)
+            print(f"🧩 Shard {shard_id} (PID: {process.pid}) con pares {pair_ids}")
+        
+        reports = []
+        deadline = time.monotonic() + timeout
+        for (process, conn), (shard_id, pair_ids) in zip(shard_workers, enumerate(shards)):
+            if not conn.poll(max(0.1, deadline - time.monotonic())):
+                raise TimeoutError(f"El shard {shard_id} no respondió en {timeout}s")
+            try:
+                reports.append(conn.recv())
+            except EOFError:
+                reports.append({
+                    "shard_id": shard_id, "pid": process.pid, "pair_ids": pair_ids,
+                    "error": f"el proceso terminó inesperadamente (código {process.exitcode})"
+                })
+        return reports
+    
+    async def run_sharded_ping_pong_system(max_pings, ping_interval, shard_count, xmpp_port, resource_sampler):
+        """Reparte los pares entre los procesos de los shards y agrega sus estadísticas"""
+        shards = [list(range(num_pairs))[i::shard_count] for i in range(shard_count)]
+        print(f"🚀 Iniciando sistema Ping-Pong sharded: {num_pairs} pares en {shard_count} procesos...")
+        
+        # Margen generoso sobre el tiempo de espera de cada shard
+        timeout = max_pings * max(ping_interval, 1) + 120
+        loop = asyncio.get_running_loop()
+        reports = await loop.run_in_executor(
+            None, run_shards, max_pings, ping_interval, shards, xmpp_port, timeout, resource_sampler
+        )
+        
+        errors = [report for report in reports if "error" in report]
+        if errors:
+            raise Exception(f"Fallo en shards: {[(e['shard_id'], e['error']) for e in errors]}")
+        
+        for report in reports:
+            metrics.merge(report["metrics"])
+            trace_recorder.events.extend(report["trace"])
+            stack_sampler.merge(report["profile"], f"shard-{report['shard_id']}")
+        
+        results = build_results([pair for report in reports for pair in report["pair_stats"]])
+        results["sharding"] = {
+            "shards": [
+                {
+                    "shard_id": report["shard_id"],
+                    "pid": report["pid"],
+                    "pair_ids": report["pair_ids"],
+                    "event_loop": {
+                        key: value for key, value in report["event_loop"]["loop_lag"].items() if key != "series"
+                    }
+                }
+                for report in reports
+            ]
+        }
+        return results
+    
+    def run_with_event_loop(main, loop_name):
+        """Ejecuta la corrutina principal con uvloop si se pide y está instalado"""
+        if loop_name == "uvloop":
+            try:
+                import uvloop
+            except ImportError:
+                print("⚠️ uvloop no está instalado, usando el event loop por defecto de asyncio")
+            else:
+                print("⚡ Usando event loop uvloop")
+                with asyncio.Runner(loop_factory=uvloop.new_event_loop) as runner:
+                    return runner.run(main())
+        elif loop_name != "asyncio":
+            print(f"⚠️ Event loop desconocido '{loop_name}', usando asyncio")
+        return asyncio.run(main())
+    
     # =================================================================
     # FUNCIÓN PRINCIPAL EMBEBIDA (del orchestrator.py main())
     # =================================================================
@@ -281,24 +2005,44 @@ def spade_ping_pong_embedded_task(
         # Inicializar gestor de procesos
         process_manager = ProcessManager()
         
+        # Muestreo de recursos del componente y de los procesos hijos
+        resource_sampler = ResourceSampler(lambda: process_manager.processes, resource_sample_interval)
+        resource_sampler.start()
+        
+        # Endpoint /metrics y/o textfile para scraping durante la ejecución
+        metrics.start(port=metrics_port, textfile=metrics_textfile)
+        
+        # Latido del event loop y detección de callbacks lentos
+        loop_monitor.start()
+        stack_sampler.watch_loop()
+        
+        reserved_ports = []
         try:
-            # 1. Encontrar puerto disponible
-            port = find_available_port(5222)
-            print(f"🔌 Puerto disponible encontrado: {port}")
-            
-            # 2. Iniciar servidor XMPP
-            xmpp_process = await start_xmpp_server(port, process_manager)
-            
-            # 3. Dar tiempo al servidor para arrancar completamente
-            print("⏳ Esperando a que el servidor XMPP esté completamente listo...")
-            await asyncio.sleep(10)
-            print("✅ Servidor XMPP debería estar listo")
+            server_boot_started = time.monotonic()
+            if transport == "memory":
+                # Transporte en memoria: los agentes no se conectan a ningún servidor
+                port, xmpp_process = None, None
+                print("🧠 Transporte en memoria: sin servidor XMPP")
+            else:
+                # 1-2. Reservar puertos efímeros (cliente XMPP y servidor-servidor) e iniciar
+                # el servidor XMPP, con otros puertos si alguien ocupa los reservados
+                xmpp_process, reserved_ports = await start_xmpp_server(process_manager)
+                port, server_port = reserved_ports
+                print(f"🔌 Puertos reservados: cliente {port}, servidor {server_port}")
+            # Coste fijo (hasta que el servidor acepta conexiones) que los escenarios en lote
+            # reparten entre todas sus mediciones
+            server_startup_seconds = time.monotonic() - server_boot_started
             
             # 4. Ejecutar sistema ping-pong
             print("🏓 Ejecutando sistema Ping-Pong...")
             start_agents_time = datetime.now()
             
-            results = await run_ping_pong_system(max_pings)
+            if scenario_configs:
+                results = await run_scenarios(scenario_configs, port)
+            elif shard_count > 1:
+                results = await run_sharded_ping_pong_system(max_pings, ping_interval, shard_count, port, resource_sampler)
+            else:
+                results = await run_ping_pong_system(max_pings, ping_interval, port)
             
             end_agents_time = datetime.now()
             execution_duration = (end_agents_time - start_agents_time).total_seconds()
@@ -306,12 +2050,26 @@ def spade_ping_pong_embedded_task(
             # 5. Añadir metadatos de orquestación
             results["orchestration"] = {
                 "xmpp_port": port,
+                "transport": transport,
                 "start_time": start_agents_time.isoformat(),
                 "end_time": end_agents_time.isoformat(),
                 "duration_seconds": execution_duration,
-                "server_pid": xmpp_process.pid if xmpp_process else None
+                "server_pid": xmpp_process.pid if xmpp_process else None,
+                "event_loop": f"{type(asyncio.get_running_loop()).__module__}.{type(asyncio.get_running_loop()).__name__}",
+                "num_pairs": num_pairs,
+                "num_shards": shard_count,
+                "cpu_limit": detect_cpu_limit(),
+                "max_pings": max_pings,
+                "ping_interval": ping_interval,
+                "server_startup_seconds": round(server_startup_seconds, 3)
             }
             
+            resource_sampler.stop()
+            results["resource_usage"] = resource_sampler.report()
+            
+            await loop_monitor.stop()
+            results["event_loop"] = loop_monitor.report()
+            
             # 6. Mostrar estadísticas finales
             print("\\n📊 ESTADÍSTICAS FINALES:")
             print(f"   🏓 Mensajes Ping: {results['execution_summary']['total_pings']}")
@@ -342,22 +2100,121 @@ def spade_ping_pong_embedded_task(
                 }
             }
             
+            resource_sampler.stop()
+            error_results["resource_usage"] = resource_sampler.report()
+            
+            await loop_monitor.stop()
+            error_results["event_loop"] = loop_monitor.report()
+            
             return error_results
         
         finally:
             # 7. Cleanup automático
             print("🧹 Ejecutando cleanup final...")
+            resource_sampler.stop()
+            await loop_monitor.stop()
+            metrics.stop(textfile=metrics_textfile)
             process_manager.cleanup()
+            release_ports(reserved_ports)
             print("✅ Orquestador finalizado")
     
+    def build_run_record(results):
+        """Convierte los resultados del sistema al esquema tipado común"""
+        orchestration = results.get("orchestration", {})
+        summary = results.get("execution_summary", {})
+        ping_stats = results.get("agent_statistics", {}).get("ping_agent", {})
+        loop_report = results.get("event_loop", {})
+        resources = results.get("resource_usage", {}).get("summary", {})
+        config = {
+            "max_pings": max_pings,
+            "ping_interval": ping_interval,
+            "num_pairs": num_pairs,
+            "num_shards": num_shards,
+            "event_loop": event_loop,
+            "transport": transport,
+            "body_codec": body_codec,
+            "payload_bytes": payload_bytes,
+            "scenarios": scenarios,
+            "scenario_concurrency": scenario_concurrency,
+            "agent_start_concurrency": agent_start_concurrency
+        }
+        now = datetime.now().isoformat()
+        return RunRecord(
+            component="spade_ping_pong_embedded_task",
+            started_at=orchestration.get("start_time") or summary.get("start_time") or now,
+            finished_at=orchestration.get("end_time") or summary.get("end_time") or now,
+            success=bool(summary.get("success", False)),
+            duration_seconds=orchestration.get("duration_seconds"),
+            config=config,
+            config_hash=config_fingerprint(config),
+            messages_sent=summary.get("total_pings"),
+            messages_received=ping_stats.get("replies_received", summary.get("total_pongs")),
+            throughput_msgs_per_second=ping_stats.get("throughput_msgs_per_second"),
+            latency_p50_seconds=ping_stats.get("p50_rtt_seconds"),
+            latency_p95_seconds=ping_stats.get("p95_rtt_seconds"),
+            peak_rss_kb=sum(usage["max_rss_kb"] for usage in resources.values()) or None,
+            metrics={
+                "avg_rtt_seconds": ping_stats.get("avg_rtt_seconds"),
+                "max_rtt_seconds": ping_stats.get("max_rtt_seconds"),
+                "loop_lag_p99_seconds": loop_report.get("loop_lag", {}).get("p99_seconds"),
+                "slow_callbacks": loop_report.get("slow_callbacks", {}).get("count"),
+                "server_startup_seconds": orchestration.get("server_startup_seconds"),
+                "shards": orchestration.get("num_shards")
+            },
+            error=summary.get("error")
+        )
+    
+    def save_run_record(results):
+        if results_record is not None or results_table is not None:
+            write_run_record(
+                build_run_record(results),
+                results_record.path if results_record is not None else None,
+                results_table.path if results_table is not None else None
+            )
+    
+    def save_profile():
+        """Detiene el muestreo y escribe las pilas (el artifact existe aunque profile esté desactivado)"""
+        stack_sampler.stop()
+        report = stack_sampler.summary()
+        if profile_output is not None:
+            report["file_bytes"] = stack_sampler.write_collapsed(profile_output.path)
+        if profile:
+            print(f"🔥 Perfil: {report['samples']} muestras, {report['stacks']} pilas distintas")
+        return report
+    
     # =================================================================
     # EJECUCIÓN PRINCIPAL DEL COMPONENTE
     # =================================================================
     try:
         print("🎯 Iniciando sistema SPADE Ping-Pong embebido...")
         
-        # Ejecutar el orquestador completo
-        results = asyncio.run(main_orchestrator())
+        # Los procesos de los shards se crean antes que cualquier hilo o event loop del componente
+        shard_count = max(1, min(num_shards if num_shards > 0 else detect_cpu_limit(), num_pairs))
+        shard_workers = start_shard_workers(shard_count) if shard_count > 1 and not scenario_configs else []
+        
+        # Ejecutar el orquestador completo con el event loop elegido
+        stack_sampler.start()
+        try:
+            results = run_with_event_loop(main_orchestrator, event_loop)
+        finally:
+            stop_shard_workers(shard_workers)
+        results.setdefault("orchestration", {})["body_codec"] = codec.name if codec else "text"
+        if codec_benchmark_iterations > 0:
+            print(f"⏱️ Benchmark de codecs ({codec_benchmark_iterations} iteraciones)...")
+            results["codec_benchmark"] = benchmark_codecs(codec_benchmark_iterations)
+        if message_trace is not None:
+            # Siempre se escribe el artifact (sin eventos si no se graba) para que exista la salida
+            trace_bytes = write_trace(message_trace.path, trace_recorder.events)
+            results["message_trace"] = {
+                "recorded": record_trace,
+                "events": len(trace_recorder.events),
+                "sends": sum(1 for event in trace_recorder.events if event[1] == TRACE_SEND),
+                "receives": sum(1 for event in trace_recorder.events if event[1] == TRACE_RECV),
+                "file_bytes": trace_bytes
+            }
+            print(f"🎞️ Traza de mensajes: {len(trace_recorder.events)} eventos, {trace_bytes} B")
+        results["profile"] = save_profile()
+        save_run_record(results)
         
         # Crear archivo de texto para el artifact
         success = results.get("execution_summary", {}).get("success", False)
@@ -366,6 +2223,86 @@ def spade_ping_pong_embedded_task(
         duration = results.get("orchestration", {}).get("duration_seconds", 0)
         error = results.get("execution_summary", {}).get("error", None)
         
+        # Resumen de recursos por proceso (la serie completa va en el JSON)
+        resource_lines = [
+            f"- {name}: CPU avg {usage['avg_cpu_percent']}% / max {usage['max_cpu_percent']}%, "
+            f"RSS max {usage['max_rss_kb']} kB, fds max {usage['max_num_fds']}, "
+            f"threads max {usage['max_num_threads']}, "
+            f"ctx switches {usage['voluntary_ctxt_switches']}/{usage['nonvoluntary_ctxt_switches']}"
+            for name, usage in results.get("resource_usage", {}).get("summary", {}).items()
+        ]
+        resource_text = "\n".join(resource_lines) if resource_lines else "- Sin muestras"
+        
+        # Resumen del event loop
+        loop_report = results.get("event_loop", {})
+        loop_lag = loop_report.get("loop_lag", {})
+        loop_lines = [
+            f"- Loop Lag (mean/p99/max): {loop_lag.get('mean_seconds')} / {loop_lag.get('p99_seconds')} / {loop_lag.get('max_seconds')} seconds",
+            f"- Slow Callbacks (>{slow_callback_ms} ms): {loop_report.get('slow_callbacks', {}).get('count', 0)}"
+        ]
+        for name, timing in loop_report.get("behaviour_run_durations", {}).items():
+            loop_lines.append(
+                f"- {name}.run(): {timing['iterations']} iteraciones, "
+                f"mean {timing['mean_seconds']} s, p95 {timing['p95_seconds']} s, max {timing['max_seconds']} s"
+            )
+        loop_text = "\n".join(loop_lines)
+        
+        # Tabla del benchmark de codecs (vacía si no se ejecutó)
+        codec_lines = []
+        for schema, rows in results.get("codec_benchmark", {}).get("payloads", {}).items():
+            codec_lines.append(f"- {schema}:")
+            for name, row in rows.items():
+                codec_lines.append(
+                    f"  {name:<8} encode {row['encode_us']} µs (x{row['encode_vs_json']}), "
+                    f"decode {row['decode_us']} µs (x{row['decode_vs_json']}), "
+                    f"cuerpo {row['body_bytes']} B (x{row['size_vs_json']})"
+                )
+        codec_text = "\n".join(codec_lines) if codec_lines else "- No ejecutado"
+        
+        # Tabla consolidada de escenarios (el arranque del servidor se reparte entre todos)
+        scenario_rows = results.get("scenarios", [])
+        scenario_lines = [
+            f"- #{row['scenario']}: max_pings {row['max_pings']}, interval {row['ping_interval']}s, "
+            f"pairs {row['num_pairs']}, {row['body_codec']} +{row['payload_bytes']} B -> {row['replies_received']}/{row['expected_pings']} replies, "
+            f"{row['throughput_msgs_per_second']} msgs/s, RTT p50/p95 {row['p50_rtt_seconds']} / {row['p95_rtt_seconds']} s, "
+            f"arranque p95 {row['startup_p95_seconds']} s, {row['duration_seconds']} s{'' if row['success'] else ' (FAILED)'}"
+            for row in scenario_rows
+        ]
+        if scenario_rows:
+            startup = results.get("orchestration", {}).get("server_startup_seconds", 0)
+            scenario_lines.append(
+                f"- Server startup: {startup} s ({startup / len(scenario_rows):.3f} s por escenario, concurrencia {max(1, scenario_concurrency)})"
+            )
+        scenario_text = "\n".join(scenario_lines) if scenario_lines else "- No ejecutado"
+        
+        # Marcos y tareas con más muestras (las pilas completas van en profile_output)
+        profile_report = results.get("profile", {})
+        if profile_report.get("samples"):
+            profile_lines = [
+                f"- {profile_report['samples']} muestras cada {profile_report['interval_seconds'] * 1000:.0f} ms "
+                f"durante {profile_report['duration_seconds']} s, {profile_report['stacks']} pilas distintas",
+                f"- Fuera de CPU (esperas o sin avance de CPU del hilo): {profile_report['off_cpu_percent']}%",
+                "- Top self (en CPU):"
+            ]
+            profile_lines += [f"  {row['percent']:>6}%  {row['frame']}" for row in profile_report["top_self"]]
+            profile_lines.append("- Top tasks (en CPU):")
+            profile_lines += [f"  {row['percent']:>6}%  {row['frame']}" for row in profile_report["top_tasks"]]
+            profile_text = "\n".join(profile_lines)
+        else:
+            profile_text = "- No ejecutado"
+        
+        # Arranque masivo de agentes (en modo escenarios, agregado de todos; el p95 de cada uno va en su fila)
+        startup = results.get("agent_startup")
+        if startup and startup["agents"]:
+            startup_text = (
+                f"{startup['agents']} agentes en {startup['total_seconds']:.2f} s (concurrencia {startup['concurrency']}, "
+                f"registro en lote {startup['registration_seconds']:.2f} s: {startup['registration']}), "
+                f"latencia por agente p50/p95/max {startup['latency_p50_seconds']:.3f} / "
+                f"{startup['latency_p95_seconds']:.3f} / {startup['latency_max_seconds']:.3f} s"
+            )
+        else:
+            startup_text = "N/A"
+        
         status_text = f"""SPADE Ping-Pong System Results (Embebido)
 ==============================================
 Overall Test Success: {success}
@@ -374,11 +2311,19 @@ Ping-Pong Communication:
 - Messages Sent (Ping): {total_pings}
 - Messages Received (Pong): {total_pongs}
 - Communication Success: {total_pings == total_pongs}
-- Expected Messages: {max_pings}
+- Expected Messages: {results.get('execution_summary', {}).get('expected_pings', max_pings * num_pairs)}
 
 System Performance:
 - Total Duration: {duration:.2f} seconds
+- Event Loop: {results.get('orchestration', {}).get('event_loop', event_loop)}
+- Agent Pairs / Shards: {num_pairs} / {results.get('orchestration', {}).get('num_shards', 'Unknown')} (CPU limit: {results.get('orchestration', {}).get('cpu_limit', 'Unknown')})
+- Throughput (ping → pong): {results.get('agent_statistics', {}).get('ping_agent', {}).get('throughput_msgs_per_second')} msgs/s
+- RTT p50/p95: {results.get('agent_statistics', {}).get('ping_agent', {}).get('p50_rtt_seconds')} / {results.get('agent_statistics', {}).get('ping_agent', {}).get('p95_rtt_seconds')} seconds
+- Agent Startup: {startup_text}
 - XMPP Server Port: {results.get('orchestration', {}).get('xmpp_port', 'Unknown')}
+- Transport: {transport}
+- Body Codec: {results.get('orchestration', {}).get('body_codec', body_codec)}
+- Message Trace: {results.get('message_trace', {}).get('events', 0)} eventos ({results.get('message_trace', {}).get('file_bytes', 0)} B)
 - System Error: {error or 'None'}
 
 Agent Statistics:
@@ -386,13 +2331,30 @@ Agent Statistics:
 - Pong Agent Status: {results.get('agent_statistics', {}).get('pong_agent', {}).get('status', 'Unknown')}
 - Message History Count: {len(results.get('message_history', []))}
 
+Resource Usage (cada {resource_sample_interval}s):
+{resource_text}
+
+Event Loop:
+{loop_text}
+
+Body Codec Benchmark (vs JSON):
+{codec_text}
+
+Scenarios:
+{scenario_text}
+
+Profile (stack sampling):
+{profile_text}
+
 Timestamp: {results.get('execution_summary', {}).get('end_time', 'Unknown')}
 
 🎯 RESULTADO FINAL: {'✅ SUCCESS' if success else '❌ FAILED'}
 
 ==== DETAILED RESULTS (JSON) ====
 {json.dumps(results, indent=2)}
-"""
+
+==== PROMETHEUS METRICS ====
+{metrics.render()}"""
         
         # Guardar el resultado en el artifact de Kubeflow
         with open(results_output.path, 'w') as f:
@@ -433,19 +2395,249 @@ Traceback:
         
         with open(results_output.path, 'w') as f:
             f.write(error_text)
+        save_profile()
+        save_run_record({"execution_summary": {"success": False, "error": str(e)}})
         
         # Re-raise para que Kubeflow marque el componente como fallado
         raise
     
     return None
 
+@dsl.component(base_image='python:3.12')
+def compare_event_loops(
+    asyncio_results: Input[Dataset],
+    uvloop_results: Input[Dataset],
+    comparison_output: Output[Dataset]
+) -> None:
+    """
+    Compara throughput y latencia del mismo escenario ping-pong con asyncio y uvloop
+    
+    Args:
+        asyncio_results: results_record (JSON) de la ejecución con asyncio
+        uvloop_results: results_record (JSON) de la ejecución con uvloop
+        comparison_output: Tabla comparativa como artifact
+    """
+    import json
+    
+    def load_record(path):
+        """Lee el RunRecord (results_record) de una ejecución"""
+        with open(path) as f:
+            return json.load(f)
+    
+    def extract(record):
+        return {
+            "event_loop": record["config"].get("event_loop"),
+            "replies_received": record.get("messages_received"),
+            "throughput_msgs_per_second": record.get("throughput_msgs_per_second"),
+            "avg_rtt_seconds": record["metrics"].get("avg_rtt_seconds"),
+            "p50_rtt_seconds": record.get("latency_p50_seconds"),
+            "p95_rtt_seconds": record.get("latency_p95_seconds"),
+            "loop_lag_p99_seconds": record["metrics"].get("loop_lag_p99_seconds")
+        }
+    
+    baseline = extract(load_record(asyncio_results.path))
+    candidate = extract(load_record(uvloop_results.path))
+    
+    lines = [
+        "SPADE Event Loop Benchmark (asyncio vs uvloop)",
+        "==============================================",
+        f"{'metric':<30} {'asyncio':>16} {'uvloop':>16} {'delta %':>10}"
+    ]
+    def fmt(value):
+        return f"{value:.6g}" if isinstance(value, float) else str(value)
+    
+    for key in baseline:
+        base, cand = baseline[key], candidate[key]
+        delta = ""
+        if isinstance(base, (int, float)) and isinstance(cand, (int, float)) and base:
+            delta = f"{100.0 * (cand - base) / base:+.1f}"
+        lines.append(f"{key:<30} {fmt(base):>16} {fmt(cand):>16} {delta:>10}")
+    
+    report = "\n".join(lines)
+    print(report)
+    
+    with open(comparison_output.path, 'w') as f:
+        f.write(report + "\n\n==== DETAILED RESULTS (JSON) ====\n")
+        f.write(json.dumps({"asyncio": baseline, "uvloop": candidate}, indent=2))
+
+@dsl.component(base_image='python:3.12')
+def compare_transports(
+    memory_results: Input[Dataset],
+    container_results: Input[Dataset],
+    xmpp_results: Input[Dataset],
+    comparison_output: Output[Dataset]
+) -> None:
+    """
+    Compara el mismo escenario ping-pong con cada transporte y atribuye el coste por mensaje
+    
+    Args:
+        memory_results: results_record de la ejecución con transport="memory" (solo lógica de agentes)
+        container_results: results_record de la ejecución con transport="container" (entrega local de SPADE)
+        xmpp_results: results_record de la ejecución con transport="xmpp" (servidor y pila de red)
+        comparison_output: Tabla comparativa como artifact
+    """
+    import json
+    
+    def load_record(path):
+        """Lee el RunRecord (results_record) de una ejecución"""
+        with open(path) as f:
+            return json.load(f)
+    
+    def extract(record):
+        return {
+            "replies_received": record.get("messages_received"),
+            "throughput_msgs_per_second": record.get("throughput_msgs_per_second"),
+            "avg_rtt_seconds": record["metrics"].get("avg_rtt_seconds"),
+            "p50_rtt_seconds": record.get("latency_p50_seconds"),
+            "p95_rtt_seconds": record.get("latency_p95_seconds")
+        }
+    
+    runs = {
+        "memory": extract(load_record(memory_results.path)),
+        "container": extract(load_record(container_results.path)),
+        "xmpp": extract(load_record(xmpp_results.path))
+    }
+    
+    def fmt(value):
+        return f"{value:.6g}" if isinstance(value, float) else str(value)
+    
+    lines = [
+        "SPADE Transport Benchmark (memory vs container vs xmpp)",
+        "=======================================================",
+        f"{'metric':<30} " + " ".join(f"{name:>16}" for name in runs)
+    ]
+    for key in runs["memory"]:
+        lines.append(f"{key:<30} " + " ".join(f"{fmt(run[key]):>16}" for run in runs.values()))
+    
+    # Coste por intercambio ping → pong (inverso del throughput): a máxima velocidad el RTT
+    # incluye la cola de pings pendientes, el throughput no
+    layers = {}
+    for name, run in runs.items():
+        if run["throughput_msgs_per_second"]:
+            run["us_per_exchange"] = round(1e6 / run["throughput_msgs_per_second"], 3)
+    for name in ("container", "xmpp"):
+        if "us_per_exchange" in runs[name] and "us_per_exchange" in runs["memory"]:
+            layers[f"{name}_overhead_us_per_exchange"] = round(
+                runs[name]["us_per_exchange"] - runs["memory"]["us_per_exchange"], 3
+            )
+            lines.append(
+                f"{name} overhead vs memory: {layers[f'{name}_overhead_us_per_exchange']} µs por intercambio "
+                f"({runs[name]['us_per_exchange']} vs {runs['memory']['us_per_exchange']})"
+            )
+    
+    report = "\n".join(lines)
+    print(report)
+    
+    with open(comparison_output.path, 'w') as f:
+        f.write(report + "\n\n==== DETAILED RESULTS (JSON) ====\n")
+        f.write(json.dumps({"runs": runs, "overhead": layers}, indent=2))
+
+@dsl.component(
+    base_image='python:3.12',
+    packages_to_install=['pandas==2.3.1', 'pyarrow']
+)
+def aggregate_ping_pong_runs(
+    run_results: Input[List[Dataset]],
+    aggregated_runs: Output[Dataset],
+    summary_output: Output[Dataset]
+) -> None:
+    """
+    Une los resultados de las ejecuciones de un barrido en una tabla columnar con estadísticas
+    
+    Args:
+        run_results: results_table (Parquet) de cada ejecución (dsl.Collected del ParallelFor)
+        aggregated_runs: Una fila por ejecución en formato Parquet
+        summary_output: Estadísticas por métrica (count/mean/std/min/p50/p95/max) como artifact
+    """
+    import json
+    import pandas as pd
+    
+    def load_record(path):
+        """Lee la fila del RunRecord (results_table) de una ejecución"""
+        record = pd.read_parquet(path).iloc[0].to_dict()
+        record["config"] = json.loads(record["config"])
+        record["metrics"] = dict(record["metrics"])
+        return record
+    
+    def extract(record):
+        config = record["config"]
+        return {
+            "max_pings": config.get("max_pings"),
+            "ping_interval": config.get("ping_interval"),
+            "num_pairs": config.get("num_pairs"),
+            "num_shards": record["metrics"].get("shards"),
+            "transport": config.get("transport"),
+            "event_loop": config.get("event_loop"),
+            "success": bool(record["success"]),
+            "total_pings": record.get("messages_sent"),
+            "replies_received": record.get("messages_received"),
+            "throughput_msgs_per_second": record.get("throughput_msgs_per_second"),
+            "avg_rtt_seconds": record["metrics"].get("avg_rtt_seconds"),
+            "p50_rtt_seconds": record.get("latency_p50_seconds"),
+            "p95_rtt_seconds": record.get("latency_p95_seconds"),
+            "duration_seconds": record.get("duration_seconds"),
+            "loop_lag_p99_seconds": record["metrics"].get("loop_lag_p99_seconds"),
+            "peak_rss_kb": record.get("peak_rss_kb"),
+            "error": record.get("error")
+        }
+    
+    rows = []
+    for index, artifact in enumerate(run_results):
+        try:
+            row = extract(load_record(artifact.path))
+        except (OSError, ValueError, KeyError, IndexError) as e:
+            # Una ejecución sin registro legible queda como fila fallida
+            row = {"success": False, "error": f"Resultados ilegibles: {e}"}
+        rows.append({"run": index, **row})
+    
+    df = pd.DataFrame(rows)
+    df.to_parquet(aggregated_runs.path, index=False)
+    
+    numeric = df.select_dtypes("number").drop(columns=["run"])
+    stats = numeric.describe(percentiles=[0.5, 0.95]).T
+    
+    lines = [
+        "SPADE Ping-Pong Sweep",
+        "=====================",
+        f"Runs: {len(df)} ({int(df['success'].fillna(False).astype(bool).sum())} successful)",
+        "",
+        stats.to_string(float_format=lambda value: f"{value:.6g}"),
+        "",
+        "Runs:",
+        df.drop(columns=["error"]).to_string(index=False)
+    ]
+    report = "\n".join(lines)
+    print(report)
+    
+    with open(summary_output.path, 'w') as f:
+        f.write(report + "\n\n==== DETAILED RESULTS (JSON) ====\n")
+        f.write(json.dumps({"runs": rows, "statistics": json.loads(stats.to_json(orient="index"))}, indent=2))
+
 @dsl.pipeline(
     name='spade-ping-pong-embedded-pipeline',
     description='Sistema multi-agente SPADE Ping-Pong con código completamente embebido'
 )
 def spade_ping_pong_embedded_pipeline(
     max_pings: int = 10,
-    ping_interval: int = 2
+    ping_interval: int = 2,
+    resource_sample_interval: float = 1.0,
+    metrics_port: int = 0,
+    metrics_textfile: str = "",
+    loop_lag_interval: float = 0.1,
+    slow_callback_ms: int = 0,
+    event_loop: str = "asyncio",
+    num_pairs: int = 1,
+    num_shards: int = 1,
+    body_codec: str = "text",
+    payload_bytes: int = 0,
+    codec_benchmark_iterations: int = 0,
+    record_trace: bool = False,
+    transport: str = "container",
+    scenarios: str = "",
+    scenario_concurrency: int = 1,
+    agent_start_concurrency: int = 32,
+    profile: bool = False,
+    cpu_limit: str = "2"
 ):
     """
     Pipeline embebido que ejecuta un sistema completo de agentes SPADE
@@ -463,18 +2655,53 @@ def spade_ping_pong_embedded_pipeline(
 
     Args:
         max_pings: Número de mensajes ping a intercambiar
-        ping_interval: Segundos entre cada ping (actualmente no usado)
+        ping_interval: Segundos entre cada ping (0 = máxima velocidad)
+        resource_sample_interval: Segundos entre muestras de CPU/RSS/fds (0 desactiva)
+        metrics_port: Puerto del endpoint Prometheus /metrics (0 desactiva)
+        metrics_textfile: Fichero .prom para el textfile collector (vacío desactiva)
+        loop_lag_interval: Periodo del latido que mide el retraso del event loop (0 desactiva)
+        slow_callback_ms: Umbral de callbacks lentos en ms, activa el debug de asyncio (0 desactiva)
+        event_loop: "asyncio" o "uvloop"
+        num_pairs: Número de pares ping/pong
+        num_shards: Procesos worker entre los que repartir los pares (0 = uno por CPU del límite)
+        body_codec: Formato del cuerpo de los mensajes: "text", "json", "msgpack" o "cbor"
+        payload_bytes: Bytes de relleno añadidos a cada ping (0 sin relleno)
+        codec_benchmark_iterations: Iteraciones del benchmark de codecs frente a JSON (0 desactiva)
+        record_trace: Graba la traza binaria de mensajes en el artifact message_trace
+        transport: "container", "xmpp" o "memory" (sin servidor XMPP)
+        scenarios: Lista JSON de escenarios, p. ej. '[{"max_pings": 50}, {"max_pings": 200, "num_pairs": 4, "body_codec": "json", "payload_bytes": 1024}]' (vacío desactiva)
+        scenario_concurrency: Escenarios simultáneos contra el servidor (1 = en serie)
+        agent_start_concurrency: Agentes que se arrancan a la vez (1 = en serie)
+        profile: Perfil por muestreo de pilas en el artifact profile_output
+        cpu_limit: Límite de CPU del pod; con num_shards=0 se crea un shard por CPU de este límite
     """
     
     # Ejecutar sistema SPADE embebido
     spade_task = spade_ping_pong_embedded_task(
         max_pings=max_pings,
-        ping_interval=ping_interval
+        ping_interval=ping_interval,
+        resource_sample_interval=resource_sample_interval,
+        metrics_port=metrics_port,
+        metrics_textfile=metrics_textfile,
+        loop_lag_interval=loop_lag_interval,
+        slow_callback_ms=slow_callback_ms,
+        event_loop=event_loop,
+        num_pairs=num_pairs,
+        num_shards=num_shards,
+        body_codec=body_codec,
+        payload_bytes=payload_bytes,
+        codec_benchmark_iterations=codec_benchmark_iterations,
+        record_trace=record_trace,
+        transport=transport,
+        scenarios=scenarios,
+        scenario_concurrency=scenario_concurrency,
+        agent_start_concurrency=agent_start_concurrency,
+        profile=profile
     )
     
     # Configuración del componente
     spade_task.set_display_name('SPADE Ping-Pong System (Embebido)')
-    spade_task.set_cpu_limit('2')
+    spade_task.set_cpu_limit(cpu_limit)
     spade_task.set_memory_limit('1Gi')
     
     # Añadir descripción detallada
@@ -482,4 +2709,129 @@ def spade_ping_pong_embedded_pipeline(
         "Ejecuta un sistema multi-agente completo usando SPADE framework con código embebido. "
         "Incluye servidor XMPP integrado y dos agentes que intercambian mensajes. "
         "Versión optimizada para Vertex AI con toda la lógica embebida en el componente."
-    )
\ No newline at end of file
+    )
+
+@dsl.pipeline(
+    name='spade-event-loop-benchmark-pipeline',
+    description='Benchmark del sistema Ping-Pong SPADE con event loop asyncio frente a uvloop'
+)
+def spade_event_loop_benchmark_pipeline(
+    max_pings: int = 200,
+    ping_interval: int = 0
+):
+    """
+    Ejecuta el mismo escenario ping-pong con asyncio y con uvloop y compara
+    throughput (pongs/s) y latencia (RTT p50/p95) de ambas ejecuciones
+    
+    Args:
+        max_pings: Número de mensajes ping por ejecución
+        ping_interval: Segundos entre pings (0 = máxima velocidad)
+    """
+    runs = {}
+    for loop_name in ("asyncio", "uvloop"):
+        task = spade_ping_pong_embedded_task(
+            max_pings=max_pings,
+            ping_interval=ping_interval,
+            event_loop=loop_name
+        )
+        task.set_display_name(f'SPADE Ping-Pong ({loop_name})')
+        task.set_cpu_limit('2')
+        task.set_memory_limit('1Gi')
+        runs[loop_name] = task
+    
+    # Ejecuciones en serie para que no compitan por CPU si caen en el mismo nodo
+    runs["uvloop"].after(runs["asyncio"])
+    
+    compare_task = compare_event_loops(
+        asyncio_results=runs["asyncio"].outputs['results_record'],
+        uvloop_results=runs["uvloop"].outputs['results_record']
+    )
+    compare_task.set_display_name('Compare asyncio vs uvloop')
+    compare_task.set_cpu_limit('0.5')
+    compare_task.set_memory_limit('256Mi')
+
+@dsl.pipeline(
+    name='spade-transport-benchmark-pipeline',
+    description='Coste del servidor XMPP: mismo escenario ping-pong en memoria, con el contenedor SPADE y por XMPP'
+)
+def spade_transport_benchmark_pipeline(
+    max_pings: int = 200,
+    ping_interval: int = 0
+):
+    """
+    Ejecuta el mismo escenario ping-pong con cada transporte y compara throughput
+    y RTT para medir el coste que añaden el servidor XMPP y la pila de red
+    
+    Args:
+        max_pings: Número de mensajes ping por ejecución
+        ping_interval: Segundos entre pings (0 = máxima velocidad)
+    """
+    runs = {}
+    previous = None
+    for transport_name in ("memory", "container", "xmpp"):
+        task = spade_ping_pong_embedded_task(
+            max_pings=max_pings,
+            ping_interval=ping_interval,
+            transport=transport_name
+        )
+        task.set_display_name(f'SPADE Ping-Pong ({transport_name})')
+        task.set_cpu_limit('2')
+        task.set_memory_limit('1Gi')
+        # Ejecuciones en serie para que no compitan por CPU si caen en el mismo nodo
+        if previous is not None:
+            task.after(previous)
+        runs[transport_name] = previous = task
+    
+    compare_task = compare_transports(
+        memory_results=runs["memory"].outputs['results_record'],
+        container_results=runs["container"].outputs['results_record'],
+        xmpp_results=runs["xmpp"].outputs['results_record']
+    )
+    compare_task.set_display_name('Compare transports')
+    compare_task.set_cpu_limit('0.5')
+    compare_task.set_memory_limit('256Mi')
+
+# Configuraciones por defecto del barrido (una ejecución del componente por elemento)
+DEFAULT_PING_PONG_SWEEP = [
+    {"max_pings": 50, "num_pairs": 1},
+    {"max_pings": 200, "num_pairs": 1},
+    {"max_pings": 200, "num_pairs": 4},
+    {"max_pings": 500, "num_pairs": 8}
+]
+
+@dsl.pipeline(
+    name='spade-ping-pong-sweep-pipeline',
+    description='Barrido de configuraciones ping-pong repartidas en pods con ParallelFor y agregadas en una tabla'
+)
+def spade_ping_pong_sweep_pipeline(
+    configs: list = DEFAULT_PING_PONG_SWEEP,
+    ping_interval: int = 0,
+    transport: str = "container"
+):
+    """
+    Ejecuta cada configuración en su propio pod (como máximo 4 a la vez) y agrega los
+    resultados en un artifact Parquet con una fila por ejecución y estadísticas por métrica
+    
+    Args:
+        configs: Lista de configuraciones, cada una con max_pings y num_pairs
+        ping_interval: Segundos entre pings en todas las ejecuciones (0 = máxima velocidad)
+        transport: "container", "xmpp" o "memory" en todas las ejecuciones
+    """
+    # parallelism debe ser un entero en tiempo de compilación
+    with dsl.ParallelFor(items=configs, parallelism=4) as config:
+        run_task = spade_ping_pong_embedded_task(
+            max_pings=config.max_pings,
+            num_pairs=config.num_pairs,
+            ping_interval=ping_interval,
+            transport=transport
+        )
+        run_task.set_display_name('SPADE Ping-Pong (sweep)')
+        run_task.set_cpu_limit('2')
+        run_task.set_memory_limit('1Gi')
+    
+    aggregate_task = aggregate_ping_pong_runs(
+        run_results=dsl.Collected(run_task.outputs['results_table'])
+    )
+    aggregate_task.set_display_name('Aggregate sweep results')
+    aggregate_task.set_cpu_limit('0.5')
+    aggregate_task.set_memory_limit('512Mi')
@@ -1,5 +1,5 @@
 import kfp
-from pipeline import spade_server_agent_test_pipeline
+from pipeline import spade_server_agent_test_pipeline, spade_server_load_test_pipeline
 
 if __name__ == '__main__':
     print("Compilando pipeline SPADE Server + Agent Test...")
@@ -10,6 +10,13 @@ if __name__ == '__main__':
     )
     
     print("Pipeline compilado exitosamente en: spade_server_agent_test_pipeline.yaml")
+    
+    kfp.compiler.Compiler().compile(
+        pipeline_func=spade_server_load_test_pipeline,
+        package_path='spade_server_load_test_pipeline.yaml'
+    )
+    
+    print("Pipeline compilado exitosamente en: spade_server_load_test_pipeline.yaml")
     print("")
     print("Example 3 EXTENDIDO: SPADE Server + Agent Test")
     print("   - Complejidad: Intermedia+ (servidor + agente simple)")
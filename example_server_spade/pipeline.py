@@ -3,27 +3,600 @@ from kfp.dsl import Output, Dataset
 
 @dsl.component(
     base_image='python:3.12',
-    packages_to_install=['spade==4.0.3']
+    packages_to_install=['spade==4.0.3', 'pyarrow']
 )
-def test_spade_server_with_agent(test_results: Output[Dataset]) -> None:
+def test_spade_server_with_agent(
+    test_results: Output[Dataset],
+    metrics_port: int = 0,
+    metrics_textfile: str = "",
+    soak_duration: float = 0.0,
+    soak_rate: float = 10.0,
+    soak_window: float = 10.0,
+    payload_sizes: str = "",
+    payload_messages: int = 20,
+    payload_compression: str = "none",
+    payload_encoding: str = "base64",
+    dispatch_benchmark_behaviours: str = "",
+    record_trace: bool = False,
+    trace_replay_path: str = "",
+    trace_replay_speed: float = 1.0,
+    agent_start_concurrency: int = 32,
+    profile: bool = False,
+    message_trace: Output[Dataset] = None,
+    results_record: Output[Dataset] = None,
+    results_table: Output[Dataset] = None,
+    profile_output: Output[Dataset] = None
+) -> None:
     """
     Prueba el servidor SPADE iniciándolo, verificando conectividad y ejecutando un agente simple
     
     Args:
         test_results: Archivo de resultados del test como artifact
-    """
+        metrics_port: Puerto local donde servir /metrics en formato Prometheus (0 desactiva el servidor)
+        metrics_textfile: Ruta de un fichero .prom que se reescribe periódicamente (vacío desactiva)
+        soak_duration: Segundos de carga sostenida a través del servidor (0 ejecuta el test clásico de 5 mensajes)
+        soak_rate: Mensajes por segundo objetivo durante el soak
+        soak_window: Tamaño en segundos de cada ventana del informe del soak
+        payload_sizes: Tamaños de cuerpo en bytes separados por comas para el barrido (vacío lo desactiva)
+        payload_messages: Mensajes enviados por cada tamaño del barrido
+        payload_compression: Compresión del cuerpo antes de codificarlo: "none" o "zlib"
+        payload_encoding: Codificación de texto del cuerpo binario: "base64" o "base85"
+        dispatch_benchmark_behaviours: Behaviours por agente separados por comas para el benchmark de dispatch (vacío lo desactiva)
+        record_trace: Graba todos los mensajes (emisor, destinatario, metadata, tamaño e instante) en message_trace
+        trace_replay_path: Traza binaria grabada a repetir contra el servidor (vacío ejecuta los tests habituales)
+        trace_replay_speed: Factor de velocidad de la repetición (1.0 ritmo original, 0 máxima velocidad)
+        agent_start_concurrency: Agentes de la repetición conectándose a la vez, tras registrar sus cuentas en lote (1 = uno tras otro)
+        profile: Muestrea las pilas de todos los hilos del componente con las tareas asyncio en curso
+        message_trace: Traza binaria de los mensajes del test
+        results_record: Resultado con el esquema tipado común (RunRecord) en JSON
+        results_table: El mismo RunRecord como fila Parquet
+        profile_output: Pilas muestreadas en formato collapsed (flamegraph/speedscope), vacío sin profile
+"""
     import asyncio
+    import math
+    import base64
+    import zlib
+    import struct
+    import hashlib
     import subprocess
+    import signal
     import socket
     import json
     import time
     import shutil
     import os
+    import sys
+    import threading
+    import fcntl
+    import tempfile
+    import uuid
+    import inspect
+    import logging
+    from dataclasses import dataclass, field, asdict
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
     from datetime import datetime
     from pathlib import Path
     
     print("🎯 Iniciando test del servidor SPADE + agente simple...")
     
+    # Métricas de agentes en formato de exposición de Prometheus
+    class AgentMetrics:
+        """Registro de métricas de agentes expuesto en formato de texto de Prometheus"""
+        
+        RTT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+        
+        DESCRIPTIONS = {
+            "spade_messages_sent_total": ("counter", "Mensajes enviados por agente"),
+            "spade_messages_received_total": ("counter", "Mensajes recibidos por agente"),
+            "spade_behaviour_iterations_total": ("counter", "Iteraciones de run() por behaviour"),
+            "spade_receive_timeouts_total": ("counter", "Llamadas a receive() que agotaron el timeout"),
+            "spade_xmpp_disconnects_total": ("counter", "Desconexiones del cliente XMPP"),
+            "spade_xmpp_reconnects_total": ("counter", "Sesiones XMPP reabiertas tras la conexión inicial"),
+            "spade_message_rtt_seconds": ("histogram", "Latencia envío-recepción de los mensajes")
+        }
+        
+        def __init__(self):
+            self.lock = threading.Lock()
+            self.counters = {}
+            self.histograms = {}
+            self._http_server = None
+            self._writer_stop = threading.Event()
+            self._writer_thread = None
+        
+        def inc(self, name, amount=1, **labels):
+            """Incrementa un contador"""
+            key = (name, tuple(sorted(labels.items())))
+            with self.lock:
+                self.counters[key] = self.counters.get(key, 0) + amount
+        
+        def observe(self, name, value, **labels):
+            """Registra una observación en un histograma"""
+            key = (name, tuple(sorted(labels.items())))
+            with self.lock:
+                buckets, total = self.histograms.setdefault(key, ([0] * len(self.RTT_BUCKETS), [0.0, 0]))
+                for i, bound in enumerate(self.RTT_BUCKETS):
+                    if value <= bound:
+                        buckets[i] += 1
+                total[0] += value
+                total[1] += 1
+        
+        def render(self):
+            """Genera el texto de exposición de Prometheus"""
+            def fmt_labels(labels, extra=()):
+                items = list(labels) + list(extra)
+                if not items:
+                    return ""
+                return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+            
+            lines = []
+            with self.lock:
+                for name, (metric_type, description) in self.DESCRIPTIONS.items():
+                    series = self.histograms if metric_type == "histogram" else self.counters
+                    keys = sorted(key for key in series if key[0] == name)
+                    if not keys:
+                        continue
+                    lines.append(f"# HELP {name} {description}")
+                    lines.append(f"# TYPE {name} {metric_type}")
+                    for key in keys:
+                        labels = key[1]
+                        if metric_type == "histogram":
+                            buckets, (total_sum, total_count) = series[key]
+                            for bound, count in zip(self.RTT_BUCKETS, buckets):
+                                lines.append(f"{name}_bucket{fmt_labels(labels, [('le', bound)])} {count}")
+                            lines.append(f"{name}_bucket{fmt_labels(labels, [('le', '+Inf')])} {total_count}")
+                            lines.append(f"{name}_sum{fmt_labels(labels)} {total_sum}")
+                            lines.append(f"{name}_count{fmt_labels(labels)} {total_count}")
+                        else:
+                            lines.append(f"{name}{fmt_labels(labels)} {series[key]}")
+            return "\n".join(lines) + "\n"
+        
+        def write_textfile(self, path):
+            """Escribe las métricas de forma atómica (formato node_exporter textfile)"""
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write(self.render())
+            os.replace(tmp_path, path)
+        
+        def start(self, port=0, textfile="", textfile_interval=5.0):
+            """Arranca el endpoint HTTP y/o la escritura periódica del textfile"""
+            metrics = self
+            
+            if port:
+                class MetricsHandler(BaseHTTPRequestHandler):
+                    def do_GET(self):
+                        body = metrics.render().encode()
+                        self.send_response(200)
+                        self.send_header("Content-Type", "text/plain; version=0.0.4")
+                        self.send_header("Content-Length", str(len(body)))
+                        self.end_headers()
+                        self.wfile.write(body)
+                    
+                    def log_message(self, format, *args):
+                        pass
+                
+                self._http_server = ThreadingHTTPServer(("0.0.0.0", port), MetricsHandler)
+                threading.Thread(target=self._http_server.serve_forever, name="metrics-http", daemon=True).start()
+                print(f"📈 Métricas Prometheus en http://localhost:{port}/metrics")
+            
+            if textfile:
+                def writer():
+                    while not self._writer_stop.wait(textfile_interval):
+                        self.write_textfile(textfile)
+                
+                self._writer_thread = threading.Thread(target=writer, name="metrics-textfile", daemon=True)
+                self._writer_thread.start()
+                print(f"📈 Métricas Prometheus en fichero: {textfile}")
+        
+        def stop(self, textfile=""):
+            """Detiene el endpoint y deja escrito el estado final del textfile"""
+            if self._http_server:
+                self._http_server.shutdown()
+                self._http_server.server_close()
+                self._http_server = None
+            if self._writer_thread:
+                self._writer_stop.set()
+                self._writer_thread.join()
+                self._writer_thread = None
+            if textfile:
+                self.write_textfile(textfile)
+        
+        def track_xmpp_connection(self, agent):
+            """Cuenta desconexiones y sesiones reabiertas del cliente XMPP del agente"""
+            agent.client.add_event_handler(
+                "disconnected", lambda _: self.inc("spade_xmpp_disconnects_total", agent=agent.name)
+            )
+            # setup() se ejecuta tras la primera session_start: cualquier otra es una reconexión
+            agent.client.add_event_handler(
+                "session_start", lambda _: self.inc("spade_xmpp_reconnects_total", agent=agent.name)
+            )
+    
+    metrics = AgentMetrics()
+    metrics.start(port=metrics_port, textfile=metrics_textfile)
+    
+    def percentile(values, pct):
+        """Percentil por rango más cercano, el mismo que RunRecord en todos los componentes (None si no hay valores)"""
+        if not values:
+            return None
+        ordered = sorted(values)
+        # ceil y no round: round() redondea .5 al par y p50 de [1..5] daba 2
+        index = min(len(ordered) - 1, max(0, math.ceil(pct * len(ordered) / 100) - 1))
+        return ordered[index]
+    
+    def read_rss_kb(pid):
+        """VmRSS de /proc/<pid>/status en kB (None si el proceso ya no existe)"""
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1])
+        except (FileNotFoundError, ProcessLookupError, PermissionError):
+            return None
+        return None
+    
+    def linear_slope(points):
+        """Pendiente por mínimos cuadrados de una lista de (x, y)"""
+        if len(points) < 2:
+            return None
+        mean_x = sum(x for x, _ in points) / len(points)
+        mean_y = sum(y for _, y in points) / len(points)
+        denominator = sum((x - mean_x) ** 2 for x, _ in points)
+        if denominator == 0:
+            return None
+        return sum((x - mean_x) * (y - mean_y) for x, y in points) / denominator
+    
+    # Trazas de mensajes: mismo formato binario que el ejemplo ping-pong
+    TRACE_MAGIC = b"SPTR"
+    TRACE_VERSION = 1
+    TRACE_SEND, TRACE_RECV = 0, 1
+    TRACE_HEADER = struct.Struct("<4sBdI")   # magic, versión, instante inicial (epoch), nº de eventos
+    TRACE_RECORD = struct.Struct("<dBIIIB")  # offset, tipo, emisor, destinatario, bytes del cuerpo, nº de metadatos
+    TRACE_PAIR = struct.Struct("<II")        # clave y valor de metadata (índices en la tabla de cadenas)
+    
+    class MessageTraceRecorder:
+        """Graba la secuencia exacta de mensajes: emisor, destinatario, metadata, tamaño del cuerpo e instante
+        
+        Los envíos locales se capturan envolviendo Container.send, los envíos directos por XMPP
+        llaman a record() y las recepciones se graban en IndexedDispatchAgent.dispatch.
+        """
+        
+        def __init__(self, enabled):
+            self.enabled = enabled
+            self.events = []
+            self.container = None
+        
+        def record(self, kind, msg):
+            if self.enabled:
+                self.events.append((
+                    time.time(), kind,
+                    msg.sender.bare if msg.sender else "", msg.to.bare if msg.to else "",
+                    dict(msg.metadata), len(msg.body.encode("utf-8")) if msg.body else 0
+                ))
+        
+        def attach(self, container):
+            """Envuelve el envío del contenedor SPADE del proceso (una sola vez)"""
+            if not self.enabled or self.container is container:
+                return
+            self.container = container
+            send = container.send
+            
+            async def traced_send(msg, behaviour):
+                self.record(TRACE_SEND, msg)
+                await send(msg, behaviour)
+            
+            container.send = traced_send
+    
+    trace_recorder = MessageTraceRecorder(record_trace)
+    
+    def write_trace(path, events):
+        """Escribe la traza: cabecera y, comprimidos con zlib, la tabla de cadenas y los registros de tamaño fijo"""
+        events = sorted(events, key=lambda event: event[0])
+        start = events[0][0] if events else time.time()
+        strings = {}
+        
+        def intern(value):
+            return strings.setdefault(value, len(strings))
+        
+        records = bytearray()
+        for timestamp, kind, sender, recipient, metadata, body_size in events:
+            records += TRACE_RECORD.pack(
+                timestamp - start, kind, intern(sender), intern(recipient), body_size, len(metadata)
+            )
+            for key, value in metadata.items():
+                records += TRACE_PAIR.pack(intern(key), intern(str(value)))
+        
+        table = bytearray(struct.pack("<I", len(strings)))
+        for value in strings:
+            encoded = value.encode("utf-8")
+            table += struct.pack("<H", len(encoded)) + encoded
+        
+        with open(path, "wb") as f:
+            f.write(TRACE_HEADER.pack(TRACE_MAGIC, TRACE_VERSION, start, len(events)))
+            f.write(zlib.compress(bytes(table + records), 6))
+        return os.path.getsize(path)
+    
+    def read_trace(path):
+        """Lee una traza de write_trace: devuelve el instante inicial y los eventos con offset relativo"""
+        with open(path, "rb") as f:
+            magic, version, start, count = TRACE_HEADER.unpack(f.read(TRACE_HEADER.size))
+            if magic != TRACE_MAGIC or version != TRACE_VERSION:
+                raise ValueError(f"Traza no válida: {path} (magic {magic!r}, versión {version})")
+            data = zlib.decompress(f.read())
+        
+        (string_count,) = struct.unpack_from("<I", data, 0)
+        offset = 4
+        strings = []
+        for _ in range(string_count):
+            (length,) = struct.unpack_from("<H", data, offset)
+            strings.append(data[offset + 2:offset + 2 + length].decode("utf-8"))
+            offset += 2 + length
+        
+        events = []
+        for _ in range(count):
+            at, kind, sender, recipient, body_size, pair_count = TRACE_RECORD.unpack_from(data, offset)
+            offset += TRACE_RECORD.size
+            metadata = {}
+            for _ in range(pair_count):
+                key, value = TRACE_PAIR.unpack_from(data, offset)
+                offset += TRACE_PAIR.size
+                metadata[strings[key]] = strings[value]
+            events.append((at, kind, strings[sender], strings[recipient], metadata, body_size))
+        return start, events
+    
+    # Esquema tipado de resultados (JSON + Parquet), común con ping-pong y SimFleet:
+    # una fila por ejecución
+    RESULTS_SCHEMA_VERSION = 1
+    
+    @dataclass(slots=True)
+    class RunRecord:
+        """Resultado de una ejecución con columnas comunes a todos los componentes
+        
+        Las métricas propias de cada componente van en `metrics` (nombre -> valor numérico).
+        latency_p50/p95_seconds usan siempre el percentil por rango más cercano (el menor
+        valor con al menos p% de las muestras <= él), sin interpolar.
+        """
+        component: str
+        started_at: str
+        finished_at: str
+        success: bool
+        duration_seconds: float | None
+        config: dict
+        config_hash: str
+        messages_sent: int | None = None
+        messages_received: int | None = None
+        throughput_msgs_per_second: float | None = None
+        latency_p50_seconds: float | None = None
+        latency_p95_seconds: float | None = None
+        peak_rss_kb: int | None = None
+        metrics: dict = field(default_factory=dict)
+        error: str | None = None
+        schema_version: int = RESULTS_SCHEMA_VERSION
+        run_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    
+    def config_fingerprint(config):
+        """Hash estable de la configuración para agrupar ejecuciones comparables"""
+        canonical = json.dumps(config, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+    
+    def write_run_record(record, json_path=None, parquet_path=None):
+        """Serializa el registro a JSON y, si pyarrow está instalado, a Parquet"""
+        data = asdict(record)
+        data["metrics"] = {key: float(value) for key, value in data["metrics"].items() if value is not None}
+        if json_path:
+            with open(json_path, "w") as f:
+                json.dump(data, f, indent=2, default=str)
+        if not parquet_path:
+            return
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            print("⚠️ pyarrow no está instalado, se omite el registro Parquet")
+            return
+        schema = pa.schema([
+            ("schema_version", pa.int32()),
+            ("run_id", pa.string()),
+            ("component", pa.string()),
+            ("started_at", pa.string()),
+            ("finished_at", pa.string()),
+            ("success", pa.bool_()),
+            ("duration_seconds", pa.float64()),
+            ("config", pa.string()),
+            ("config_hash", pa.string()),
+            ("messages_sent", pa.int64()),
+            ("messages_received", pa.int64()),
+            ("throughput_msgs_per_second", pa.float64()),
+            ("latency_p50_seconds", pa.float64()),
+            ("latency_p95_seconds", pa.float64()),
+            ("peak_rss_kb", pa.int64()),
+            ("metrics", pa.map_(pa.string(), pa.float64())),
+            ("error", pa.string())
+        ])
+        # La configuración es heterogénea: en Parquet viaja como JSON canónico
+        row = {**data, "config": json.dumps(data["config"], sort_keys=True, default=str)}
+        pq.write_table(pa.Table.from_pylist([row], schema=schema), parquet_path)
+    
+    # Perfilado por muestreo de pilas (formato collapsed para flamegraphs)
+    class StackSampler:
+        """Perfilador por muestreo: cuenta las pilas de todos los hilos en formato collapsed
+        
+        Un hilo aparte lee sys._current_frames() cada `interval` segundos. En los hilos con
+        event loop registrado (watch_loop) se inserta el marco [task <nombre>] de la tarea
+        asyncio en ejecución delante de su primera corrutina. Es tiempo de pared; las muestras
+        de un hilo cuyo tiempo de CPU (/proc/self/task/<tid>) no avanzó desde la muestra
+        anterior terminan en el marco [off-cpu], así que time.sleep u otra llamada C
+        bloqueante no cuentan como CPU.
+        """
+        
+        OFF_CPU_FRAME = "[off-cpu]"
+        
+        # Hojas que solo esperan (selector del event loop, locks, hijos): siempre fuera de CPU
+        IDLE_FRAMES = {
+            "EpollSelector.select", "_PollLikeSelector.select", "KqueueSelector.select",
+            "SelectSelector.select", "Condition.wait", "Popen._wait"
+        }
+        
+        def __init__(self, enabled, interval=0.01):
+            self.enabled = enabled
+            self.interval = interval
+            self.counts = {}
+            self.loops = {}
+            self.duration = 0.0
+            self._labels = {}
+            self._cpu_times = {}
+            self._started = None
+            self._stop_event = threading.Event()
+            self._thread = None
+        
+        def reset(self):
+            """Descarta las muestras (el hilo de muestreo no sobrevive al fork)"""
+            self.counts = {}
+            self.loops = {}
+            self.duration = 0.0
+            self._cpu_times = {}
+            self._stop_event = threading.Event()
+            self._thread = None
+        
+        def watch_loop(self):
+            """Registra el event loop en marcha para etiquetar sus muestras con la tarea actual"""
+            if self.enabled:
+                self.loops[threading.get_ident()] = asyncio.get_running_loop()
+        
+        def frame_label(self, code):
+            label = self._labels.get(code)
+            if label is None:
+                filename = code.co_filename.rsplit("site-packages/", 1)[-1]
+                if filename.startswith("/"):
+                    filename = "/".join(filename.rsplit("/", 2)[-2:])
+                label = f"{code.co_qualname} ({filename}:{code.co_firstlineno})"
+                self._labels[code] = label
+            return label
+        
+        def task_label(self, thread_id):
+            loop = self.loops.get(thread_id)
+            task = asyncio.current_task(loop) if loop is not None else None
+            if task is None:
+                return None
+            name = task.get_name()
+            # Las tareas sin nombre (Task-N) se agrupan por su corrutina, p. ej. CyclicBehaviour._step
+            if name.startswith("Task-"):
+                name = getattr(task.get_coro(), "__qualname__", name)
+            return f"[task {name}]"
+        
+        def thread_cpu_time(self, native_id):
+            """Tiempo de CPU acumulado del hilo (ns de schedstat o ticks de stat), None sin /proc"""
+            try:
+                with open(f"/proc/self/task/{native_id}/schedstat") as f:
+                    return int(f.read().split()[0])
+            except (OSError, ValueError, IndexError):
+                pass
+            try:
+                with open(f"/proc/self/task/{native_id}/stat") as f:
+                    fields = f.read().rsplit(")", 1)[1].split()
+                return int(fields[11]) + int(fields[12])
+            except (OSError, ValueError, IndexError):
+                return None
+        
+        def on_cpu(self, native_id, leaf):
+            """En CPU si no está en una espera conocida y su tiempo de CPU avanzó desde la muestra anterior"""
+            current = self.thread_cpu_time(native_id) if native_id is not None else None
+            previous = self._cpu_times.get(native_id)
+            self._cpu_times[native_id] = current
+            if leaf.split(" (", 1)[0] in self.IDLE_FRAMES:
+                return False
+            # Sin /proc, o en la primera muestra del hilo, no hay con qué comparar
+            return current is None or previous is None or current > previous
+        
+        def sample_once(self):
+            threads = {thread.ident: thread for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == threading.get_ident():
+                    continue
+                codes = []
+                while frame is not None:
+                    codes.append(frame.f_code)
+                    frame = frame.f_back
+                
+                thread = threads.get(thread_id)
+                labels = [thread.name if thread else f"thread-{thread_id}"]
+                task = self.task_label(thread_id)
+                for code in reversed(codes):
+                    if task and code.co_flags & inspect.CO_COROUTINE:
+                        labels.append(task)
+                        task = None
+                    labels.append(self.frame_label(code))
+                if not self.on_cpu(thread.native_id if thread else None, labels[-1]):
+                    labels.append(self.OFF_CPU_FRAME)
+                stack = ";".join(labels)
+                self.counts[stack] = self.counts.get(stack, 0) + 1
+        
+        def _run(self):
+            while not self._stop_event.wait(self.interval):
+                self.sample_once()
+        
+        def start(self):
+            """Arranca el hilo de muestreo (no-op si el perfilado está desactivado)"""
+            if not self.enabled or self._thread is not None:
+                return
+            self._started = time.monotonic()
+            self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+            self._thread.start()
+        
+        def stop(self):
+            if self._thread is None:
+                return
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+            self.duration += time.monotonic() - self._started
+        
+        def merge(self, counts, prefix):
+            """Añade las pilas de otro proceso (un shard) bajo un marco raíz propio"""
+            for stack, count in counts.items():
+                key = f"{prefix};{stack}"
+                self.counts[key] = self.counts.get(key, 0) + count
+        
+        def write_collapsed(self, path):
+            """Una línea "marco;marco;... muestras" por pila: flamegraph.pl, speedscope o inferno"""
+            with open(path, "w") as f:
+                for stack, count in sorted(self.counts.items()):
+                    f.write(f"{stack} {count}\n")
+            return os.path.getsize(path)
+        
+        def summary(self, top=10):
+            """Marcos hoja y tareas con más muestras en CPU (cada tick cuenta una muestra por hilo)"""
+            total = sum(self.counts.values())
+            off_cpu = 0
+            leaves = {}
+            tasks = {}
+            for stack, count in self.counts.items():
+                frames = stack.split(";")
+                if frames[-1] == self.OFF_CPU_FRAME:
+                    off_cpu += count
+                    continue
+                leaves[frames[-1]] = leaves.get(frames[-1], 0) + count
+                task = next((frame for frame in frames if frame.startswith("[task ")), None)
+                if task:
+                    tasks[task] = tasks.get(task, 0) + count
+            
+            def ranking(counter):
+                return [
+                    {"frame": frame, "samples": count, "percent": round(100 * count / total, 2)}
+                    for frame, count in sorted(counter.items(), key=lambda item: -item[1])[:top]
+                ]
+            
+            return {
+                "enabled": self.enabled,
+                "interval_seconds": self.interval,
+                "duration_seconds": round(self.duration, 3),
+                "samples": total,
+                "stacks": len(self.counts),
+                "off_cpu_percent": round(100 * off_cpu / total, 2) if total else None,
+                "top_self": ranking(leaves),
+                "top_tasks": ranking(tasks)
+            }
+    
+    stack_sampler = StackSampler(profile)
+    
     # Configuración del test
     test_data = {
         "server_started": False,
@@ -32,92 +605,269 @@ def test_spade_server_with_agent(test_results: Output[Dataset]) -> None:
         "start_time": datetime.now().isoformat(),
         "end_time": None,
         "port": 5222,
+        "server_port": 5269,
         "error": None
     }
     
     server_process = None
     
-    try:
-        # Función para encontrar puerto disponible
-        def find_available_port(start_port=5222):
-            for port in range(start_port, start_port + 20):
-                try:
-                    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                        s.bind(('localhost', port))
-                        return port
-                except OSError:
-                    continue
-            raise Exception("No hay puertos disponibles")
-        
-        # Paso 1: Encontrar puerto y configurar
-        test_data["port"] = find_available_port()
-        port = test_data["port"]
-        print(f"🔌 Puerto disponible: {port}")
-        
-        # Paso 2: Iniciar servidor SPADE
-        print("📡 Iniciando servidor SPADE...")
-        cmd = [
-            "spade", "run"
-        ]
+    # Registro de puertos reservados de los componentes que comparten /tmp (el pod)
+    port_registry = os.path.join(tempfile.gettempdir(), "kfp_spade_ports.json")
+    reserved_ports = []
+    
+    def read_port_registry():
+        try:
+            with open(port_registry) as f:
+                registry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+        alive = {}
+        for reserved_port, pid in registry.items():
+            try:
+                os.kill(pid, 0)
+                alive[reserved_port] = pid
+            except ProcessLookupError:
+                pass
+            except PermissionError:
+                alive[reserved_port] = pid
+        return alive
+    
+    def write_port_registry(registry):
+        tmp_path = f"{port_registry}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(registry, f)
+        os.replace(tmp_path, port_registry)
+    
+    def allocate_ports(count=1):
+        """Reserva puertos efímeros asignados por el SO (bind al puerto 0) bajo un lock de fichero"""
+        with open(f"{port_registry}.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            registry = read_port_registry()
+            ports = []
+            held = []
+            try:
+                while len(ports) < count:
+                    # Los sockets se mantienen abiertos hasta el final para no repetir puerto
+                    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                    held.append(s)
+                    s.bind(("0.0.0.0", 0))
+                    if str(s.getsockname()[1]) not in registry:
+                        ports.append(s.getsockname()[1])
+            finally:
+                for s in held:
+                    s.close()
+            registry.update({str(reserved_port): os.getpid() for reserved_port in ports})
+            write_port_registry(registry)
+        return ports
+    
+    def wait_for_port(process, port, timeout=30.0, poll_interval=0.1):
+        """Espera a que el puerto acepte conexiones; False si el proceso termina antes o se agota el timeout"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline and process.poll() is None:
+            try:
+                socket.create_connection(("localhost", port), timeout=0.5).close()
+                return True
+            except OSError:
+                time.sleep(poll_interval)
+        return False
+    
+    def release_ports(ports):
+        with open(f"{port_registry}.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            registry = read_port_registry()
+            for reserved_port in ports:
+                registry.pop(str(reserved_port), None)
+            write_port_registry(registry)
+    
+    def shutdown_processes(processes, grace_period=5.0, kill_timeout=2.0):
+        """Apaga procesos hijos en paralelo con un único plazo global
         
-        server_process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
+        Envía SIGTERM a todos a la vez, espera a todos contra el mismo deadline y escala a
+        SIGKILL del grupo de procesos con los que sigan vivos: el tiempo total está acotado
+        por grace_period + kill_timeout sea cual sea el número de procesos.
+        """
+        def signal_group(process, signum):
+            try:
+                # Solo se señala el grupo si el hijo lo lidera (start_new_session=True);
+                # si comparte grupo con el componente, killpg lo mataría también a él
+                if os.getpgid(process.pid) == process.pid:
+                    os.killpg(process.pid, signum)
+                else:
+                    process.send_signal(signum)
+            except ProcessLookupError:
+                pass
         
-        print(f"🚀 Servidor iniciado (PID: {server_process.pid})")
+        def wait_all(pending, timeout):
+            deadline = time.monotonic() + timeout
+            for process in pending:
+                try:
+                    process.wait(timeout=max(deadline - time.monotonic(), 0))
+                except subprocess.TimeoutExpired:
+                    pass
+            return [process for process in pending if process.poll() is None]
         
-        # Dar tiempo para arrancar
-        time.sleep(10)
+        running = [process for process in processes if process is not None and process.poll() is None]
+        if not running:
+            return
+        started = time.monotonic()
+        print(f"🔄 Terminando {len(running)} procesos: {[process.pid for process in running]}")
+        for process in running:
+            signal_group(process, signal.SIGTERM)
+        survivors = wait_all(running, grace_period)
+        if survivors:
+            print(f"⚠️ Procesos sin responder, forzando kill del grupo: {[process.pid for process in survivors]}")
+            for process in survivors:
+                signal_group(process, signal.SIGKILL)
+            wait_all(survivors, kill_timeout)
+        print(f"✅ {len(running)} procesos terminados en {time.monotonic() - started:.2f}s")
+    
+    stack_sampler.start()
+    try:
+        # Los sockets de la reserva se cierran antes del bind de spade run: si otro proceso
+        # ocupa el puerto entre medias, spade run termina y se reintenta con puertos nuevos
+        max_server_attempts = 3
+        for server_attempt in range(1, max_server_attempts + 1):
+            # Paso 1: Reservar puertos (cliente XMPP y servidor-servidor)
+            reserved_ports = allocate_ports(2)
+            test_data["port"], test_data["server_port"] = reserved_ports
+            port = test_data["port"]
+            print(f"🔌 Puertos reservados: cliente {port}, servidor {test_data['server_port']}")
+            
+            # Paso 2: Iniciar servidor SPADE
+            print(f"📡 Iniciando servidor SPADE (intento {server_attempt}/{max_server_attempts})...")
+            # --host localhost: con el 0.0.0.0 por defecto el dominio del servidor no coincide con
+            # el de los JIDs @localhost y no enruta los mensajes que le llegan por XMPP
+            cmd = [
+                "spade", "run",
+                "--host", "localhost",
+                "--client_port", str(port),
+                "--server_port", str(test_data["server_port"]),
+                "--memory"
+            ]
+            
+            server_process = subprocess.Popen(
+                cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                start_new_session=True
+            )
+            
+            print(f"🚀 Servidor iniciado (PID: {server_process.pid})")
+            
+            # Paso 3: Esperar a que el puerto acepte conexiones en lugar de un tiempo fijo;
+            # si spade run termina (puerto ocupado) se detecta en cuanto ocurre
+            print(f"🔍 Esperando a que el puerto {port} acepte conexiones...")
+            started = time.monotonic()
+            test_data["server_accessible"] = wait_for_port(server_process, port)
+            
+            # En el último intento el fallo se informa más abajo con la salida del servidor
+            if server_process.poll() is None or server_attempt == max_server_attempts:
+                break
+            output = " ".join(part.strip() for part in server_process.communicate() if part)
+            release_ports(reserved_ports)
+            reserved_ports = []
+            print(f"⚠️ spade run terminó al arrancar (código {server_process.returncode}): {output[-300:]}")
         
         # Verificar que el proceso sigue corriendo
         if server_process.poll() is None:
             test_data["server_started"] = True
             print("✅ Servidor SPADE iniciado correctamente")
             
-            # Paso 3: Probar conectividad
-            print(f"🔍 Probando conectividad al puerto {port}...")
-            max_attempts = 10
-            
-            for attempt in range(max_attempts):
-                try:
-                    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                        s.settimeout(3)
-                        result = s.connect_ex(('localhost', port))
-                        if result == 0:
-                            test_data["server_accessible"] = True
-                            print(f"✅ Servidor accesible en puerto {port}")
-                            break
-                except Exception:
-                    pass
-                
-                print(f"⏳ Intento {attempt + 1}/{max_attempts}...")
-                time.sleep(2)
-            
-            if not test_data["server_accessible"]:
-                print(f"❌ Servidor no accesible después de {max_attempts} intentos")
+            if test_data["server_accessible"]:
+                print(f"✅ Servidor accesible en puerto {port} tras {time.monotonic() - started:.2f}s")
+            else:
+                print(f"❌ Servidor no accesible en puerto {port}")
             
-            # Paso 3: Ejecutar test de agente (código embebido para Vertex AI)
+            # Paso 4: Ejecutar test de agente (código embebido para Vertex AI)
             print("🤖 Ejecutando test de agente simple...")
             try:
                 # Importar SPADE dentro del componente
-                from spade.agent import Agent
-                from spade.behaviour import CyclicBehaviour, OneShotBehaviour
+                from spade.agent import Agent, AuthenticationFailure
+                from spade.behaviour import CyclicBehaviour, OneShotBehaviour, PeriodicBehaviour
                 from spade.message import Message
                 from spade.template import Template
                 
+                # Dispatch indexado: Agent.dispatch compara cada mensaje con el template de
+                # todos los behaviours; aquí se indexan por performative/conversation-id
+                class IndexedDispatchAgent(Agent):
+                    INDEX_KEYS = ("performative", "conversation-id")
+                    # Logger de spade.agent: dispatch registra lo mismo que Agent.dispatch
+                    dispatch_logger = logging.getLogger("spade.Agent")
+                    # Los agentes sintéticos del benchmark de dispatch no pasan por la traza
+                    traced = True
+                    # Sin índice se recorren todos los behaviours: línea base del benchmark por el mismo código
+                    indexed = True
+                    
+                    def __init__(self, *args, **kwargs):
+                        super().__init__(*args, **kwargs)
+                        self.dispatch_index = {}
+                        self.unindexed_behaviours = []
+                        if self.traced:
+                            trace_recorder.attach(self.container)
+                    
+                    def index_key(self, template):
+                        # Solo los Template simples se indexan; AND/OR/NOT y sin template van a la lista lineal
+                        if type(template) is not Template:
+                            return None
+                        key = tuple(template.metadata.get(name) for name in self.INDEX_KEYS)
+                        return key if any(value is not None for value in key) else None
+                    
+                    def add_behaviour(self, behaviour, template=None):
+                        super().add_behaviour(behaviour, template)
+                        key = self.index_key(template)
+                        if key is None:
+                            self.unindexed_behaviours.append(behaviour)
+                        else:
+                            self.dispatch_index.setdefault(key, []).append(behaviour)
+                    
+                    def remove_behaviour(self, behaviour):
+                        super().remove_behaviour(behaviour)
+                        for bucket in [self.unindexed_behaviours, *self.dispatch_index.values()]:
+                            if behaviour in bucket:
+                                bucket.remove(behaviour)
+                    
+                    def dispatch(self, msg):
+                        if self.traced:
+                            trace_recorder.record(TRACE_RECV, msg)
+                        # Los mensajes de debug de Agent.dispatch, formateados solo si se van a emitir
+                        debug = self.dispatch_logger.isEnabledFor(logging.DEBUG)
+                        if debug:
+                            self.dispatch_logger.debug(f"Got message: {msg}")
+                        if self.indexed:
+                            performative, conversation = (msg.get_metadata(name) for name in self.INDEX_KEYS)
+                            candidates = list(self.unindexed_behaviours)
+                            for key in {(performative, conversation), (performative, None), (None, conversation)}:
+                                candidates.extend(self.dispatch_index.get(key, ()))
+                        else:
+                            candidates = self.behaviours
+                        
+                        # match() completo sobre los candidatos: el índice solo descarta, no decide
+                        tasks = []
+                        for behaviour in candidates:
+                            if behaviour.match(msg):
+                                tasks.append(self.submit(behaviour.enqueue(msg)))
+                                if debug:
+                                    self.dispatch_logger.debug(f"Message enqueued to behaviour: {behaviour}")
+                                self.traces.append(msg, category=str(behaviour))
+                        if not tasks:
+                            self.dispatch_logger.warning(f"No behaviour matched for message: {msg}")
+                            self.traces.append(msg)
+                        return tasks
+                
                 # Definir agente simple inline
-                class SimpleTestAgent(Agent):
+                class SimpleTestAgent(IndexedDispatchAgent):
                     def __init__(self, jid, password):
-                        super().__init__(jid, password)
+                        super().__init__(jid, password, port=port)
                         self.messages_sent = 0
                         self.messages_received = 0
                         self.max_messages = 5
                         self.message_history = []
+                        self.sent_at = {}
                         self.start_time = None
                         self.test_complete = False
+                        # Lo activa ReceiveBehaviour al terminar (todas las respuestas o timeout)
+                        self.done = asyncio.Event()
                     
                     class SendBehaviour(OneShotBehaviour):
                         async def run(self):
@@ -125,12 +875,15 @@ def test_spade_server_with_agent(test_results: Output[Dataset]) -> None:
                             print(f"📤 SimpleTestAgent iniciando envío de mensajes...")
                             
                             for i in range(self.agent.max_messages):
+                                metrics.inc("spade_behaviour_iterations_total", agent=self.agent.name, behaviour="SendBehaviour")
                                 msg = Message(to=str(self.agent.jid))
                                 msg.set_metadata("performative", "inform") 
                                 msg.set_metadata("conversation-id", "test-conversation")
                                 msg.body = f"test_message_{i}"
                                 
+                                self.agent.sent_at[msg.body] = time.monotonic()
                                 await self.send(msg)
+                                metrics.inc("spade_messages_sent_total", agent=self.agent.name)
                                 self.agent.messages_sent += 1
                                 print(f"📨 Mensaje enviado #{i}: {msg.body}")
                                 
@@ -147,9 +900,14 @@ def test_spade_server_with_agent(test_results: Output[Dataset]) -> None:
                     
                     class ReceiveBehaviour(CyclicBehaviour):
                         async def run(self):
+                            metrics.inc("spade_behaviour_iterations_total", agent=self.agent.name, behaviour="ReceiveBehaviour")
                             msg = await self.receive(timeout=30)
                             
                             if msg:
+                                metrics.inc("spade_messages_received_total", agent=self.agent.name)
+                                sent_at = self.agent.sent_at.pop(msg.body, None)
+                                if sent_at is not None:
+                                    metrics.observe("spade_message_rtt_seconds", time.monotonic() - sent_at, agent=self.agent.name)
                                 self.agent.messages_received += 1
                                 print(f"📥 Mensaje recibido #{self.agent.messages_received}: {msg.body}")
                                 
@@ -163,15 +921,24 @@ def test_spade_server_with_agent(test_results: Output[Dataset]) -> None:
                                 if self.agent.messages_received >= self.agent.max_messages:
                                     print(f"🎯 Test de mensajes completado: {self.agent.messages_received}/{self.agent.max_messages}")
                                     self.agent.test_complete = True
-                                    await self.agent.stop()
+                                    self.agent.done.set()
+                                    self.kill()
                             else:
+                                metrics.inc("spade_receive_timeouts_total", agent=self.agent.name, behaviour="ReceiveBehaviour")
                                 if self.agent.messages_sent >= self.agent.max_messages:
                                     print("⏰ Timeout en recepción, terminando agente")
                                     self.agent.test_complete = True
-                                    await self.agent.stop()
+                                    self.agent.done.set()
+                                    self.kill()
+                    
+                    async def _async_connect(self):
+                        # slixmpp resuelve el host con su puerto por defecto (5222) aunque SPADE le pase otro
+                        self.client.default_port = self.xmpp_port
+                        await super()._async_connect()
                     
                     async def setup(self):
                         print(f"🤖 SimpleTestAgent configurado: {self.jid}")
+                        metrics.track_xmpp_connection(self)
                         
                         template = Template()
                         template.set_metadata("performative", "inform")
@@ -191,8 +958,13 @@ def test_spade_server_with_agent(test_results: Output[Dataset]) -> None:
                     await agent.start()
                     print(f"✅ Agente iniciado: {agent.jid}")
                     
-                    while agent.is_alive() and not agent.test_complete:
-                        await asyncio.sleep(1)
+                    # Esperar la señal de fin en lugar de sondear is_alive()
+                    try:
+                        await asyncio.wait_for(agent.done.wait(), timeout=agent.max_messages + 60)
+                    except asyncio.TimeoutError:
+                        print("⚠️ Timeout esperando la finalización del agente")
+                    if agent.is_alive():
+                        await agent.stop()
                     
                     end_time = datetime.now()
                     duration = (end_time - agent.start_time).total_seconds() if agent.start_time else 0
@@ -214,9 +986,660 @@ def test_spade_server_with_agent(test_results: Output[Dataset]) -> None:
                         }
                     }
                 
+                # Agente de soak: carga sostenida a ritmo fijo que pasa por el servidor XMPP
+                class SoakTestAgent(SimpleTestAgent):
+                    def __init__(self, jid, password, duration, rate, window):
+                        super().__init__(jid, password)
+                        self.duration = duration
+                        self.rate = rate
+                        self.window = window
+                        self.max_messages = int(duration * rate)
+                        self.t0 = None
+                        self.send_times = []
+                        self.receptions = []
+                        self.memory_samples = []
+                        self.sending_done_at = None
+                    
+                    class SoakSendBehaviour(OneShotBehaviour):
+                        async def run(self):
+                            self.agent.start_time = datetime.now()
+                            self.agent.t0 = time.monotonic()
+                            print(f"📤 Soak: {self.agent.max_messages} mensajes a {self.agent.rate} msg/s durante {self.agent.duration}s")
+                            
+                            for i in range(self.agent.max_messages):
+                                # Calendario absoluto: los retrasos no se acumulan entre envíos
+                                delay = self.agent.t0 + i / self.agent.rate - time.monotonic()
+                                if delay > 0:
+                                    await asyncio.sleep(delay)
+                                
+                                msg = Message(to=str(self.agent.jid), sender=str(self.agent.jid))
+                                msg.set_metadata("performative", "inform")
+                                msg.set_metadata("conversation-id", "soak-conversation")
+                                msg.body = f"soak_{i}"
+                                
+                                now = time.monotonic()
+                                self.agent.sent_at[msg.body] = now
+                                self.agent.send_times.append(now - self.agent.t0)
+                                # Envío por XMPP: el contenedor de SPADE entregaría el mensaje localmente
+                                trace_recorder.record(TRACE_SEND, msg)
+                                await self._xmpp_send(msg)
+                                metrics.inc("spade_messages_sent_total", agent=self.agent.name)
+                                self.agent.messages_sent += 1
+                            
+                            self.agent.sending_done_at = time.monotonic()
+                            print(f"✅ Soak: envío completado ({self.agent.messages_sent} mensajes)")
+                    
+                    class SoakReceiveBehaviour(CyclicBehaviour):
+                        async def run(self):
+                            metrics.inc("spade_behaviour_iterations_total", agent=self.agent.name, behaviour="SoakReceiveBehaviour")
+                            msg = await self.receive(timeout=1)
+                            
+                            if msg:
+                                sent_at = self.agent.sent_at.pop(msg.body, None)
+                                if sent_at is not None:
+                                    now = time.monotonic()
+                                    self.agent.receptions.append((now - self.agent.t0, now - sent_at))
+                                    self.agent.messages_received += 1
+                                    metrics.inc("spade_messages_received_total", agent=self.agent.name)
+                                    metrics.observe("spade_message_rtt_seconds", now - sent_at, agent=self.agent.name)
+                            else:
+                                metrics.inc("spade_receive_timeouts_total", agent=self.agent.name, behaviour="SoakReceiveBehaviour")
+                            
+                            # Fin: todo recibido, o 5s de drenaje tras el último envío (el resto cuenta como pérdida)
+                            if self.agent.sending_done_at is not None and (
+                                not self.agent.sent_at or time.monotonic() - self.agent.sending_done_at > 5
+                            ):
+                                self.agent.test_complete = True
+                                self.agent.done.set()
+                                self.kill()
+                    
+                    class MemoryBehaviour(PeriodicBehaviour):
+                        async def run(self):
+                            elapsed = time.monotonic() - self.agent.t0 if self.agent.t0 else 0.0
+                            self.agent.memory_samples.append({
+                                "elapsed_seconds": round(elapsed, 3),
+                                "agent_rss_kb": read_rss_kb(os.getpid()),
+                                "server_rss_kb": read_rss_kb(server_process.pid)
+                            })
+                    
+                    async def setup(self):
+                        print(f"🤖 SoakTestAgent configurado: {self.jid}")
+                        metrics.track_xmpp_connection(self)
+                        
+                        template = Template()
+                        template.set_metadata("performative", "inform")
+                        template.set_metadata("conversation-id", "soak-conversation")
+                        
+                        self.add_behaviour(self.SoakReceiveBehaviour(), template)
+                        self.add_behaviour(self.MemoryBehaviour(period=self.window))
+                        self.add_behaviour(self.SoakSendBehaviour())
+                
+                def build_soak_report(agent):
+                    """Agrega los envíos/recepciones del soak por ventanas de tiempo"""
+                    windows = []
+                    for index in range(max(1, math.ceil(agent.duration / agent.window))):
+                        start, end = index * agent.window, (index + 1) * agent.window
+                        latencies = [latency for at, latency in agent.receptions if start <= at < end]
+                        memory = [sample for sample in agent.memory_samples if sample["elapsed_seconds"] <= end]
+                        windows.append({
+                            "window": index,
+                            "start_seconds": start,
+                            "sent": sum(1 for at in agent.send_times if start <= at < end),
+                            "received": len(latencies),
+                            "throughput_msgs_per_second": len(latencies) / agent.window,
+                            "latency_p50_seconds": percentile(latencies, 50),
+                            "latency_p95_seconds": percentile(latencies, 95),
+                            "latency_p99_seconds": percentile(latencies, 99),
+                            "agent_rss_kb": memory[-1]["agent_rss_kb"] if memory else None,
+                            "server_rss_kb": memory[-1]["server_rss_kb"] if memory else None
+                        })
+                    
+                    latencies = [latency for _, latency in agent.receptions]
+                    # La primera ventana incluye el arranque: el régimen estacionario empieza en la segunda
+                    steady = [w["throughput_msgs_per_second"] for w in windows[1:]] or [windows[0]["throughput_msgs_per_second"]]
+                    
+                    def memory_growth(key):
+                        points = [
+                            (sample["elapsed_seconds"], sample[key])
+                            for sample in agent.memory_samples if sample[key] is not None
+                        ]
+                        if not points:
+                            return {"first_kb": None, "last_kb": None, "growth_kb": None, "slope_kb_per_minute": None}
+                        slope = linear_slope(points)
+                        return {
+                            "first_kb": points[0][1],
+                            "last_kb": points[-1][1],
+                            "growth_kb": points[-1][1] - points[0][1],
+                            "slope_kb_per_minute": slope * 60 if slope is not None else None
+                        }
+                    
+                    lost = agent.messages_sent - agent.messages_received
+                    return {
+                        "duration_seconds": agent.duration,
+                        "target_rate": agent.rate,
+                        "window_seconds": agent.window,
+                        "messages_sent": agent.messages_sent,
+                        "messages_received": agent.messages_received,
+                        "messages_lost": lost,
+                        "loss_rate": lost / agent.messages_sent if agent.messages_sent else None,
+                        "steady_state_throughput_msgs_per_second": percentile(steady, 50),
+                        "latency_p50_seconds": percentile(latencies, 50),
+                        "latency_p95_seconds": percentile(latencies, 95),
+                        "latency_p99_seconds": percentile(latencies, 99),
+                        "memory": {
+                            "agent": memory_growth("agent_rss_kb"),
+                            "server": memory_growth("server_rss_kb")
+                        },
+                        "windows": windows,
+                        "memory_samples": agent.memory_samples
+                    }
+                
+                async def run_soak_test():
+                    print(f"🚀 Iniciando soak test: {soak_duration}s a {soak_rate} msg/s...")
+                    
+                    agent = SoakTestAgent("soakagent@localhost", "soak_password", soak_duration, soak_rate, soak_window)
+                    await agent.start()
+                    print(f"✅ Agente iniciado: {agent.jid}")
+                    
+                    try:
+                        await asyncio.wait_for(agent.done.wait(), timeout=soak_duration + 60)
+                    except asyncio.TimeoutError:
+                        print("⚠️ Timeout esperando la finalización del soak")
+                    if agent.is_alive():
+                        await agent.stop()
+                    
+                    end_time = datetime.now()
+                    duration = (end_time - agent.start_time).total_seconds() if agent.start_time else 0
+                    
+                    return {
+                        "agent_test_summary": {
+                            "success": agent.messages_sent == agent.messages_received == agent.max_messages,
+                            "messages_sent": agent.messages_sent,
+                            "messages_received": agent.messages_received,
+                            "expected_messages": agent.max_messages,
+                            "test_duration": duration,
+                            "start_time": agent.start_time.isoformat() if agent.start_time else None,
+                            "end_time": end_time.isoformat()
+                        },
+                        "soak": build_soak_report(agent),
+                        "agent_info": {
+                            "jid": str(agent.jid),
+                            "status": "completed" if agent.test_complete else "timeout"
+                        }
+                    }
+                
+                # Codificación de cuerpos binarios: XMPP solo transporta texto XML
+                encoders = {"base64": (base64.b64encode, base64.b64decode), "base85": (base64.b85encode, base64.b85decode)}
+                if payload_encoding not in encoders:
+                    raise ValueError(f"payload_encoding desconocido: {payload_encoding}")
+                if payload_compression not in ("none", "zlib"):
+                    raise ValueError(f"payload_compression desconocido: {payload_compression}")
+                
+                def make_payload(size):
+                    """Payload estructurado (registros JSON) recortado al tamaño exacto en bytes"""
+                    record = json.dumps({
+                        "agent": "vehicle_{:05d}", "position": [39.4699, -0.3763], "speed": 42.5,
+                        "status": "moving", "route": [[39.47, -0.37], [39.46, -0.36], [39.45, -0.35]]
+                    })
+                    chunks = []
+                    length = 0
+                    index = 0
+                    while length < size:
+                        chunk = record.replace("{:05d}", f"{index:05d}").encode()
+                        chunks.append(chunk)
+                        length += len(chunk)
+                        index += 1
+                    return b"".join(chunks)[:size]
+                
+                def encode_body(payload):
+                    if payload_compression == "zlib":
+                        payload = zlib.compress(payload)
+                    return encoders[payload_encoding][0](payload).decode("ascii")
+                
+                def decode_body(body):
+                    payload = encoders[payload_encoding][1](body.encode("ascii"))
+                    if payload_compression == "zlib":
+                        payload = zlib.decompress(payload)
+                    return payload
+                
+                # Agente del barrido de tamaños: cada tamaño se envía en ráfaga por XMPP y se espera a recibirla
+                class PayloadSweepAgent(SimpleTestAgent):
+                    def __init__(self, jid, password, sizes, messages_per_size):
+                        super().__init__(jid, password)
+                        self.sizes = sizes
+                        self.messages_per_size = messages_per_size
+                        self.max_messages = len(sizes) * messages_per_size
+                        self.results = {}
+                        self.size_done = None
+                    
+                    class SweepSendBehaviour(OneShotBehaviour):
+                        async def run(self):
+                            self.agent.start_time = datetime.now()
+                            
+                            for size in self.agent.sizes:
+                                payload = make_payload(size)
+                                digest = hashlib.sha1(payload).hexdigest()
+                                
+                                encode_start = time.perf_counter()
+                                body = encode_body(payload)
+                                encode_seconds = time.perf_counter() - encode_start
+                                
+                                result = {
+                                    "size_bytes": size,
+                                    "body_bytes": len(body),
+                                    "encode_seconds": encode_seconds,
+                                    "decode_seconds": [],
+                                    "latencies": [],
+                                    "corrupted": 0,
+                                    "sent": 0,
+                                    "first_send": None,
+                                    "last_receive": None,
+                                    "digest": digest
+                                }
+                                self.agent.results[size] = result
+                                self.agent.size_done = asyncio.Event()
+                                print(f"📦 Barrido: {size} B -> cuerpo de {len(body)} B ({payload_compression}/{payload_encoding})")
+                                
+                                for i in range(self.agent.messages_per_size):
+                                    msg = Message(to=str(self.agent.jid), sender=str(self.agent.jid))
+                                    msg.set_metadata("performative", "inform")
+                                    msg.set_metadata("conversation-id", "payload-sweep")
+                                    msg.set_metadata("payload-id", f"{size}:{i}")
+                                    msg.body = body
+                                    
+                                    now = time.monotonic()
+                                    if result["first_send"] is None:
+                                        result["first_send"] = now
+                                    self.agent.sent_at[f"{size}:{i}"] = now
+                                    trace_recorder.record(TRACE_SEND, msg)
+                                    await self._xmpp_send(msg)
+                                    metrics.inc("spade_messages_sent_total", agent=self.agent.name)
+                                    self.agent.messages_sent += 1
+                                    result["sent"] += 1
+                                
+                                try:
+                                    await asyncio.wait_for(self.agent.size_done.wait(), timeout=30)
+                                except asyncio.TimeoutError:
+                                    print(f"⚠️ Barrido: timeout esperando los mensajes de {size} B")
+                            
+                            self.agent.test_complete = True
+                            self.agent.done.set()
+                    
+                    class SweepReceiveBehaviour(CyclicBehaviour):
+                        async def run(self):
+                            msg = await self.receive(timeout=5)
+                            if not msg:
+                                metrics.inc("spade_receive_timeouts_total", agent=self.agent.name, behaviour="SweepReceiveBehaviour")
+                                return
+                            
+                            sent_at = self.agent.sent_at.pop(msg.get_metadata("payload-id"), None)
+                            if sent_at is None:
+                                return
+                            now = time.monotonic()
+                            size = int(msg.get_metadata("payload-id").split(":")[0])
+                            result = self.agent.results[size]
+                            
+                            decode_start = time.perf_counter()
+                            payload = decode_body(msg.body)
+                            result["decode_seconds"].append(time.perf_counter() - decode_start)
+                            if hashlib.sha1(payload).hexdigest() != result["digest"]:
+                                result["corrupted"] += 1
+                            
+                            result["latencies"].append(now - sent_at)
+                            result["last_receive"] = now
+                            self.agent.messages_received += 1
+                            metrics.inc("spade_messages_received_total", agent=self.agent.name)
+                            metrics.observe("spade_message_rtt_seconds", now - sent_at, agent=self.agent.name)
+                            
+                            if len(result["latencies"]) == self.agent.messages_per_size:
+                                self.agent.size_done.set()
+                    
+                    async def setup(self):
+                        print(f"🤖 PayloadSweepAgent configurado: {self.jid}")
+                        metrics.track_xmpp_connection(self)
+                        
+                        template = Template()
+                        template.set_metadata("performative", "inform")
+                        template.set_metadata("conversation-id", "payload-sweep")
+                        
+                        self.add_behaviour(self.SweepReceiveBehaviour(), template)
+                        self.add_behaviour(self.SweepSendBehaviour())
+                
+                def build_sweep_report(agent):
+                    """Throughput y latencia por tamaño de cuerpo"""
+                    rows = []
+                    for size in agent.sizes:
+                        result = agent.results.get(size)
+                        if result is None:
+                            continue
+                        received = len(result["latencies"])
+                        elapsed = (
+                            result["last_receive"] - result["first_send"]
+                            if result["last_receive"] is not None else None
+                        )
+                        rows.append({
+                            "size_bytes": size,
+                            "body_bytes": result["body_bytes"],
+                            "wire_ratio": result["body_bytes"] / size if size else None,
+                            "sent": result["sent"],
+                            "received": received,
+                            "corrupted": result["corrupted"],
+                            "throughput_msgs_per_second": received / elapsed if elapsed else None,
+                            "throughput_mb_per_second": received * size / elapsed / 1e6 if elapsed else None,
+                            "latency_p50_seconds": percentile(result["latencies"], 50),
+                            "latency_p95_seconds": percentile(result["latencies"], 95),
+                            "encode_seconds": result["encode_seconds"],
+                            "decode_p50_seconds": percentile(result["decode_seconds"], 50)
+                        })
+                    return {
+                        "compression": payload_compression,
+                        "encoding": payload_encoding,
+                        "messages_per_size": agent.messages_per_size,
+                        "sizes": rows
+                    }
+                
+                async def run_payload_sweep():
+                    sizes = [int(size) for size in payload_sizes.split(",") if size.strip()]
+                    print(f"🚀 Iniciando barrido de tamaños de payload: {sizes}")
+                    
+                    agent = PayloadSweepAgent("sweepagent@localhost", "sweep_password", sizes, payload_messages)
+                    await agent.start()
+                    print(f"✅ Agente iniciado: {agent.jid}")
+                    
+                    try:
+                        await asyncio.wait_for(agent.done.wait(), timeout=30 * len(sizes) + 60)
+                    except asyncio.TimeoutError:
+                        print("⚠️ Timeout esperando la finalización del barrido")
+                    if agent.is_alive():
+                        await agent.stop()
+                    
+                    end_time = datetime.now()
+                    duration = (end_time - agent.start_time).total_seconds() if agent.start_time else 0
+                    sweep = build_sweep_report(agent)
+                    
+                    return {
+                        "agent_test_summary": {
+                            "success": (
+                                agent.messages_sent == agent.messages_received == agent.max_messages
+                                and not any(row["corrupted"] for row in sweep["sizes"])
+                            ),
+                            "messages_sent": agent.messages_sent,
+                            "messages_received": agent.messages_received,
+                            "expected_messages": agent.max_messages,
+                            "test_duration": duration,
+                            "start_time": agent.start_time.isoformat() if agent.start_time else None,
+                            "end_time": end_time.isoformat()
+                        },
+                        "payload_sweep": sweep,
+                        "agent_info": {
+                            "jid": str(agent.jid),
+                            "status": "completed" if agent.test_complete else "timeout"
+                        }
+                    }
+                
+                async def run_dispatch_benchmark(behaviour_counts, messages=2000):
+                    """Coste por mensaje del dispatch lineal frente al indexado
+                    
+                    Ambos lados usan IndexedDispatchAgent.dispatch (el lineal con el índice
+                    desactivado), así la diferencia es solo la búsqueda de candidatos. Agent.dispatch
+                    de SPADE se mide aparte como referencia: formatea sus mensajes de debug siempre.
+                    """
+                    class IdleBehaviour(CyclicBehaviour):
+                        async def run(self):
+                            await self.receive(timeout=1)
+                    
+                    # Sin grabar: los mensajes sintéticos no deben acabar en message_trace
+                    # ni el coste del recorder sumarse al dispatch indexado
+                    class UntracedDispatchAgent(IndexedDispatchAgent):
+                        traced = False
+                    
+                    class UntracedLinearAgent(UntracedDispatchAgent):
+                        indexed = False
+                    
+                    rows = []
+                    for count in behaviour_counts:
+                        row = {"behaviours": count, "messages": messages}
+                        for label, agent_class in (
+                            ("spade", Agent), ("linear", UntracedLinearAgent), ("indexed", UntracedDispatchAgent)
+                        ):
+                            # Agente sin arrancar: dispatch() no necesita conexión XMPP
+                            agent = agent_class(f"dispatch_{label}@localhost", "bench_password")
+                            for i in range(count):
+                                template = Template()
+                                template.set_metadata("performative", "inform")
+                                template.set_metadata("conversation-id", f"conversation-{i}")
+                                agent.add_behaviour(IdleBehaviour(), template)
+                            
+                            batch = []
+                            for i in range(messages):
+                                msg = Message(to=str(agent.jid))
+                                msg.set_metadata("performative", "inform")
+                                msg.set_metadata("conversation-id", f"conversation-{(i * 7919) % count}")
+                                batch.append(msg)
+                            
+                            tasks = []
+                            start = time.perf_counter()
+                            for msg in batch:
+                                tasks.extend(agent.dispatch(msg))
+                            elapsed = time.perf_counter() - start
+                            await asyncio.gather(*tasks)
+                            
+                            row[f"{label}_us_per_message"] = round(elapsed / messages * 1e6, 3)
+                            row[f"{label}_delivered"] = len(tasks)
+                        row["speedup"] = round(row["linear_us_per_message"] / row["indexed_us_per_message"], 2)
+                        print(f"📊 Dispatch con {count} behaviours: lineal {row['linear_us_per_message']} µs, "
+                              f"indexado {row['indexed_us_per_message']} µs (SPADE {row['spade_us_per_message']} µs)")
+                        rows.append(row)
+                    return rows
+                
+                # Arranque masivo: todas las cuentas en una conexión y agentes en paralelo
+                async def register_accounts(accounts, timeout=60.0):
+                    """Registra las cuentas (jid, password) con IQ XEP-0077 en un mismo stream antes de autenticar"""
+                    from spade.xmpp_client import XMPPClient
+                    from slixmpp.exceptions import IqError, IqTimeout
+                    
+                    outcome = {"registered": 0, "existing": 0, "failed": 0}
+                    
+                    async def register_one(client, jid, password):
+                        iq = client.Iq()
+                        iq["type"] = "set"
+                        iq["register"]["username"] = jid.split("@")[0]
+                        iq["register"]["password"] = password
+                        try:
+                            await iq.send(timeout=timeout)
+                            outcome["registered"] += 1
+                        except IqError as e:
+                            outcome["existing" if e.condition == "conflict" else "failed"] += 1
+                        except IqTimeout:
+                            outcome["failed"] += 1
+                    
+                    class BulkRegistrationClient(XMPPClient):
+                        async def register(self, event):
+                            await asyncio.gather(*(register_one(self, jid, password) for jid, password in accounts))
+                    
+                    # La conexión se autentica después con la primera cuenta del lote
+                    client = BulkRegistrationClient(accounts[0][0], accounts[0][1], False, True)
+                    client.default_port = port
+                    # Conexión de un solo uso: sin pings de keepalive que puedan disparar una reconexión
+                    client["xep_0199"].disable_keepalive()
+                    finished = asyncio.Event()
+                    for event in ("session_start", "failed_all_auth", "disconnected"):
+                        client.add_event_handler(event, lambda _: finished.set())
+                    client.connect()
+                    try:
+                        await asyncio.wait_for(finished.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        print(f"⚠️ Registro en lote sin respuesta en {timeout}s")
+                    if client.is_connected():
+                        await client.disconnect()
+                    else:
+                        client.cancel_connection_attempt()
+                    return outcome
+                
+                async def start_agents(agents):
+                    """Registra en lote y arranca con como mucho agent_start_concurrency conexiones en curso"""
+                    started = time.perf_counter()
+                    registration = await register_accounts([(str(agent.jid), agent.password) for agent in agents]) if agents else {}
+                    registration_seconds = time.perf_counter() - started
+                    semaphore = asyncio.Semaphore(max(1, agent_start_concurrency))
+                    latencies = []
+                    
+                    async def start_one(agent):
+                        async with semaphore:
+                            agent_started = time.perf_counter()
+                            try:
+                                await agent.start(auto_register=False)
+                            except AuthenticationFailure:
+                                # Cuenta que no entró en el lote: registro in-band en su propia conexión
+                                await agent.start(auto_register=True)
+                            latencies.append(time.perf_counter() - agent_started)
+                    
+                    await asyncio.gather(*(start_one(agent) for agent in agents))
+                    return {
+                        "agents": len(agents),
+                        "concurrency": max(1, agent_start_concurrency),
+                        "registration": registration,
+                        "registration_seconds": round(registration_seconds, 3),
+                        "total_seconds": round(time.perf_counter() - started, 3),
+                        "latency_p50_seconds": percentile(latencies, 50),
+                        "latency_p95_seconds": percentile(latencies, 95),
+                        "latency_max_seconds": max(latencies, default=None)
+                    }
+                
+                # Repetición de una traza grabada contra el servidor local
+                class TraceReplayAgent(SimpleTestAgent):
+                    def __init__(self, jid, password, arrivals):
+                        super().__init__(jid, password)
+                        self.arrivals = arrivals
+                    
+                    class ReplayReceiveBehaviour(CyclicBehaviour):
+                        async def run(self):
+                            msg = await self.receive(timeout=1)
+                            if msg and msg.get_metadata("replay-seq") is not None:
+                                self.agent.arrivals[int(msg.get_metadata("replay-seq"))] = time.perf_counter()
+                                metrics.inc("spade_messages_received_total", agent=self.agent.name)
+                    
+                    async def setup(self):
+                        metrics.track_xmpp_connection(self)
+                        self.add_behaviour(self.ReplayReceiveBehaviour())
+                
+                async def run_trace_replay():
+                    recorded_start, events = read_trace(trace_replay_path)
+                    # Se repiten los envíos; una traza solo con recepciones se repite desde ellas
+                    schedule = [event for event in events if event[1] == TRACE_SEND] or events
+                    speed_label = "máxima velocidad" if trace_replay_speed <= 0 else f"x{trace_replay_speed}"
+                    print(f"🎞️ Repitiendo {len(schedule)} de {len(events)} eventos de {trace_replay_path} ({speed_label})")
+                    
+                    # Un agente por JID de la traza, con el dominio del servidor local
+                    def local_jid(jid):
+                        return f"{jid.split('@')[0]}@localhost"
+                    
+                    arrivals = {}
+                    agents = {}
+                    for _, _, sender, recipient, _, _ in schedule:
+                        for jid in (local_jid(sender), local_jid(recipient)):
+                            if jid not in agents:
+                                agents[jid] = TraceReplayAgent(jid, "replay_password", arrivals)
+                    startup = await start_agents(list(agents.values()))
+                    print(f"⚡ {startup['agents']} agentes arrancados en {startup['total_seconds']}s "
+                          f"(registro en lote {startup['registration_seconds']}s)")
+                    
+                    sent_at = {}
+                    lags = []
+                    origin = schedule[0][0] if schedule else 0.0
+                    start = time.perf_counter()
+                    for seq, (at, _, sender, recipient, metadata, body_size) in enumerate(schedule):
+                        # Calendario absoluto respecto al inicio (sin espera entre envíos a máxima velocidad)
+                        if trace_replay_speed > 0:
+                            delay = start + (at - origin) / trace_replay_speed - time.perf_counter()
+                            if delay > 0:
+                                await asyncio.sleep(delay)
+                            lags.append(max(0.0, -delay))
+                        
+                        agent = agents[local_jid(sender)]
+                        msg = Message(to=local_jid(recipient), sender=str(agent.jid))
+                        for key, value in metadata.items():
+                            msg.set_metadata(key, value)
+                        msg.set_metadata("replay-seq", str(seq))
+                        # Un cuerpo vacío no se entrega por XMPP (los mensajes de control viajaban por el contenedor)
+                        msg.body = "x" * max(body_size, 1)
+                        
+                        sent_at[seq] = time.perf_counter()
+                        trace_recorder.record(TRACE_SEND, msg)
+                        # Siempre por XMPP: la repetición mide el servidor, no la entrega local del contenedor
+                        msg.prepare(agent.client).send()
+                        metrics.inc("spade_messages_sent_total", agent=agent.name)
+                    sending_done = time.perf_counter()
+                    
+                    # Margen para que lleguen los mensajes en vuelo
+                    drain_deadline = time.perf_counter() + 5
+                    while len(arrivals) < len(schedule) and time.perf_counter() < drain_deadline:
+                        await asyncio.sleep(0.05)
+                    
+                    await asyncio.gather(*(agent.stop() for agent in agents.values() if agent.is_alive()))
+                    
+                    latencies = [arrivals[seq] - sent_at[seq] for seq in arrivals if seq in sent_at]
+                    last_arrival = max(arrivals.values(), default=sending_done)
+                    replay_duration = max(last_arrival, sending_done) - start
+                    report = {
+                        "trace": trace_replay_path,
+                        "recorded_at": datetime.fromtimestamp(recorded_start).isoformat(),
+                        "events": len(events),
+                        "replayed": len(schedule),
+                        "speed": trace_replay_speed,
+                        "agents": len(agents),
+                        "delivered": len(arrivals),
+                        "lost": len(schedule) - len(arrivals),
+                        "recorded_duration_seconds": round(schedule[-1][0] - origin, 6) if schedule else 0.0,
+                        "replay_duration_seconds": round(replay_duration, 6),
+                        "throughput_msgs_per_second": round(len(arrivals) / replay_duration, 3) if replay_duration > 0 else None,
+                        "latency_p50_seconds": percentile(latencies, 50),
+                        "latency_p95_seconds": percentile(latencies, 95),
+                        "latency_p99_seconds": percentile(latencies, 99),
+                        "schedule_lag_p99_seconds": percentile(lags, 99),
+                        "schedule_lag_max_seconds": max(lags, default=None),
+                        "agent_startup": startup
+                    }
+                    print(f"🎞️ Repetición: {report['delivered']}/{report['replayed']} entregados en {report['replay_duration_seconds']}s")
+                    
+                    return {
+                        "agent_test_summary": {
+                            "success": bool(schedule) and report["lost"] == 0,
+                            "messages_sent": len(sent_at),
+                            "messages_received": len(arrivals),
+                            "expected_messages": len(schedule),
+                            "test_duration": replay_duration,
+                            "start_time": datetime.now().isoformat(),
+                            "end_time": datetime.now().isoformat()
+                        },
+                        "trace_replay": report,
+                        "agent_info": {
+                            "jid": ", ".join(agents),
+                            "status": "completed" if report["lost"] == 0 else "timeout"
+                        }
+                    }
+                
+                def run_profiled(coroutine):
+                    """asyncio.run registrando el loop en el perfilador para etiquetar las tareas"""
+                    async def main():
+                        stack_sampler.watch_loop()
+                        return await coroutine
+                    return asyncio.run(main())
+                
                 # Ejecutar el test
                 import asyncio
-                agent_results = asyncio.run(run_agent_test())
+                if dispatch_benchmark_behaviours.strip():
+                    counts = [int(count) for count in dispatch_benchmark_behaviours.split(",") if count.strip()]
+                    test_data["dispatch_benchmark"] = run_profiled(run_dispatch_benchmark(counts))
+                
+                if trace_replay_path:
+                    agent_results = run_profiled(run_trace_replay())
+                elif payload_sizes.strip():
+                    agent_results = run_profiled(run_payload_sweep())
+                elif soak_duration > 0:
+                    agent_results = run_profiled(run_soak_test())
+                else:
+                    agent_results = run_profiled(run_agent_test())
                 
                 # Añadir resultados del agente
                 test_data["agent_test"] = agent_results
@@ -228,10 +1651,6 @@ def test_spade_server_with_agent(test_results: Output[Dataset]) -> None:
                 traceback.print_exc()
                 test_data["agent_error"] = str(e)
             
-            # Mantener servidor corriendo un poco más
-            print("⏱️ Manteniendo servidor activo (5 segundos más)...")
-            time.sleep(5)
-            
         else:
             print("❌ El servidor SPADE falló al iniciar")
             stdout, stderr = server_process.communicate()
@@ -242,16 +1661,26 @@ def test_spade_server_with_agent(test_results: Output[Dataset]) -> None:
         test_data["error"] = str(e)
     
     finally:
+        metrics.stop(textfile=metrics_textfile)
+        
+        # El perfil cubre el arranque del servidor y los tests, no el cleanup
+        stack_sampler.stop()
+        test_data["profile"] = stack_sampler.summary()
+        if profile_output is not None:
+            # Siempre se escribe el artifact (sin pilas si no se perfila) para que exista la salida
+            test_data["profile"]["file_bytes"] = stack_sampler.write_collapsed(profile_output.path)
+        
+        if message_trace is not None:
+            # Siempre se escribe el artifact (sin eventos si no se graba) para que exista la salida
+            test_data["message_trace"] = {
+                "recorded": record_trace,
+                "events": len(trace_recorder.events),
+                "file_bytes": write_trace(message_trace.path, trace_recorder.events)
+            }
+        
         # Cleanup del servidor
-        if server_process and server_process.poll() is None:
-            print("🧹 Terminando servidor...")
-            server_process.terminate()
-            try:
-                server_process.wait(timeout=5)
-                print("✅ Servidor terminado")
-            except subprocess.TimeoutExpired:
-                server_process.kill()
-                server_process.wait()
+        shutdown_processes([server_process])
+        release_ports(reserved_ports)
         
         # Finalizar mediciones
         test_data["end_time"] = datetime.now().isoformat()
@@ -274,8 +1703,61 @@ def test_spade_server_with_agent(test_results: Output[Dataset]) -> None:
         test_data["test_success"] = success
         test_data["summary"] = f"SPADE server test {'PASSED' if success else 'FAILED'}"
         
+        # Registro tipado: throughput y latencia del modo ejecutado (soak o repetición de traza)
+        if results_record is not None or results_table is not None:
+            agent_test = test_data.get("agent_test", {})
+            agent_summary = agent_test.get("agent_test_summary", {})
+            detail = agent_test.get("soak") or agent_test.get("trace_replay") or {}
+            dispatch_rows = test_data.get("dispatch_benchmark") or []
+            config = {
+                "soak_duration": soak_duration,
+                "soak_rate": soak_rate,
+                "soak_window": soak_window,
+                "payload_sizes": payload_sizes,
+                "payload_messages": payload_messages,
+                "payload_compression": payload_compression,
+                "payload_encoding": payload_encoding,
+                "dispatch_benchmark_behaviours": dispatch_benchmark_behaviours,
+                "record_trace": record_trace,
+                "trace_replay_path": trace_replay_path,
+                "trace_replay_speed": trace_replay_speed,
+                "agent_start_concurrency": agent_start_concurrency
+            }
+            write_run_record(
+                RunRecord(
+                    component="test_spade_server_with_agent",
+                    started_at=test_data["start_time"],
+                    finished_at=test_data["end_time"],
+                    success=bool(success),
+                    duration_seconds=test_data["test_duration"],
+                    config=config,
+                    config_hash=config_fingerprint(config),
+                    messages_sent=agent_summary.get("messages_sent"),
+                    messages_received=agent_summary.get("messages_received"),
+                    throughput_msgs_per_second=detail.get(
+                        "steady_state_throughput_msgs_per_second", detail.get("throughput_msgs_per_second")
+                    ),
+                    latency_p50_seconds=detail.get("latency_p50_seconds"),
+                    latency_p95_seconds=detail.get("latency_p95_seconds"),
+                    metrics={
+                        "agent_duration_seconds": agent_summary.get("test_duration"),
+                        "latency_p99_seconds": detail.get("latency_p99_seconds"),
+                        "loss_rate": detail.get("loss_rate"),
+                        "schedule_lag_p99_seconds": detail.get("schedule_lag_p99_seconds"),
+                        "dispatch_max_speedup": max((row["speedup"] for row in dispatch_rows), default=None)
+                    },
+                    error=test_data["error"] or test_data.get("agent_error")
+                ),
+                results_record.path if results_record is not None else None,
+                results_table.path if results_table is not None else None
+            )
+        
         # Crear resultado para el artifact con información del agente
         agent_info = ""
+        
+        def fmt_ms(seconds):
+            return f"{seconds * 1000:.2f} ms" if seconds is not None else "N/A"
+        
         if "agent_test" in test_data:
             agent_data = test_data["agent_test"]["agent_test_summary"]
             agent_info = f"""
@@ -285,12 +1767,89 @@ Agent Test Results:
 - Messages Received: {agent_data['messages_received']}
 - Expected Messages: {agent_data['expected_messages']}
 - Agent Duration: {agent_data['test_duration']:.2f} seconds
+"""
+            soak = test_data["agent_test"].get("soak")
+            if soak:
+                window_lines = "\n".join(
+                    f"  [{w['start_seconds']:>6.0f}s] sent {w['sent']}, recv {w['received']}, "
+                    f"{w['throughput_msgs_per_second']:.1f} msg/s, "
+                    f"p50/p95/p99 {fmt_ms(w['latency_p50_seconds'])} / {fmt_ms(w['latency_p95_seconds'])} / "
+                    f"{fmt_ms(w['latency_p99_seconds'])}, RSS agent/server {w['agent_rss_kb']} / {w['server_rss_kb']} kB"
+                    for w in soak["windows"]
+                )
+                memory = soak["memory"]
+                agent_info += f"""
+Soak Test ({soak['duration_seconds']}s @ {soak['target_rate']} msg/s, ventanas de {soak['window_seconds']}s):
+- Steady-State Throughput: {soak['steady_state_throughput_msgs_per_second']} msgs/s
+- Latency p50/p95/p99: {fmt_ms(soak['latency_p50_seconds'])} / {fmt_ms(soak['latency_p95_seconds'])} / {fmt_ms(soak['latency_p99_seconds'])}
+- Messages Lost: {soak['messages_lost']} (loss rate {soak['loss_rate']})
+- Agent RSS Growth: {memory['agent']['growth_kb']} kB ({memory['agent']['slope_kb_per_minute']} kB/min)
+- Server RSS Growth: {memory['server']['growth_kb']} kB ({memory['server']['slope_kb_per_minute']} kB/min)
+- Windows:
+{window_lines}
+"""
+            sweep = test_data["agent_test"].get("payload_sweep")
+            if sweep:
+                size_lines = "\n".join(
+                    f"  {row['size_bytes']:>8} B (cuerpo {row['body_bytes']} B): recv {row['received']}/{row['sent']}, "
+                    f"{row['throughput_msgs_per_second'] or 0:.1f} msg/s, {row['throughput_mb_per_second'] or 0:.2f} MB/s, "
+                    f"p50/p95 {fmt_ms(row['latency_p50_seconds'])} / {fmt_ms(row['latency_p95_seconds'])}, "
+                    f"encode {fmt_ms(row['encode_seconds'])}, decode p50 {fmt_ms(row['decode_p50_seconds'])}"
+                    + (f", {row['corrupted']} corruptos" if row['corrupted'] else "")
+                    for row in sweep["sizes"]
+                )
+                agent_info += f"""
+Payload Size Sweep ({sweep['messages_per_size']} mensajes por tamaño, {sweep['compression']}/{sweep['encoding']}):
+{size_lines}
 """
         elif "agent_error" in test_data:
             agent_info = f"""
 Agent Test Results:
 - Agent Test Success: False
 - Agent Error: {test_data['agent_error']}
+"""
+        
+        replay = test_data.get("agent_test", {}).get("trace_replay")
+        if replay:
+            agent_info += f"""
+Trace Replay ({replay['trace']}, velocidad {replay['speed'] or 'máxima'}):
+- Messages Replayed / Delivered / Lost: {replay['replayed']} / {replay['delivered']} / {replay['lost']} ({replay['agents']} agentes)
+- Recorded / Replay Duration: {replay['recorded_duration_seconds']:.3f}s / {replay['replay_duration_seconds']:.3f}s
+- Throughput: {replay['throughput_msgs_per_second']} msg/s
+- Latency p50/p95/p99: {fmt_ms(replay['latency_p50_seconds'])} / {fmt_ms(replay['latency_p95_seconds'])} / {fmt_ms(replay['latency_p99_seconds'])}
+- Schedule Lag p99/max: {fmt_ms(replay['schedule_lag_p99_seconds'])} / {fmt_ms(replay['schedule_lag_max_seconds'])}
+- Agent Startup: {replay['agent_startup']['total_seconds']}s (registro en lote {replay['agent_startup']['registration_seconds']}s, concurrencia {replay['agent_startup']['concurrency']}), por agente p50/p95/max {fmt_ms(replay['agent_startup']['latency_p50_seconds'])} / {fmt_ms(replay['agent_startup']['latency_p95_seconds'])} / {fmt_ms(replay['agent_startup']['latency_max_seconds'])}
+"""
+        
+        if test_data.get("message_trace", {}).get("recorded"):
+            agent_info += f"""
+Message Trace: {test_data['message_trace']['events']} eventos ({test_data['message_trace']['file_bytes']} B)
+"""
+        
+        if test_data.get("dispatch_benchmark"):
+            dispatch_lines = "\n".join(
+                f"  {row['behaviours']:>5} behaviours: lineal {row['linear_us_per_message']} µs/msg, "
+                f"indexado {row['indexed_us_per_message']} µs/msg (x{row['speedup']}), "
+                f"Agent.dispatch de SPADE {row['spade_us_per_message']} µs/msg"
+                for row in test_data["dispatch_benchmark"]
+            )
+            agent_info += f"""
+Dispatch Benchmark ({test_data['dispatch_benchmark'][0]['messages']} mensajes por agente):
+{dispatch_lines}
+"""
+        
+        profile_report = test_data["profile"]
+        if profile_report["samples"]:
+            profile_lines = "\n".join(
+                [f"  {row['percent']:>6}%  {row['frame']}" for row in profile_report["top_self"]]
+                + ["- Top tasks (en CPU):"]
+                + [f"  {row['percent']:>6}%  {row['frame']}" for row in profile_report["top_tasks"]]
+            )
+            agent_info += f"""
+Profile (stack sampling, {profile_report['samples']} muestras cada {profile_report['interval_seconds'] * 1000:.0f} ms en {profile_report['duration_seconds']}s):
+- Fuera de CPU (esperas o sin avance de CPU del hilo): {profile_report['off_cpu_percent']}%
+- Top self (en CPU):
+{profile_lines}
 """
         
         status_text = f"""SPADE Server + Agent Test Results
@@ -308,7 +1867,9 @@ Summary: {test_data['summary']}
 Timestamp: {test_data['end_time']}
 
 🎯 RESULTADO FINAL: {'✅ SUCCESS' if success else '❌ FAILED'}
-"""
+
+==== PROMETHEUS METRICS ====
+{metrics.render()}"""
         
         # Guardar el resultado en el artifact de Kubeflow
         with open(test_results.path, 'w') as f:
@@ -329,11 +1890,660 @@ Timestamp: {test_data['end_time']}
     
     return None
 
+@dsl.component(
+    base_image='python:3.12',
+    packages_to_install=['spade==4.0.3']
+)
+def spade_server_load_test(
+    load_test_results: Output[Dataset],
+    connection_levels: str = "10,50,100,200",
+    stanzas_per_connection: int = 50,
+    stanza_payload_bytes: int = 64,
+    connect_timeout: float = 60.0,
+    min_blast_seconds: float = 2.0,
+    client_processes: int = 0
+) -> None:
+    """
+    Test de carga del servidor SPADE (pyjabber) con clientes slixmpp concurrentes
+    
+    Para cada nivel de conexiones abre todos los clientes a la vez, repartidos entre varios
+    procesos, los autentica en paralelo y les hace enviar ráfagas de stanzas entre ellos,
+    midiendo el ritmo de establecimiento de conexiones, la latencia de autenticación, el
+    throughput de stanzas y la CPU/RSS del servidor.
+    
+    Args:
+        load_test_results: Informe del test de carga como artifact
+        connection_levels: Número de conexiones simultáneas de cada nivel, separados por comas
+        stanzas_per_connection: Stanzas que envía cada cliente en cada ronda de la ráfaga
+        stanza_payload_bytes: Tamaño del cuerpo de cada stanza en bytes
+        connect_timeout: Segundos máximos para conectar y autenticar cada cliente
+        min_blast_seconds: Duración mínima de la ráfaga medida; se repiten rondas hasta cubrirla
+        client_processes: Procesos entre los que se reparten los clientes (0 = uno por CPU menos uno para el servidor)
+"""
+    import asyncio
+    import math
+    import multiprocessing
+    import threading
+    import subprocess
+    import signal
+    import socket
+    import json
+    import time
+    import os
+    import fcntl
+    import resource
+    import tempfile
+    import logging
+    from datetime import datetime
+    
+    print("🚀 Iniciando test de carga del servidor SPADE...")
+    
+    # Los clientes slixmpp registran errores de conexión por su cuenta; en el informe van agregados
+    logging.getLogger("slixmpp").setLevel(logging.CRITICAL)
+    
+    # Cada conexión ocupa un descriptor en el componente y otro en el servidor (que lo hereda)
+    soft_limit, hard_limit = resource.getrlimit(resource.RLIMIT_NOFILE)
+    target_limit = 65536 if hard_limit == resource.RLIM_INFINITY else hard_limit
+    if soft_limit != resource.RLIM_INFINITY and soft_limit < target_limit:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (target_limit, hard_limit))
+        except (ValueError, OSError):
+            print(f"⚠️ No se pudo subir el límite de descriptores ({soft_limit})")
+    
+    # Registro de puertos reservados de los componentes que comparten /tmp (el pod)
+    port_registry = os.path.join(tempfile.gettempdir(), "kfp_spade_ports.json")
+    reserved_ports = []
+    
+    def read_port_registry():
+        try:
+            with open(port_registry) as f:
+                registry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+        alive = {}
+        for reserved_port, pid in registry.items():
+            try:
+                os.kill(pid, 0)
+                alive[reserved_port] = pid
+            except ProcessLookupError:
+                pass
+            except PermissionError:
+                alive[reserved_port] = pid
+        return alive
+    
+    def write_port_registry(registry):
+        tmp_path = f"{port_registry}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(registry, f)
+        os.replace(tmp_path, port_registry)
+    
+    def allocate_ports(count=1):
+        """Reserva puertos efímeros asignados por el SO (bind al puerto 0) bajo un lock de fichero"""
+        with open(f"{port_registry}.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            registry = read_port_registry()
+            ports = []
+            held = []
+            try:
+                while len(ports) < count:
+                    # Los sockets se mantienen abiertos hasta el final para no repetir puerto
+                    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                    held.append(s)
+                    s.bind(("0.0.0.0", 0))
+                    if str(s.getsockname()[1]) not in registry:
+                        ports.append(s.getsockname()[1])
+            finally:
+                for s in held:
+                    s.close()
+            registry.update({str(reserved_port): os.getpid() for reserved_port in ports})
+            write_port_registry(registry)
+        return ports
+    
+    def release_ports(ports):
+        with open(f"{port_registry}.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            registry = read_port_registry()
+            for reserved_port in ports:
+                registry.pop(str(reserved_port), None)
+            write_port_registry(registry)
+    
+    def shutdown_processes(processes, grace_period=5.0, kill_timeout=2.0):
+        """Apaga procesos hijos en paralelo con un único plazo global
+        
+        Envía SIGTERM a todos a la vez, espera a todos contra el mismo deadline y escala a
+        SIGKILL del grupo de procesos con los que sigan vivos: el tiempo total está acotado
+        por grace_period + kill_timeout sea cual sea el número de procesos.
+        """
+        def signal_group(process, signum):
+            try:
+                # Solo se señala el grupo si el hijo lo lidera (start_new_session=True);
+                # si comparte grupo con el componente, killpg lo mataría también a él
+                if os.getpgid(process.pid) == process.pid:
+                    os.killpg(process.pid, signum)
+                else:
+                    process.send_signal(signum)
+            except ProcessLookupError:
+                pass
+        
+        def wait_all(pending, timeout):
+            deadline = time.monotonic() + timeout
+            for process in pending:
+                try:
+                    process.wait(timeout=max(deadline - time.monotonic(), 0))
+                except subprocess.TimeoutExpired:
+                    pass
+            return [process for process in pending if process.poll() is None]
+        
+        running = [process for process in processes if process is not None and process.poll() is None]
+        if not running:
+            return
+        started = time.monotonic()
+        print(f"🔄 Terminando {len(running)} procesos: {[process.pid for process in running]}")
+        for process in running:
+            signal_group(process, signal.SIGTERM)
+        survivors = wait_all(running, grace_period)
+        if survivors:
+            print(f"⚠️ Procesos sin responder, forzando kill del grupo: {[process.pid for process in survivors]}")
+            for process in survivors:
+                signal_group(process, signal.SIGKILL)
+            wait_all(survivors, kill_timeout)
+        print(f"✅ {len(running)} procesos terminados en {time.monotonic() - started:.2f}s")
+    
+    def read_proc_usage(pid):
+        """Segundos de CPU (utime + stime) y RSS en kB de /proc/<pid>"""
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            cpu_seconds = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+            with open(f"/proc/{pid}/status") as f:
+                rss_kb = next((int(line.split()[1]) for line in f if line.startswith("VmRSS:")), 0)
+            return cpu_seconds, rss_kb
+        except (FileNotFoundError, ProcessLookupError, IndexError, ValueError):
+            return None, None
+    
+    class UsageMonitor:
+        """CPU media por fase y RSS máximo del servidor y de los procesos de clientes"""
+        
+        # /proc cuenta la CPU en ticks de 10 ms: en ventanas más cortas el % es ruido de cuantización
+        MIN_CPU_WINDOW = 1.0
+        
+        def __init__(self, pids, interval=0.25):
+            self.pids = pids
+            self.interval = interval
+            self.max_rss_kb = {name: 0 for name in pids}
+            self._stop_event = threading.Event()
+            self._thread = None
+        
+        def usage(self, name):
+            """Segundos de CPU y RSS en kB sumados sobre los procesos del grupo"""
+            samples = [read_proc_usage(pid) for pid in self.pids[name]]
+            if any(cpu_seconds is None for cpu_seconds, _ in samples):
+                return None, None
+            return sum(cpu_seconds for cpu_seconds, _ in samples), sum(rss_kb for _, rss_kb in samples)
+        
+        def _run(self):
+            while not self._stop_event.wait(self.interval):
+                for name in self.pids:
+                    _, rss_kb = self.usage(name)
+                    self.max_rss_kb[name] = max(self.max_rss_kb[name], rss_kb or 0)
+        
+        def start(self):
+            self._thread = threading.Thread(target=self._run, name="usage-monitor", daemon=True)
+            self._thread.start()
+        
+        def stop(self):
+            if self._thread is not None:
+                self._stop_event.set()
+                self._thread.join()
+        
+        def mark(self):
+            return time.monotonic(), {name: self.usage(name)[0] for name in self.pids}
+        
+        @classmethod
+        def cpu_percent(cls, start_mark, end_mark):
+            """CPU media entre dos marcas (100% = un núcleo completo), None si la ventana es demasiado corta"""
+            wall = end_mark[0] - start_mark[0]
+            return {
+                name: round((end_mark[1][name] - start_mark[1][name]) / wall * 100, 1)
+                if wall >= cls.MIN_CPU_WINDOW and start_mark[1][name] is not None and end_mark[1][name] is not None else None
+                for name in start_mark[1]
+            }
+    
+    def detect_cpu_limit():
+        """CPUs disponibles según el límite del cgroup (set_cpu_limit) o la afinidad del proceso"""
+        try:
+            # cgroup v2: "<quota> <period>" o "max <period>"
+            with open("/sys/fs/cgroup/cpu.max") as f:
+                quota, period = f.read().split()
+            if quota != "max":
+                return max(1, math.ceil(int(quota) / int(period)))
+        except (FileNotFoundError, ValueError):
+            pass
+        try:
+            # cgroup v1
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+                quota = int(f.read())
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                period = int(f.read())
+            if quota > 0:
+                return max(1, math.ceil(quota / period))
+        except (FileNotFoundError, ValueError):
+            pass
+        return len(os.sched_getaffinity(0))
+    
+    def percentile(values, pct):
+        """Percentil por rango más cercano, como en el test del servidor y ping-pong"""
+        if not values:
+            return None
+        ordered = sorted(values)
+        # ceil y no round: round() redondea .5 al par y p50 de [1..5] daba 2
+        index = min(len(ordered) - 1, max(0, math.ceil(pct * len(ordered) / 100) - 1))
+        return ordered[index]
+    
+    def latency_summary(values):
+        return {
+            "p50_ms": round(percentile(values, 50) * 1000, 2) if values else None,
+            "p95_ms": round(percentile(values, 95) * 1000, 2) if values else None,
+            "max_ms": round(max(values) * 1000, 2) if values else None
+        }
+    
+    async def open_client(jid, password, port, auto_register):
+        """Conecta un cliente slixmpp y marca TCP conectado, auth y sesión lista"""
+        from spade.xmpp_client import XMPPClient
+        
+        client = XMPPClient(jid, password, False, auto_register)
+        # slixmpp resuelve el host con su puerto por defecto (5222) aunque se le pase otro
+        client.default_port = port
+        client.marks = {}
+        ready = asyncio.Event()
+        
+        def mark(name):
+            client.marks.setdefault(name, time.perf_counter())
+        
+        client.add_event_handler("connected", lambda _: mark("connected"))
+        client.add_event_handler("auth_success", lambda _: mark("auth"))
+        client.add_event_handler("session_start", lambda _: (mark("session"), ready.set()))
+        client.add_event_handler("failed_all_auth", lambda _: ready.set())
+        client.add_event_handler("disconnected", lambda _: ready.set())
+        
+        mark("start")
+        # IP directa: evita resolver "localhost" (AAAA y A) en cada conexión
+        client.connect(address=("127.0.0.1", port))
+        try:
+            await asyncio.wait_for(ready.wait(), connect_timeout)
+        except asyncio.TimeoutError:
+            pass
+        return client
+    
+    async def close_clients(clients, timeout=10.0):
+        """Desconecta todos los clientes a la vez y espera a todos con un único plazo"""
+        waits = []
+        for client in clients:
+            if client.is_connected():
+                waits.append(asyncio.ensure_future(client.disconnect()))
+            else:
+                # Sin conexión: slixmpp seguiría reintentando en segundo plano
+                client.cancel_connection_attempt()
+        if waits:
+            await asyncio.wait(waits, timeout=timeout)
+    
+    # =================================================================
+    # PROCESOS DE CLIENTES: un único proceso slixmpp satura un núcleo antes que el servidor
+    # =================================================================
+    password = "load_test_password"
+    body = "x" * max(stanza_payload_bytes, 1)
+    
+    def client_worker(conn, port):
+        """Proceso hijo: ejecuta en su propio event loop los comandos del padre sobre sus clientes
+        
+        Las marcas de tiempo son time.perf_counter() (CLOCK_MONOTONIC en Linux), comparables
+        entre procesos.
+        """
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        state = {"clients": {}, "ready": [], "received": 0, "last": None, "goal": None, "done": None}
+        
+        def on_message(msg):
+            state["received"] += 1
+            state["last"] = time.perf_counter()
+            if state["goal"] is not None and state["received"] >= state["goal"]:
+                state["done"].set()
+        
+        async def register(jids):
+            clients = await asyncio.gather(*(open_client(jid, password, port, True) for jid in jids))
+            await close_clients(clients)
+            return {}
+        
+        async def connect(jids):
+            clients = await asyncio.gather(*(open_client(jid, password, port, False) for jid in jids))
+            state["clients"] = dict(zip(jids, clients))
+            state["ready"] = [jid for jid, client in state["clients"].items() if "session" in client.marks]
+            for jid in state["ready"]:
+                state["clients"][jid].add_event_handler("message", on_message)
+            return {"marks": [client.marks for client in clients], "ready": state["ready"]}
+        
+        async def blast(targets):
+            """Una ronda: cada cliente listo envía su ráfaga y se espera la de su predecesor en el anillo"""
+            before = state["received"]
+            expected = len(state["ready"]) * stanzas_per_connection
+            state["goal"] = before + expected
+            state["done"] = asyncio.Event()
+            for jid, target in targets.items():
+                client = state["clients"][jid]
+                for _ in range(stanzas_per_connection):
+                    client.send_message(mto=target, mbody=body, mtype="chat")
+            timed_out = False
+            if expected:
+                try:
+                    # Margen amplio: el límite solo evita colgar el nivel si se pierden stanzas
+                    await asyncio.wait_for(state["done"].wait(), max(30.0, expected / 100))
+                except asyncio.TimeoutError:
+                    timed_out = True
+            state["goal"] = None
+            return {"received": state["received"] - before, "last": state["last"], "timed_out": timed_out}
+        
+        async def close(_):
+            await close_clients(list(state["clients"].values()))
+            state.update(clients={}, ready=[], received=0, last=None)
+            return {}
+        
+        handlers = {"register": register, "connect": connect, "blast": blast, "close": close}
+        while True:
+            try:
+                command, payload = conn.recv()
+            except EOFError:
+                break
+            if command == "stop":
+                break
+            try:
+                reply = loop.run_until_complete(handlers[command](payload))
+            except Exception as e:
+                reply = {"error": f"{type(e).__name__}: {e}"}
+            conn.send(reply)
+        loop.close()
+    
+    def start_client_workers(count, port):
+        """Arranca los procesos de clientes con fork antes de que el componente cree ningún hilo"""
+        context = multiprocessing.get_context("fork")
+        workers = []
+        for index in range(count):
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(
+                target=client_worker, args=(child_conn, port), name=f"load-clients-{index}", daemon=True
+            )
+            process.start()
+            child_conn.close()
+            workers.append((process, parent_conn))
+        return workers
+    
+    def broadcast(workers, command, payloads):
+        """Envía a cada proceso su parte del comando y espera todas las respuestas (barrera por fase)"""
+        for (_, conn), payload in zip(workers, payloads):
+            conn.send((command, payload))
+        replies = []
+        for process, conn in workers:
+            try:
+                reply = conn.recv()
+            except EOFError:
+                raise RuntimeError(f"El proceso {process.name} terminó inesperadamente (código {process.exitcode})")
+            if "error" in reply:
+                raise RuntimeError(f"{process.name}: {reply['error']}")
+            replies.append(reply)
+        return replies
+    
+    def stop_client_workers(workers, timeout=10.0):
+        for process, conn in workers:
+            try:
+                conn.send(("stop", None))
+            except OSError:
+                pass
+        deadline = time.monotonic() + timeout
+        for process, _ in workers:
+            process.join(max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                process.kill()
+                process.join()
+    
+    def run_level(level, connections, workers, monitor):
+        """Registro (sin medir), conexión + auth concurrentes y ráfagas de stanzas de un nivel"""
+        jids = [f"load{level}_{i}@localhost" for i in range(connections)]
+        shards = [jids[index::len(workers)] for index in range(len(workers))]
+        result = {"connections": connections}
+        
+        # Registro in-band previo: la fase medida solo autentica
+        started = time.perf_counter()
+        broadcast(workers, "register", shards)
+        result["registration_seconds"] = round(time.perf_counter() - started, 3)
+        
+        # Conexión y autenticación concurrentes en todos los procesos
+        setup_start = monitor.mark()
+        started = time.perf_counter()
+        replies = broadcast(workers, "connect", shards)
+        setup_end = monitor.mark()
+        marks = [client_marks for reply in replies for client_marks in reply["marks"]]
+        ready = [client_marks for client_marks in marks if "session" in client_marks]
+        last_ready = max((client_marks["session"] for client_marks in ready), default=started)
+        result.update({
+            "sessions_ready": len(ready),
+            "setup_failures": connections - len(ready),
+            "setup_seconds": round(last_ready - started, 3),
+            "setup_rate_per_second": round(len(ready) / (last_ready - started), 2) if ready else 0.0,
+            "tcp_connect_latency": latency_summary([
+                client_marks["connected"] - client_marks["start"] for client_marks in ready
+            ]),
+            "auth_latency": latency_summary([
+                client_marks["auth"] - client_marks["connected"] for client_marks in ready if "auth" in client_marks
+            ]),
+            "session_latency": latency_summary([
+                client_marks["session"] - client_marks["start"] for client_marks in ready
+            ]),
+            "cpu_percent_setup": UsageMonitor.cpu_percent(setup_start, setup_end)
+        })
+        print(f"🔐 Nivel {connections}: {len(ready)}/{connections} sesiones en {result['setup_seconds']}s "
+              f"({result['setup_rate_per_second']}/s), auth p95 {result['auth_latency']['p95_ms']} ms")
+        
+        # Ráfagas: cada cliente envía a su vecino del anillo (que puede estar en otro proceso)
+        # lo más rápido posible, en rondas hasta cubrir min_blast_seconds
+        ready_jids = [jid for reply in replies for jid in reply["ready"]]
+        ring = {jid: ready_jids[(i + 1) % len(ready_jids)] for i, jid in enumerate(ready_jids)}
+        targets = [{jid: ring[jid] for jid in reply["ready"]} for reply in replies]
+        per_round = len(ready_jids) * stanzas_per_connection
+        rounds = 0
+        received = 0
+        last = None
+        blast_start = monitor.mark()
+        started = time.perf_counter()
+        while per_round:
+            round_replies = broadcast(workers, "blast", targets)
+            rounds += 1
+            received += sum(reply["received"] for reply in round_replies)
+            last = max((reply["last"] for reply in round_replies if reply["last"] is not None), default=last)
+            if any(reply["timed_out"] for reply in round_replies):
+                print(f"⏰ Nivel {connections}: ronda {rounds} incompleta, {received}/{rounds * per_round} stanzas recibidas")
+                break
+            if time.perf_counter() - started >= min_blast_seconds:
+                break
+        blast_end = monitor.mark()
+        blast_seconds = (last or started) - started
+        result.update({
+            "blast_rounds": rounds,
+            "stanzas_sent": rounds * per_round,
+            "stanzas_received": received,
+            "blast_seconds": round(blast_seconds, 3),
+            "stanza_throughput_per_second": round(received / blast_seconds, 1) if blast_seconds > 0 else 0.0,
+            "cpu_percent_blast": UsageMonitor.cpu_percent(blast_start, blast_end)
+        })
+        print(f"📨 Nivel {connections}: {received}/{rounds * per_round} stanzas en {rounds} rondas, "
+              f"{result['stanza_throughput_per_second']} stanzas/s")
+        
+        broadcast(workers, "close", [None] * len(workers))
+        return result
+    
+    def run_load_test(port, server_pid, levels, process_count):
+        # Fork antes de arrancar el hilo del monitor: el hijo no hereda hilos a medias
+        workers = start_client_workers(process_count, port)
+        monitor = UsageMonitor({"server": [server_pid], "clients": [process.pid for process, _ in workers]})
+        monitor.start()
+        results = []
+        try:
+            for level, connections in enumerate(levels):
+                _, baseline_rss = read_proc_usage(server_pid)
+                result = run_level(level, connections, workers, monitor)
+                result["server_rss_kb_before"] = baseline_rss
+                result["max_rss_kb"] = dict(monitor.max_rss_kb)
+                results.append(result)
+                # Si más de la mitad no llega a sesión, los niveles mayores no aportan nada
+                if result["setup_failures"] > connections / 2:
+                    print(f"⚠️ Nivel {connections} saturado: se detiene el barrido")
+                    break
+        finally:
+            monitor.stop()
+            stop_client_workers(workers)
+        return results
+    
+    load_data = {
+        "start_time": datetime.now().isoformat(),
+        "end_time": None,
+        "connection_levels": connection_levels,
+        "stanzas_per_connection": stanzas_per_connection,
+        "stanza_payload_bytes": stanza_payload_bytes,
+        "min_blast_seconds": min_blast_seconds,
+        "nofile_limit": resource.getrlimit(resource.RLIMIT_NOFILE)[0],
+        "levels": [],
+        "error": None
+    }
+    server_process = None
+    
+    try:
+        levels = [int(level) for level in connection_levels.split(",") if level.strip()]
+        # Los sockets de la reserva se cierran antes del bind de spade run: si otro proceso
+        # ocupa el puerto entre medias, spade run termina y se reintenta con puertos nuevos
+        max_server_attempts = 3
+        for server_attempt in range(1, max_server_attempts + 1):
+            reserved_ports = allocate_ports(2)
+            port, server_port = reserved_ports
+            load_data["port"] = port
+            
+            # Grupo de procesos propio para que el cleanup pueda matar al servidor con sus hijos
+            server_process = subprocess.Popen(
+                [
+                    "spade", "run",
+                    "--host", "localhost",
+                    "--client_port", str(port),
+                    "--server_port", str(server_port),
+                    "--memory"
+                ],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                start_new_session=True
+            )
+            print(f"🚀 Servidor iniciado (PID: {server_process.pid}) en el puerto {port}")
+            
+            # Espera activa hasta que el puerto acepte conexiones en lugar de un tiempo fijo
+            started = time.monotonic()
+            while server_process.poll() is None:
+                try:
+                    socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+                    break
+                except OSError:
+                    if time.monotonic() - started > 30:
+                        raise RuntimeError("El servidor no aceptó conexiones en 30s")
+                    time.sleep(0.1)
+            if server_process.poll() is None:
+                break
+            release_ports(reserved_ports)
+            reserved_ports = []
+            print(f"⚠️ El servidor terminó al arrancar (código {server_process.returncode}), intento {server_attempt}/{max_server_attempts}")
+            if server_attempt == max_server_attempts:
+                raise RuntimeError(f"El servidor terminó al arrancar (código {server_process.returncode})")
+        load_data["server_startup_seconds"] = round(time.monotonic() - started, 3)
+        print(f"✅ Servidor accesible en {load_data['server_startup_seconds']}s")
+        
+        process_count = client_processes if client_processes > 0 else max(1, detect_cpu_limit() - 1)
+        process_count = min(process_count, max(levels, default=1))
+        load_data["client_processes"] = process_count
+        print(f"👥 Clientes repartidos en {process_count} procesos")
+        load_data["levels"] = run_load_test(port, server_process.pid, levels, process_count)
+        
+    except Exception as e:
+        load_data["error"] = str(e)
+        print(f"❌ Error en el test de carga: {e}")
+    
+    finally:
+        shutdown_processes([server_process])
+        release_ports(reserved_ports)
+        load_data["end_time"] = datetime.now().isoformat()
+        
+        success = load_data["error"] is None and bool(load_data["levels"])
+        level_lines = []
+        for row in load_data["levels"]:
+            level_lines.append(
+                f"{row['connections']:>6} | {row['sessions_ready']:>5} | {row['setup_rate_per_second']:>9} | "
+                f"{row['auth_latency']['p50_ms']!s:>9} | {row['auth_latency']['p95_ms']!s:>9} | "
+                f"{row['stanza_throughput_per_second']:>11} | {row['stanzas_received']:>7}/{row['stanzas_sent']:<7} | {row['blast_rounds']:>6} | "
+                f"{row['cpu_percent_setup']['server']!s:>6} | {row['cpu_percent_setup']['clients']!s:>6} | "
+                f"{row['cpu_percent_blast']['server']!s:>6} | {row['cpu_percent_blast']['clients']!s:>6} | "
+                f"{row['max_rss_kb']['server']:>8}"
+            )
+        best = max(load_data["levels"], key=lambda row: row["stanza_throughput_per_second"], default=None)
+        
+        status_text = f"""SPADE Server Load Test Results
+==============================
+Overall Test Success: {success}
+
+Configuration:
+- Connection Levels: {connection_levels}
+- Stanzas per Connection: {stanzas_per_connection}
+- Stanza Payload: {stanza_payload_bytes} bytes
+- Minimum Blast Duration: {min_blast_seconds}s
+- Client Processes: {load_data.get('client_processes', 'N/A')}
+- File Descriptor Limit: {load_data['nofile_limit']}
+- Server Startup: {load_data.get('server_startup_seconds', 'N/A')}s
+- Error: {load_data['error'] or 'None'}
+
+Levels (CPU en % de un núcleo; "cli" suma los procesos de clientes; None en fases de menos de 1 s):
+ conns | ready | setups/s  | auth p50  | auth p95  | stanzas/s   | recibidas       | rondas | srvCPU | cliCPU | srvCPU | cliCPU | srvRSS
+       |       |           | ms        | ms        |             |                 |        | setup  | setup  | blast  | blast  | max kB
+{chr(10).join(level_lines) if level_lines else '- Sin niveles completados'}
+
+Peak Stanza Throughput: {f"{best['stanza_throughput_per_second']} stanzas/s con {best['connections']} conexiones" if best else 'N/A'}
+
+🎯 RESULTADO FINAL: {'✅ SUCCESS' if success else '❌ FAILED'}
+
+==== DETAILED RESULTS (JSON) ====
+{json.dumps(load_data, indent=2)}
+"""
+        
+        with open(load_test_results.path, 'w') as f:
+            f.write(status_text)
+        
+        print(status_text.split("==== DETAILED")[0])
+        print(f"💾 Resultados guardados en artifact: {load_test_results.path}")
+    
+    if not success:
+        raise Exception(f"Test de carga fallido: {load_data['error'] or 'sin niveles completados'}")
+
 @dsl.pipeline(
     name='spade-server-agent-test-pipeline',
     description='Test del servidor SPADE + agente simple - ejemplo intermedio extendido'
 )
-def spade_server_agent_test_pipeline():
+def spade_server_agent_test_pipeline(
+    metrics_port: int = 0,
+    metrics_textfile: str = "",
+    soak_duration: float = 0.0,
+    soak_rate: float = 10.0,
+    soak_window: float = 10.0,
+    payload_sizes: str = "",
+    payload_messages: int = 20,
+    payload_compression: str = "none",
+    payload_encoding: str = "base64",
+    dispatch_benchmark_behaviours: str = "",
+    record_trace: bool = False,
+    trace_replay_path: str = "",
+    trace_replay_speed: float = 1.0,
+    agent_start_concurrency: int = 32,
+    profile: bool = False
+):
     """
     Pipeline que prueba el servidor SPADE con un agente simple
 
@@ -343,10 +2553,43 @@ def spade_server_agent_test_pipeline():
     2. Verifica conectividad TCP
     3. Ejecuta agente simple que envía/recibe mensajes
     4. Genera reporte completo con resultados del servidor y agente
-    """
+    
+    Args:
+        metrics_port: Puerto del endpoint Prometheus /metrics (0 desactiva)
+        metrics_textfile: Fichero .prom para el textfile collector (vacío desactiva)
+        soak_duration: Segundos de carga sostenida (0 ejecuta el test clásico de 5 mensajes)
+        soak_rate: Mensajes por segundo objetivo durante el soak
+        soak_window: Segundos por ventana en el informe del soak
+        payload_sizes: Tamaños en bytes separados por comas, p. ej. "100,1000,10000,100000,1000000" (vacío desactiva)
+        payload_messages: Mensajes por tamaño en el barrido
+        payload_compression: "none" o "zlib"
+        payload_encoding: "base64" o "base85"
+        dispatch_benchmark_behaviours: Behaviours por agente para el benchmark de dispatch, p. ej. "1,10,100,500" (vacío desactiva)
+        record_trace: Graba la traza binaria de mensajes en el artifact message_trace
+        trace_replay_path: Traza grabada a repetir, p. ej. "/gcs/<bucket>/traces/ping_pong.trace" (vacío desactiva)
+        trace_replay_speed: 1.0 ritmo original, 0 máxima velocidad
+        agent_start_concurrency: Conexiones simultáneas al arrancar los agentes de la repetición
+        profile: Perfil por muestreo de pilas en el artifact profile_output
+"""
     
     # Componente de test
-    test_task = test_spade_server_with_agent()
+    test_task = test_spade_server_with_agent(
+        metrics_port=metrics_port,
+        metrics_textfile=metrics_textfile,
+        soak_duration=soak_duration,
+        soak_rate=soak_rate,
+        soak_window=soak_window,
+        payload_sizes=payload_sizes,
+        payload_messages=payload_messages,
+        payload_compression=payload_compression,
+        payload_encoding=payload_encoding,
+        dispatch_benchmark_behaviours=dispatch_benchmark_behaviours,
+        record_trace=record_trace,
+        trace_replay_path=trace_replay_path,
+        trace_replay_speed=trace_replay_speed,
+        agent_start_concurrency=agent_start_concurrency,
+        profile=profile
+    )
     
     # Configuración del componente
     test_task.set_display_name('Test SPADE Server + Agent')
@@ -358,4 +2601,51 @@ def spade_server_agent_test_pipeline():
         "Ejecuta un test del servidor SPADE con un agente simple. "
         "Inicia el servidor XMPP, verifica conectividad, ejecuta agente que envía mensajes, "
         "y genera reporte completo. Ejemplo intermedio extendido con comunicación de agentes."
-    )
\ No newline at end of file
+    )
+
+@dsl.pipeline(
+    name='spade-server-load-test-pipeline',
+    description='Test de carga del servidor SPADE: conexiones, autenticación y throughput de stanzas'
+)
+def spade_server_load_test_pipeline(
+    connection_levels: str = "10,50,100,200",
+    stanzas_per_connection: int = 50,
+    stanza_payload_bytes: int = 64,
+    connect_timeout: float = 60.0,
+    min_blast_seconds: float = 2.0,
+    client_processes: int = 0,
+    cpu_limit: str = "4"
+):
+    """
+    Pipeline que mide la capacidad del servidor SPADE por nodo
+    
+    Args:
+        connection_levels: Conexiones simultáneas de cada nivel, p. ej. "10,50,100,200,500"
+        stanzas_per_connection: Stanzas por cliente en cada ronda de la ráfaga de cada nivel
+        stanza_payload_bytes: Tamaño del cuerpo de cada stanza en bytes
+        connect_timeout: Segundos máximos para conectar y autenticar cada cliente
+        min_blast_seconds: Duración mínima de la ráfaga medida en cada nivel
+        client_processes: Procesos de clientes (0 = uno por CPU del límite menos uno para el servidor)
+        cpu_limit: Límite de CPU del pod, compartido por el servidor y los procesos de clientes
+"""
+    
+    load_task = spade_server_load_test(
+        connection_levels=connection_levels,
+        stanzas_per_connection=stanzas_per_connection,
+        stanza_payload_bytes=stanza_payload_bytes,
+        connect_timeout=connect_timeout,
+        min_blast_seconds=min_blast_seconds,
+        client_processes=client_processes
+    )
+    
+    # Servidor y clientes comparten el pod: un núcleo para el servidor y el resto para los
+    # procesos de clientes, para que el generador no sea el cuello de botella
+    load_task.set_display_name('Load Test SPADE Server')
+    load_task.set_cpu_limit(cpu_limit)
+    load_task.set_memory_limit('2Gi')
+    
+    load_task.description = (
+        "Abre conexiones slixmpp concurrentes contra el servidor SPADE local, las autentica "
+        "en paralelo y envía ráfagas de stanzas, midiendo ritmo de conexión, latencia de "
+        "autenticación, throughput y CPU/RSS del servidor por nivel de conexiones."
+    )
@@ -1,5 +1,5 @@
 import kfp
-from pipeline import simfleet_basic_pipeline
+from pipeline import simfleet_basic_pipeline, simfleet_sweep_pipeline
 
 if __name__ == '__main__':
     print("Compilando pipeline SimFleet básico...")
@@ -10,4 +10,11 @@ if __name__ == '__main__':
     )
     
     print("Pipeline compilado exitosamente en: simfleet_basic_pipeline.yaml")
+    
+    kfp.compiler.Compiler().compile(
+        pipeline_func=simfleet_sweep_pipeline,
+        package_path='simfleet_sweep_pipeline.yaml'
+    )
+    
+    print("Pipeline compilado exitosamente en: simfleet_sweep_pipeline.yaml")
     print("")
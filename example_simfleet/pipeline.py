@@ -1,26 +1,272 @@
 from kfp import dsl
-from kfp.dsl import Output, Dataset
+from kfp.dsl import Output, Input, Dataset
+from typing import List
 
 @dsl.component(
     base_image='python:3.12',
-    packages_to_install=['simfleet']
+    packages_to_install=['simfleet', 'numpy', 'pyarrow']
 )
 def simfleet_basic_simulation(
     max_simulation_time: int = 30,
     num_vehicles: int = 2,
-    results_output: Output[Dataset] = None
+    resource_sample_interval: float = 1.0,
+    checkpoint_dir: str = "",
+    checkpoint_interval: float = 10.0,
+    resume: bool = False,
+    headless: bool = True,
+    headless_benchmark: bool = False,
+    time_scale: float = 1.0,
+    time_scale_check: bool = False,
+    time_scale_tolerance: float = 0.05,
+    eta_tolerance: float = 0.1,
+    profile: bool = False,
+    fail_on_error: bool = True,
+    results_output: Output[Dataset] = None,
+    route_estimates: Output[Dataset] = None,
+    results_record: Output[Dataset] = None,
+    results_table: Output[Dataset] = None,
+    profile_output: Output[Dataset] = None
 ) -> None:
     import subprocess
+    import sys
+    import signal
     import time
     import json
     import os
     import tempfile
+    import shutil
+    import threading
+    import socket
+    import fcntl
+    import hashlib
+    import uuid
+    import numpy as np
+    from dataclasses import dataclass, field, asdict
     from datetime import datetime
     from pathlib import Path
     
     print("Starting SimFleet simulation in Kubeflow...")
     
-    def create_simulation_config():
+    class ResourceSampler:
+        """Samples /proc/<pid> of the SPADE server, SimFleet and the component itself"""
+        
+        def __init__(self, get_processes, interval=1.0):
+            self.get_processes = get_processes
+            self.interval = interval
+            self.samples = []
+            self.clock_ticks = os.sysconf("SC_CLK_TCK")
+            self._last_cpu = {}
+            self._start = None
+            self._stop_event = threading.Event()
+            self._thread = None
+        
+        def read_proc(self, pid):
+            """Reads CPU ticks, RSS, fds, threads and context switches from /proc/<pid>"""
+            try:
+                with open(f"/proc/{pid}/stat") as f:
+                    # The process name may contain spaces: split after the last ')'
+                    fields = f.read().rsplit(")", 1)[1].split()
+                status = {}
+                with open(f"/proc/{pid}/status") as f:
+                    for line in f:
+                        key, _, value = line.partition(":")
+                        status[key] = value.split()
+                num_fds = len(os.listdir(f"/proc/{pid}/fd"))
+            except (FileNotFoundError, ProcessLookupError, PermissionError):
+                return None
+            
+            return {
+                "cpu_ticks": int(fields[11]) + int(fields[12]),
+                "rss_kb": int(status.get("VmRSS", [0])[0]),
+                "num_fds": num_fds,
+                "num_threads": int(status.get("Threads", [0])[0]),
+                "voluntary_ctxt_switches": int(status.get("voluntary_ctxt_switches", [0])[0]),
+                "nonvoluntary_ctxt_switches": int(status.get("nonvoluntary_ctxt_switches", [0])[0])
+            }
+        
+        def sample_once(self):
+            """Takes one sample of every live process"""
+            now = time.monotonic()
+            targets = [("component", os.getpid())]
+            for process in self.get_processes():
+                if process.poll() is None:
+                    name = " ".join(process.args) if isinstance(process.args, list) else str(process.args)
+                    targets.append((name, process.pid))
+            
+            for name, pid in targets:
+                data = self.read_proc(pid)
+                if data is None:
+                    continue
+                
+                cpu_ticks = data.pop("cpu_ticks")
+                cpu_percent = 0.0
+                if pid in self._last_cpu:
+                    last_ticks, last_time = self._last_cpu[pid]
+                    elapsed = now - last_time
+                    if elapsed > 0:
+                        cpu_percent = 100.0 * (cpu_ticks - last_ticks) / self.clock_ticks / elapsed
+                self._last_cpu[pid] = (cpu_ticks, now)
+                
+                self.samples.append({
+                    "elapsed_seconds": round(now - self._start, 3),
+                    "pid": pid,
+                    "name": name,
+                    "cpu_percent": round(cpu_percent, 2),
+                    **data
+                })
+        
+        def _run(self):
+            while not self._stop_event.is_set():
+                self.sample_once()
+                self._stop_event.wait(self.interval)
+        
+        def start(self):
+            """Starts the sampling thread (no-op when interval <= 0)"""
+            if self.interval <= 0:
+                return
+            self._start = time.monotonic()
+            self._thread = threading.Thread(target=self._run, name="resource-sampler", daemon=True)
+            self._thread.start()
+        
+        def stop(self):
+            """Stops sampling after taking a final sample"""
+            if self._thread is None:
+                return
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+            self.sample_once()
+        
+        def report(self):
+            """Full time series plus a per-process summary"""
+            summary = {}
+            for sample in self.samples:
+                entry = summary.setdefault(f"{sample['name']} ({sample['pid']})", {
+                    "samples": 0, "max_cpu_percent": 0.0, "avg_cpu_percent": 0.0,
+                    "max_rss_kb": 0, "max_num_fds": 0, "max_num_threads": 0,
+                    "voluntary_ctxt_switches": 0, "nonvoluntary_ctxt_switches": 0
+                })
+                entry["samples"] += 1
+                entry["avg_cpu_percent"] += sample["cpu_percent"]
+                entry["max_cpu_percent"] = max(entry["max_cpu_percent"], sample["cpu_percent"])
+                entry["max_rss_kb"] = max(entry["max_rss_kb"], sample["rss_kb"])
+                entry["max_num_fds"] = max(entry["max_num_fds"], sample["num_fds"])
+                entry["max_num_threads"] = max(entry["max_num_threads"], sample["num_threads"])
+                # /proc counters are cumulative: the last sample is the total
+                entry["voluntary_ctxt_switches"] = sample["voluntary_ctxt_switches"]
+                entry["nonvoluntary_ctxt_switches"] = sample["nonvoluntary_ctxt_switches"]
+            
+            for entry in summary.values():
+                entry["avg_cpu_percent"] = round(entry["avg_cpu_percent"] / entry["samples"], 2)
+            
+            return {
+                "interval_seconds": self.interval,
+                "summary": summary,
+                "series": self.samples
+            }
+    
+    # Port registry of the components sharing /tmp (the pod): reservations are tracked by pid,
+    # so it cannot see ports taken by other pods on the same node
+    port_registry = os.path.join(tempfile.gettempdir(), "kfp_spade_ports.json")
+    
+    def read_port_registry():
+        """Loads the registry, dropping reservations whose owner process is gone"""
+        try:
+            with open(port_registry) as f:
+                registry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+        alive = {}
+        for port, pid in registry.items():
+            try:
+                os.kill(pid, 0)
+                alive[port] = pid
+            except ProcessLookupError:
+                pass
+            except PermissionError:
+                alive[port] = pid
+        return alive
+    
+    def write_port_registry(registry):
+        tmp_path = f"{port_registry}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(registry, f)
+        os.replace(tmp_path, port_registry)
+    
+    def allocate_ports(count=1):
+        """Reserves OS-assigned ephemeral ports (bind to port 0) under a file lock"""
+        with open(f"{port_registry}.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            registry = read_port_registry()
+            ports = []
+            held = []
+            try:
+                while len(ports) < count:
+                    # Keep the sockets open until the end so the OS never hands out the same port twice
+                    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                    held.append(s)
+                    s.bind(("0.0.0.0", 0))
+                    port = s.getsockname()[1]
+                    if str(port) not in registry:
+                        ports.append(port)
+            finally:
+                for s in held:
+                    s.close()
+            registry.update({str(port): os.getpid() for port in ports})
+            write_port_registry(registry)
+        return ports
+    
+    def release_ports(ports):
+        with open(f"{port_registry}.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            registry = read_port_registry()
+            for port in ports:
+                registry.pop(str(port), None)
+            write_port_registry(registry)
+    
+    def shutdown_processes(processes, grace_period=5.0, kill_timeout=2.0):
+        """Shuts child processes down concurrently under one global deadline
+        
+        Sends SIGTERM to all of them at once, waits for all against the same deadline and
+        escalates to SIGKILL of the process group for the survivors: total teardown is
+        bounded by grace_period + kill_timeout whatever the number of processes.
+        """
+        def signal_group(process, signum):
+            try:
+                # Signal the group only when the child leads it (start_new_session=True);
+                # if it shares the component's group, killpg would kill the component too
+                if os.getpgid(process.pid) == process.pid:
+                    os.killpg(process.pid, signum)
+                else:
+                    process.send_signal(signum)
+            except ProcessLookupError:
+                pass
+        
+        def wait_all(pending, timeout):
+            deadline = time.monotonic() + timeout
+            for process in pending:
+                try:
+                    process.wait(timeout=max(deadline - time.monotonic(), 0))
+                except subprocess.TimeoutExpired:
+                    pass
+            return [process for process in pending if process.poll() is None]
+        
+        running = [process for process in processes if process is not None and process.poll() is None]
+        if not running:
+            return
+        started = time.monotonic()
+        print(f"Terminating {len(running)} processes: {[process.pid for process in running]}")
+        for process in running:
+            signal_group(process, signal.SIGTERM)
+        survivors = wait_all(running, grace_period)
+        if survivors:
+            print(f"Processes not responding, killing their groups: {[process.pid for process in survivors]}")
+            for process in survivors:
+                signal_group(process, signal.SIGKILL)
+            wait_all(survivors, kill_timeout)
+        print(f"{len(running)} processes stopped in {time.monotonic() - started:.2f}s")
+    
+    def create_simulation_config(http_port=None, time_scale=1.0):
         config = {
             "fleets": [],
             "transports": [],
@@ -41,8 +287,10 @@ def simfleet_basic_simulation(
             "max_time": max_simulation_time,
             "vehicle_strategy": "simfleet.common.lib.vehicles.strategies.vehicle.FSMOneShotVehicleBehaviour",
             "host": "localhost",
-            "http_port": 9000
+            "time_scale": time_scale
         }
+        if http_port is not None:
+            config["http_port"] = http_port
         
         if num_vehicles >= 2:
             config["vehicles"].append({
@@ -57,8 +305,634 @@ def simfleet_basic_simulation(
         
         return config
     
-    def run_simfleet_headless():
-        config = create_simulation_config()
+    # Snapshots go next to the results artifact unless a persistent directory is given
+    if not checkpoint_dir:
+        checkpoint_dir = os.path.join(os.path.dirname(os.path.abspath(results_output.path)), "checkpoints")
+    
+    # Replaces `simfleet --autorun`: same startup as simfleet.cli, plus periodic snapshots
+    # of the vehicles and the elapsed simulated time (also written on SIGTERM)
+    SIMFLEET_LAUNCHER = '''
+import argparse
+import asyncio
+import json
+import os
+import inspect
+import signal
+import sys
+import threading
+import time
+from datetime import datetime
+
+import spade
+from loguru import logger
+from spade.agent import Agent
+
+from simfleet.common.mixins import movable
+from simfleet.communications.protocol import COORDINATION_PROTOCOL, REQUEST_PERFORMATIVE
+from simfleet.config import settings
+from simfleet.simulator import CoordinationBehaviour, SimulatorAgent
+from spade.template import Template
+
+
+class HeadlessSimulatorAgent(SimulatorAgent):
+    """SimulatorAgent.setup without the web UI: no aiohttp server, routes or templates"""
+    
+    async def setup(self):
+        logger.info("Simulator agent running (headless, web interface disabled)")
+        
+        await self.create_directory_agent(
+            name=self.config.directory_name, password=self.config.directory_password
+        )
+        
+        await self.load_scenario()
+        
+        template = Template()
+        template.set_metadata("protocol", COORDINATION_PROTOCOL)
+        template.set_metadata("performative", REQUEST_PERFORMATIVE)
+        
+        self.add_behaviour(CoordinationBehaviour(), template)
+
+
+class StackSampler:
+    """Sampling profiler: counts the stacks of every thread in collapsed (flamegraph) format
+    
+    A background thread reads sys._current_frames() every `interval` seconds. Threads with
+    a watched event loop get a [task <name>] frame for the running asyncio task in front of
+    its first coroutine. Samples are wall-clock; a thread waiting in a known idle leaf, or
+    whose CPU time (/proc/self/task/<tid>) did not advance since the previous sample, gets a
+    trailing [off-cpu] frame, so time.sleep or other blocking C calls are not counted as CPU.
+    """
+    
+    OFF_CPU_FRAME = "[off-cpu]"
+    
+    # Leaves that only wait (event loop selector, locks, children): always off-CPU
+    IDLE_FRAMES = {
+        "EpollSelector.select", "_PollLikeSelector.select", "KqueueSelector.select",
+        "SelectSelector.select", "Condition.wait", "Popen._wait"
+    }
+    
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.counts = {}
+        self.loops = {}
+        self._labels = {}
+        self._cpu_times = {}
+        self._stop_event = threading.Event()
+        self._thread = None
+    
+    def watch_loop(self):
+        self.loops[threading.get_ident()] = asyncio.get_running_loop()
+    
+    def frame_label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            filename = code.co_filename.rsplit("site-packages/", 1)[-1]
+            if filename.startswith("/"):
+                filename = "/".join(filename.rsplit("/", 2)[-2:])
+            label = "{} ({}:{})".format(code.co_qualname, filename, code.co_firstlineno)
+            self._labels[code] = label
+        return label
+    
+    def task_label(self, thread_id):
+        loop = self.loops.get(thread_id)
+        task = asyncio.current_task(loop) if loop is not None else None
+        if task is None:
+            return None
+        name = task.get_name()
+        # Unnamed tasks (Task-N) are grouped by their coroutine, e.g. CyclicBehaviour._step
+        if name.startswith("Task-"):
+            name = getattr(task.get_coro(), "__qualname__", name)
+        return "[task {}]".format(name)
+    
+    def thread_cpu_time(self, native_id):
+        """Accumulated CPU time of the thread (schedstat ns or stat ticks), None without /proc"""
+        try:
+            with open("/proc/self/task/{}/schedstat".format(native_id)) as f:
+                return int(f.read().split()[0])
+        except (OSError, ValueError, IndexError):
+            pass
+        try:
+            with open("/proc/self/task/{}/stat".format(native_id)) as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            return int(fields[11]) + int(fields[12])
+        except (OSError, ValueError, IndexError):
+            return None
+    
+    def on_cpu(self, native_id, leaf):
+        """On CPU unless in a known wait or its CPU time did not advance since the last sample"""
+        current = self.thread_cpu_time(native_id) if native_id is not None else None
+        previous = self._cpu_times.get(native_id)
+        self._cpu_times[native_id] = current
+        if leaf.split(" (", 1)[0] in self.IDLE_FRAMES:
+            return False
+        # Without /proc, or on the first sample of a thread, there is nothing to compare with
+        return current is None or previous is None or current > previous
+    
+    def sample_once(self):
+        threads = {thread.ident: thread for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == threading.get_ident():
+                continue
+            codes = []
+            while frame is not None:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            
+            thread = threads.get(thread_id)
+            labels = [thread.name if thread else "thread-{}".format(thread_id)]
+            task = self.task_label(thread_id)
+            for code in reversed(codes):
+                if task and code.co_flags & inspect.CO_COROUTINE:
+                    labels.append(task)
+                    task = None
+                labels.append(self.frame_label(code))
+            if not self.on_cpu(thread.native_id if thread else None, labels[-1]):
+                labels.append(self.OFF_CPU_FRAME)
+            stack = ";".join(labels)
+            self.counts[stack] = self.counts.get(stack, 0) + 1
+    
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self.sample_once()
+    
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self._stop_event.set()
+        self._thread.join()
+    
+    def write_collapsed(self, path):
+        with open(path, "w") as f:
+            for stack, count in sorted(self.counts.items()):
+                f.write("{} {}\\n".format(stack, count))
+
+
+profiler = None
+
+
+def with_time_scale(simulator_class, time_scale):
+    """Simulator whose clock runs time_scale times faster than the wall clock"""
+    
+    class ScaledSimulatorAgent(simulator_class):
+        def get_simulation_time(self):
+            # Once stopped, SimulatorAgent returns the (already scaled) time it stored in stop()
+            if self.simulation_running and self.simulation_init_time:
+                return (time.time() - self.simulation_init_time) * time_scale
+            return super().get_simulation_time()
+    
+    return ScaledSimulatorAgent
+
+
+def use_xmpp_port(xmpp_port):
+    """Connects every agent to the given XMPP client port
+    
+    SimFleet 2.0.1 creates its agents without a port, so spade falls back to 5222.
+    """
+    agent_init = Agent.__init__
+    agent_connect = Agent._async_connect
+    
+    def init_on_port(self, jid, password, port=None, verify_security=False):
+        agent_init(self, jid, password, xmpp_port, verify_security)
+    
+    async def connect_on_port(self):
+        # slixmpp resolves the host with its default port (5222) even when spade passes another
+        self.client.default_port = self.xmpp_port
+        await agent_connect(self)
+    
+    Agent.__init__ = init_on_port
+    Agent._async_connect = connect_on_port
+
+
+def install_scaled_movement(simulator, time_scale):
+    """Shortens every movement tick by time_scale and records the simulated arrival time
+    
+    Each tick still advances one second of travel, so routes and speeds are unchanged.
+    MovableMixin.move_to looks MovingBehaviour up in its module at call time.
+    """
+    
+    class ScaledMovingBehaviour(movable.MovingBehaviour):
+        def __init__(self, period, start_at=None):
+            super().__init__(period=period / time_scale, start_at=start_at)
+        
+        async def run(self):
+            await super().run()
+            if self.is_killed():
+                self.agent.arrived_at = simulator.get_simulation_time()
+            else:
+                self.period = self.period.total_seconds() / time_scale
+    
+    movable.MovingBehaviour = ScaledMovingBehaviour
+
+
+def snapshot_state(simulator, time_offset, index, finished):
+    vehicles = []
+    for name, agent in simulator.vehicle_agents.items():
+        vehicles.append({
+            "name": name,
+            "position": agent.get("current_pos"),
+            "destination": agent.vehicle_dest,
+            "status": agent.status,
+            "distance_m": round(sum(agent.distances), 2),
+            "arrived_at": round(time_offset + agent.arrived_at, 3) if getattr(agent, "arrived_at", None) is not None else None
+        })
+    return {
+        "snapshot_index": index,
+        "simulation_name": simulator.config.simulation_name,
+        "elapsed_simulated_time": round(time_offset + simulator.get_simulation_time(), 3),
+        "time_scale": simulator.time_scale,
+        "finished": finished,
+        "vehicles": vehicles,
+        "written_at": datetime.now().isoformat()
+    }
+
+
+def write_snapshot(directory, snapshot, keep=3):
+    # Write-then-rename: a preemption mid-write never leaves a truncated latest.json
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, "snapshot_{:06d}.json".format(snapshot["snapshot_index"]))
+    for target in (path, os.path.join(directory, "latest.json")):
+        tmp_path = target + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(snapshot, f, indent=2)
+        os.replace(tmp_path, target)
+    old = sorted(name for name in os.listdir(directory) if name.startswith("snapshot_"))
+    for name in old[:-keep]:
+        os.unlink(os.path.join(directory, name))
+
+
+async def run_simulation(args):
+    if profiler is not None:
+        profiler.watch_loop()
+    config = settings.SimfleetConfig(args.config, None, None, 0)
+    try:
+        time_scale = float(config["time_scale"])
+    except KeyError:
+        time_scale = 1.0
+    simulator_class = with_time_scale(HeadlessSimulatorAgent if args.headless else SimulatorAgent, time_scale)
+    simulator = simulator_class(
+        config=config,
+        agentjid="simulator_{}@{}".format(config.simulation_name, config.host),
+        password=config.simulation_password
+    )
+    simulator.time_scale = time_scale
+    install_scaled_movement(simulator, time_scale)
+    
+    loop = asyncio.get_running_loop()
+    stop_event = asyncio.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop_event.set)
+    
+    finished = False
+    try:
+        await simulator.start()
+        simulator.run()
+        
+        index = args.first_index
+        last_snapshot = time.monotonic()
+        while not simulator.is_simulation_finished() and not stop_event.is_set():
+            await asyncio.sleep(max(0.5 / time_scale, 0.01))
+            if args.checkpoint_interval > 0 and time.monotonic() - last_snapshot >= args.checkpoint_interval:
+                write_snapshot(args.checkpoint_dir, snapshot_state(simulator, args.time_offset, index, False))
+                index += 1
+                last_snapshot = time.monotonic()
+        
+        finished = simulator.is_simulation_finished()
+        write_snapshot(args.checkpoint_dir, snapshot_state(simulator, args.time_offset, index, finished))
+        logger.info("Snapshot {} written ({})".format(index, "finished" if finished else "interrupted"))
+        
+        await simulator.stop()
+        
+        sys.exit(0)
+    
+    except Exception as e:
+        # SimFleet's metrics step in stop() can fail on vehicle-only runs once the simulation
+        # has finished; any failure before that point is a failed run
+        logger.error(f"An error occurred: {e}")
+        sys.exit(0 if finished else 1)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--config", required=True)
+    parser.add_argument("--checkpoint-dir", required=True)
+    parser.add_argument("--checkpoint-interval", type=float, default=10.0)
+    parser.add_argument("--time-offset", type=float, default=0.0)
+    parser.add_argument("--first-index", type=int, default=0)
+    parser.add_argument("--headless", action="store_true")
+    parser.add_argument("--profile-output", default="")
+    parser.add_argument("--xmpp-port", type=int, default=5222)
+    args = parser.parse_args()
+    use_xmpp_port(args.xmpp_port)
+    
+    logger.remove()
+    logger.add(sys.stderr, level="INFO")
+    
+    global profiler
+    if args.profile_output:
+        profiler = StackSampler()
+        profiler.start()
+    try:
+        spade.run(run_simulation(args))
+    finally:
+        # run_simulation always leaves through sys.exit, also after SIGTERM
+        if profiler is not None:
+            profiler.stop()
+            profiler.write_collapsed(args.profile_output)
+    
+    # Only reached when spade.run swallowed an exception raised before the simulator
+    # started (e.g. geocoding the scenario bounding box): report it as a failed run
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
+'''
+    
+    def load_latest_snapshot(directory):
+        """Returns the latest snapshot in the directory, or None"""
+        try:
+            with open(os.path.join(directory, "latest.json")) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+    
+    def load_run_snapshot(directory, checkpoint):
+        """Returns the latest snapshot if this run wrote it (or resumed from it), else None
+        
+        A persistent directory can hold a previous run's latest.json: it counts only if
+        it is the resumed snapshot or was written after this run's launcher started.
+        """
+        snapshot = load_latest_snapshot(directory)
+        if snapshot is None:
+            return None
+        if snapshot["snapshot_index"] == checkpoint.get("resumed_from_snapshot"):
+            return snapshot
+        if "launched_at" in checkpoint and (
+            snapshot["snapshot_index"] >= checkpoint["first_index"]
+            and datetime.fromisoformat(snapshot["written_at"]) >= datetime.fromisoformat(checkpoint["launched_at"])
+        ):
+            return snapshot
+        return None
+    
+    def clear_snapshots(directory):
+        """Removes a previous run's snapshots, whose higher indexes would prune the new ones"""
+        if not os.path.isdir(directory):
+            return
+        for name in os.listdir(directory):
+            if name.startswith("snapshot_") or name.startswith("latest.json"):
+                os.unlink(os.path.join(directory, name))
+    
+    def apply_snapshot(config, snapshot):
+        """Restarts the vehicles from their snapshot positions with the remaining simulated time
+        
+        Vehicles that already reached their destination are not relaunched.
+        """
+        state = {vehicle["name"]: vehicle for vehicle in snapshot["vehicles"]}
+        vehicles = []
+        completed = []
+        for vehicle in config["vehicles"]:
+            saved = state.get(vehicle["name"])
+            if saved is None:
+                vehicles.append(vehicle)
+            elif saved["status"] == "VEHICLE_IN_DEST":
+                completed.append(saved)
+            else:
+                vehicles.append({
+                    **vehicle,
+                    "position": saved["position"] or vehicle["position"],
+                    "destination": saved["destination"] or vehicle["destination"]
+                })
+        config["vehicles"] = vehicles
+        config["max_time"] = max(max_simulation_time - snapshot["elapsed_simulated_time"], 0)
+        return completed
+    
+    # Typed results schema (JSON + Parquet), shared with the ping-pong and server-test
+    # components: one row per run
+    RESULTS_SCHEMA_VERSION = 1
+    
+    @dataclass(slots=True)
+    class RunRecord:
+        """Result of one run with the columns shared by every component
+        
+        Component-specific metrics go in `metrics` (name -> numeric value).
+        latency_p50/p95_seconds always use the nearest-rank percentile (the smallest value
+        with at least p% of the samples <= it), without interpolation.
+        """
+        component: str
+        started_at: str
+        finished_at: str
+        success: bool
+        duration_seconds: float | None
+        config: dict
+        config_hash: str
+        messages_sent: int | None = None
+        messages_received: int | None = None
+        throughput_msgs_per_second: float | None = None
+        latency_p50_seconds: float | None = None
+        latency_p95_seconds: float | None = None
+        peak_rss_kb: int | None = None
+        metrics: dict = field(default_factory=dict)
+        error: str | None = None
+        schema_version: int = RESULTS_SCHEMA_VERSION
+        run_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    
+    def config_fingerprint(config):
+        """Stable configuration hash used to group comparable runs"""
+        canonical = json.dumps(config, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+    
+    def write_run_record(record, json_path=None, parquet_path=None):
+        """Serializes the record to JSON and, when pyarrow is installed, to Parquet"""
+        data = asdict(record)
+        data["metrics"] = {key: float(value) for key, value in data["metrics"].items() if value is not None}
+        if json_path:
+            with open(json_path, "w") as f:
+                json.dump(data, f, indent=2, default=str)
+        if not parquet_path:
+            return
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            print("pyarrow is not installed, skipping the Parquet record")
+            return
+        schema = pa.schema([
+            ("schema_version", pa.int32()),
+            ("run_id", pa.string()),
+            ("component", pa.string()),
+            ("started_at", pa.string()),
+            ("finished_at", pa.string()),
+            ("success", pa.bool_()),
+            ("duration_seconds", pa.float64()),
+            ("config", pa.string()),
+            ("config_hash", pa.string()),
+            ("messages_sent", pa.int64()),
+            ("messages_received", pa.int64()),
+            ("throughput_msgs_per_second", pa.float64()),
+            ("latency_p50_seconds", pa.float64()),
+            ("latency_p95_seconds", pa.float64()),
+            ("peak_rss_kb", pa.int64()),
+            ("metrics", pa.map_(pa.string(), pa.float64())),
+            ("error", pa.string())
+        ])
+        # The configuration is heterogeneous: Parquet stores it as canonical JSON
+        row = {**data, "config": json.dumps(data["config"], sort_keys=True, default=str)}
+        pq.write_table(pa.Table.from_pylist([row], schema=schema), parquet_path)
+    
+    EARTH_RADIUS_M = 6371000.0
+    
+    def haversine_m(origins, destinations):
+        """Great-circle distances in meters between [lat, lon] points, element-wise over (n, 2) arrays"""
+        origins = np.radians(np.asarray(origins, dtype=float).reshape(-1, 2))
+        destinations = np.radians(np.asarray(destinations, dtype=float).reshape(-1, 2))
+        delta = destinations - origins
+        h = (
+            np.sin(delta[:, 0] / 2) ** 2
+            + np.cos(origins[:, 0]) * np.cos(destinations[:, 0]) * np.sin(delta[:, 1] / 2) ** 2
+        )
+        return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+    
+    def estimate_routes(vehicles):
+        """Straight-line distance, ETA and bounding box of every vehicle, computed as whole arrays
+        
+        The straight line is a lower bound: SimFleet routes follow the road network.
+        """
+        if not vehicles:
+            return {"vehicles": [], "bounding_box": None, "summary": {"vehicles": 0}}
+        
+        origins = np.array([vehicle["position"] for vehicle in vehicles], dtype=float)
+        destinations = np.array([vehicle["destination"] for vehicle in vehicles], dtype=float)
+        speeds_ms = np.array([vehicle["speed"] for vehicle in vehicles], dtype=float) / 3.6
+        distances = haversine_m(origins, destinations)
+        etas = np.divide(distances, speeds_ms, out=np.full_like(distances, np.nan), where=speeds_ms > 0)
+        
+        points = np.vstack([origins, destinations])
+        (lat_min, lon_min), (lat_max, lon_max) = points.min(axis=0), points.max(axis=0)
+        center = [float(lat_min + lat_max) / 2, float(lon_min + lon_max) / 2]
+        width, height = haversine_m(
+            [[center[0], lon_min], [lat_min, center[1]]],
+            [[center[0], lon_max], [lat_max, center[1]]]
+        )
+        
+        def stats(values):
+            values = values[~np.isnan(values)]
+            if not len(values):
+                return None
+            p50, p95 = np.percentile(values, [50, 95])
+            return {
+                "min": round(float(values.min()), 3), "mean": round(float(values.mean()), 3),
+                "p50": round(float(p50), 3), "p95": round(float(p95), 3), "max": round(float(values.max()), 3)
+            }
+        
+        # Round and convert as whole arrays: per-element float()/round() dominates at 10^5 vehicles
+        rounded_etas = np.round(etas, 3).tolist()
+        return {
+            "vehicles": [
+                {"name": vehicle["name"], "straight_line_m": distance, "eta_seconds": None if eta != eta else eta}
+                for vehicle, distance, eta in zip(vehicles, np.round(distances, 2).tolist(), rounded_etas)
+            ],
+            "bounding_box": {
+                "lat_min": float(lat_min), "lon_min": float(lon_min),
+                "lat_max": float(lat_max), "lon_max": float(lon_max),
+                "center": center,
+                "width_m": round(float(width), 1),
+                "height_m": round(float(height), 1)
+            },
+            "summary": {
+                "vehicles": len(vehicles),
+                "total_straight_line_m": round(float(distances.sum()), 2),
+                "straight_line_m": stats(distances),
+                "eta_seconds": stats(etas)
+            }
+        }
+    
+    def validate_trip_times(estimates, snapshot, speeds_kmh, tolerance):
+        """Checks SimFleet's reported trip times against the precomputed estimates
+        
+        A trip can never beat the straight-line ETA, and it must take the reported route
+        distance at the vehicle's speed, both within `tolerance` (relative).
+        """
+        reported = {vehicle["name"]: vehicle for vehicle in snapshot["vehicles"]}
+        rows = []
+        for estimate in estimates["vehicles"]:
+            vehicle = reported.get(estimate["name"])
+            row = {"name": estimate["name"], "eta_seconds": estimate["eta_seconds"]}
+            if vehicle is None or estimate["eta_seconds"] is None:
+                row.update(valid=False, reason="not simulated" if vehicle is None else "zero speed")
+            else:
+                route_eta = vehicle["distance_m"] / (speeds_kmh[estimate["name"]] / 3.6)
+                row.update(
+                    trip_seconds=vehicle["arrived_at"],
+                    route_m=vehicle["distance_m"],
+                    route_eta_seconds=round(route_eta, 3),
+                    detour_factor=round(vehicle["distance_m"] / estimate["straight_line_m"], 3)
+                    if estimate["straight_line_m"] else None
+                )
+                if vehicle["arrived_at"] is None:
+                    # Only wrong if the route should have been finished well before the end
+                    overdue = route_eta < snapshot["elapsed_simulated_time"] * (1 - tolerance)
+                    row.update(valid=not overdue, reason="overdue" if overdue else "still travelling")
+                else:
+                    faster_than_line = vehicle["arrived_at"] < estimate["eta_seconds"] * (1 - tolerance)
+                    off_route = abs(vehicle["arrived_at"] - route_eta) > tolerance * route_eta
+                    row.update(
+                        deviation=round((vehicle["arrived_at"] - route_eta) / route_eta, 4) if route_eta else None,
+                        valid=not (faster_than_line or off_route),
+                        reason="faster than straight line" if faster_than_line
+                        else "does not match route distance" if off_route else "ok"
+                    )
+            rows.append(row)
+        return {"tolerance": tolerance, "valid": all(row["valid"] for row in rows), "vehicles": rows}
+    
+    managed_processes = []
+    
+    def run_simfleet_headless(headless, checkpoint_dir, resume, time_scale, profile_path=None):
+        reserved_ports = allocate_ports(2 if headless else 3)
+        client_port, server_port = reserved_ports[:2]
+        http_port = None if headless else reserved_ports[2]
+        config = create_simulation_config(http_port, time_scale)
+        
+        snapshot = load_latest_snapshot(checkpoint_dir) if resume else None
+        completed_vehicles = []
+        if snapshot is not None:
+            completed_vehicles = apply_snapshot(config, snapshot)
+            print(f"Resuming from snapshot {snapshot['snapshot_index']} "
+                  f"at {snapshot['elapsed_simulated_time']}s ({len(completed_vehicles)} vehicles already arrived)")
+        elif resume:
+            print(f"No snapshot found in {checkpoint_dir}, starting from scratch")
+        if snapshot is None:
+            # Numbering restarts at 0: older snapshot_NNNNNN files would sort after the new ones
+            clear_snapshots(checkpoint_dir)
+        
+        checkpoint_info = {
+            "directory": checkpoint_dir,
+            "interval_seconds": checkpoint_interval,
+            "resumed_from_snapshot": snapshot["snapshot_index"] if snapshot else None,
+            "resumed_at_simulated_time": snapshot["elapsed_simulated_time"] if snapshot else 0.0,
+            "completed_before_resume": completed_vehicles
+        }
+        
+        if snapshot is not None and (snapshot.get("finished") or config["max_time"] <= 0 or not config["vehicles"]):
+            print("Snapshot already covers the whole simulation, nothing to resume")
+            release_ports(reserved_ports)
+            return {
+                "simulation_success": True,
+                "configuration": {
+                    "max_time": max_simulation_time,
+                    "vehicles": num_vehicles,
+                    "simulation_name": config['simulation_name']
+                },
+                "checkpoint": checkpoint_info,
+                "return_code": 0,
+                "execution_time": 0,
+                "timestamp": datetime.now().isoformat()
+            }
+        
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as launcher_file:
+            launcher_file.write(SIMFLEET_LAUNCHER)
+            launcher_path = launcher_file.name
         
         with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as config_file:
             json.dump(config, config_file, indent=2)
@@ -67,50 +941,106 @@ def simfleet_basic_simulation(
         print(f"Config created: {config['simulation_name']}")
         print(f"Vehicles: {len(config['vehicles'])}")
         print(f"Max time: {config['max_time']} seconds")
+        print(f"Ports: client {client_port}, s2s {server_port}, web UI {'disabled (headless)' if headless else http_port}")
+        print(f"Checkpoints: {checkpoint_dir} (every {checkpoint_interval}s)")
+        print(f"Time scale: {time_scale}x ({config['max_time'] / time_scale:.1f}s of wall time)")
         
         spade_process = None
         simfleet_process = None
         
         try:
-            print("Step 1: Starting SPADE server...")
-            spade_process = subprocess.Popen(
-                ["spade", "run"],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            
-            print(f"SPADE server started (PID: {spade_process.pid})")
-            print("Waiting for SPADE server to initialize...")
-            time.sleep(8)
+            # The reservation sockets are closed before spade run binds: if another process takes
+            # a port in between, spade run exits and is retried on freshly allocated ports
+            max_server_attempts = 3
+            for server_attempt in range(1, max_server_attempts + 1):
+                print(f"Step 1: Starting SPADE server (attempt {server_attempt}/{max_server_attempts})...")
+                # Own process groups, so teardown can kill each child together with its descendants
+                spade_process = subprocess.Popen(
+                    [
+                        "spade", "run",
+                        "--client_port", str(client_port),
+                        "--server_port", str(server_port),
+                        "--memory"
+                    ],
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    text=True,
+                    start_new_session=True
+                )
+                
+                managed_processes.append(spade_process)
+                print(f"SPADE server started (PID: {spade_process.pid})")
+                print("Waiting for SPADE server to initialize...")
+                time.sleep(8)
+                if spade_process.poll() is None:
+                    break
+                output = " ".join(part.strip() for part in spade_process.communicate() if part)
+                print(f"SPADE server exited on startup (code {spade_process.returncode}): {output[-300:]}")
+                if server_attempt == max_server_attempts:
+                    raise RuntimeError(f"SPADE server exited on startup (code {spade_process.returncode})")
+                release_ports(reserved_ports[:2])
+                client_port, server_port = allocate_ports(2)
+                reserved_ports[:2] = [client_port, server_port]
             
             print("Step 2: Starting SimFleet simulation...")
+            checkpoint_info["first_index"] = snapshot["snapshot_index"] + 1 if snapshot else 0
+            checkpoint_info["launched_at"] = datetime.now().isoformat()
             simfleet_process = subprocess.Popen(
-                ["simfleet", "--config", config_path, "--autorun"],
+                [
+                    sys.executable, launcher_path,
+                    "--config", config_path,
+                    "--checkpoint-dir", checkpoint_dir,
+                    "--checkpoint-interval", str(checkpoint_interval),
+                    "--time-offset", str(checkpoint_info["resumed_at_simulated_time"]),
+                    "--first-index", str(checkpoint_info["first_index"]),
+                    "--xmpp-port", str(client_port)
+                ] + (["--headless"] if headless else [])
+                + (["--profile-output", profile_path] if profile_path else []),
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                text=True
+                text=True,
+                start_new_session=True
             )
             
+            managed_processes.append(simfleet_process)
             print(f"SimFleet started (PID: {simfleet_process.pid})")
             
-            simfleet_process.wait(timeout=max_simulation_time + 30)
+            started_at = time.monotonic()
+            simfleet_process.wait(timeout=config["max_time"] / time_scale + 30)
+            wall_time = time.monotonic() - started_at
             
             stdout, stderr = simfleet_process.communicate()
             
+            # The launcher writes a finished snapshot only after the simulation completes: a zero
+            # exit code without it (or with an older snapshot from a previous run) is a failure
+            final_snapshot = load_run_snapshot(checkpoint_dir, checkpoint_info)
+            completed = final_snapshot is not None and final_snapshot["finished"]
+            
             results = {
-                "simulation_success": simfleet_process.returncode == 0,
+                "simulation_success": simfleet_process.returncode == 0 and completed,
                 "configuration": {
                     "max_time": max_simulation_time,
                     "vehicles": num_vehicles,
-                    "simulation_name": config['simulation_name']
+                    "simulation_name": config['simulation_name'],
+                    "xmpp_client_port": client_port,
+                    "xmpp_server_port": server_port,
+                    "http_port": http_port,
+                    "headless": headless,
+                    "time_scale": time_scale
                 },
+                "simfleet_pid": simfleet_process.pid,
+                "checkpoint": checkpoint_info,
                 "simfleet_output": stdout if stdout else "",
                 "simfleet_errors": stderr if stderr else "",
                 "return_code": simfleet_process.returncode,
                 "execution_time": max_simulation_time,
+                "wall_time_seconds": round(wall_time, 2),
                 "timestamp": datetime.now().isoformat()
             }
+            if simfleet_process.returncode != 0:
+                results["error"] = f"SimFleet exited with code {simfleet_process.returncode}"
+            elif not completed:
+                results["error"] = "SimFleet exited without writing a finished snapshot"
             
             print("SimFleet simulation completed")
             if stdout:
@@ -128,6 +1058,7 @@ def simfleet_basic_simulation(
                 "simulation_success": False,
                 "error": "Simulation timeout",
                 "configuration": {"max_time": max_simulation_time, "vehicles": num_vehicles},
+                "checkpoint": checkpoint_info,
                 "timestamp": datetime.now().isoformat()
             }
             return results
@@ -138,37 +1069,382 @@ def simfleet_basic_simulation(
                 "simulation_success": False,
                 "error": str(e),
                 "configuration": {"max_time": max_simulation_time, "vehicles": num_vehicles},
+                "checkpoint": checkpoint_info,
                 "timestamp": datetime.now().isoformat()
             }
             return results
             
         finally:
-            if simfleet_process and simfleet_process.poll() is None:
-                print("Terminating SimFleet...")
-                simfleet_process.terminate()
-                try:
-                    simfleet_process.wait(timeout=5)
-                except subprocess.TimeoutExpired:
-                    simfleet_process.kill()
+            # SimFleet's launcher writes its final snapshot on SIGTERM within the grace period
+            shutdown_processes([simfleet_process, spade_process])
             
-            if spade_process and spade_process.poll() is None:
-                print("Terminating SPADE server...")
-                spade_process.terminate()
+            for path in (config_path, launcher_path):
                 try:
-                    spade_process.wait(timeout=5)
-                except subprocess.TimeoutExpired:
-                    spade_process.kill()
-            
-            try:
-                os.unlink(config_path)
-            except:
-                pass
+                    os.unlink(path)
+                except:
+                    pass
             
+            release_ports(reserved_ports)
             print("Cleanup completed")
     
+    def compare_time_scaled(scaled_snapshot, reference_snapshot, tolerance):
+        """Per-vehicle arrival time and final position of a scaled run against a real-time run
+        
+        Arrival times must agree within `tolerance` (relative); vehicles still travelling at the
+        end must agree on their final position within `tolerance` of the route length.
+        """
+        reference = {vehicle["name"]: vehicle for vehicle in reference_snapshot["vehicles"]}
+        vehicles = []
+        for vehicle in scaled_snapshot["vehicles"]:
+            expected = reference.get(vehicle["name"])
+            row = {"name": vehicle["name"], "arrived_at": vehicle["arrived_at"]}
+            if expected is None:
+                row.update(equivalent=False, reason="missing in real-time run")
+            elif (vehicle["arrived_at"] is None) != (expected["arrived_at"] is None):
+                row.update(equivalent=False, reason="arrived in only one run", reference_arrived_at=expected["arrived_at"])
+            elif vehicle["arrived_at"] is not None:
+                deviation = abs(vehicle["arrived_at"] - expected["arrived_at"]) / max(expected["arrived_at"], 1e-9)
+                row.update(
+                    reference_arrived_at=expected["arrived_at"],
+                    deviation=round(deviation, 4),
+                    equivalent=deviation <= tolerance
+                )
+            else:
+                offset = float(haversine_m(vehicle["position"], expected["position"])[0])
+                deviation = offset / max(expected["distance_m"], 1e-9)
+                row.update(position_offset_m=round(offset, 1), deviation=round(deviation, 4), equivalent=deviation <= tolerance)
+            vehicles.append(row)
+        return {
+            "time_scale": scaled_snapshot.get("time_scale"),
+            "tolerance": tolerance,
+            "equivalent": all(row["equivalent"] for row in vehicles),
+            "vehicles": vehicles
+        }
+    
+    def run_time_scale_check(last_snapshot):
+        """Replays the scenario in real time and checks the scaled run against it"""
+        if checkpoint["resumed_from_snapshot"] is not None:
+            return {"error": "Not checked: the scaled run was resumed from a snapshot"}
+        if last_snapshot is None:
+            return {"error": "Not checked: the scaled run wrote no snapshot"}
+        print(f"Time scale check: replaying {max_simulation_time}s in real time...")
+        scratch_dir = tempfile.mkdtemp(prefix="simfleet_realtime_")
+        try:
+            reference_results = run_simfleet_headless(headless, scratch_dir, False, 1.0)
+            reference_snapshot = load_latest_snapshot(scratch_dir)
+        finally:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+        if reference_snapshot is None:
+            return {"error": f"Real-time run failed: {reference_results.get('error', 'no snapshot')}"}
+        report = compare_time_scaled(last_snapshot, reference_snapshot, time_scale_tolerance)
+        report["reference_wall_time_seconds"] = reference_results.get("wall_time_seconds")
+        return report
+    
+    def process_usage(report, pid):
+        """Resource summary of one process from a ResourceSampler report"""
+        for key, usage in report["summary"].items():
+            if key.endswith(f"({pid})"):
+                return usage
+        return None
+    
+    def run_headless_benchmark(main_results):
+        """Runs the other launch profile once and compares the SimFleet process of both runs"""
+        print(f"Benchmark: running the {'web UI' if headless else 'headless'} profile for comparison...")
+        scratch_dir = tempfile.mkdtemp(prefix="simfleet_benchmark_")
+        sampler = ResourceSampler(lambda: managed_processes, resource_sample_interval or 1.0)
+        sampler.start()
+        try:
+            comparison_results = run_simfleet_headless(not headless, scratch_dir, False, time_scale)
+        finally:
+            sampler.stop()
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+        
+        profiles = {}
+        for profile_headless, results, report in (
+            (headless, main_results, main_results["resource_usage"]),
+            (not headless, comparison_results, sampler.report())
+        ):
+            usage = process_usage(report, results.get("simfleet_pid"))
+            if usage is None:
+                return {"error": "SimFleet process was not sampled (resource_sample_interval = 0?)"}
+            profiles["headless" if profile_headless else "web_ui"] = {
+                "avg_cpu_percent": usage["avg_cpu_percent"],
+                "max_cpu_percent": usage["max_cpu_percent"],
+                "max_rss_kb": usage["max_rss_kb"],
+                "max_num_fds": usage["max_num_fds"],
+                "max_num_threads": usage["max_num_threads"],
+                "simulation_success": results.get("simulation_success", False)
+            }
+        
+        web_ui, headless_profile = profiles["web_ui"], profiles["headless"]
+        return {
+            **profiles,
+            "cpu_reduction_percent": round(
+                100.0 * (1 - headless_profile["avg_cpu_percent"] / web_ui["avg_cpu_percent"]), 1
+            ) if web_ui["avg_cpu_percent"] else None,
+            "rss_reduction_kb": web_ui["max_rss_kb"] - headless_profile["max_rss_kb"]
+        }
+    
+    # Preemption sends SIGTERM: exit through the finally blocks so SimFleet writes its last snapshot
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+    
+    run_started_at = datetime.now().isoformat()
+    run_config = {
+        "max_simulation_time": max_simulation_time,
+        "num_vehicles": num_vehicles,
+        "resource_sample_interval": resource_sample_interval,
+        "checkpoint_interval": checkpoint_interval,
+        "resume": resume,
+        "headless": headless,
+        "headless_benchmark": headless_benchmark,
+        "time_scale": time_scale,
+        "time_scale_check": time_scale_check,
+        "time_scale_tolerance": time_scale_tolerance,
+        "eta_tolerance": eta_tolerance
+    }
+    
+    # Trailing frame the launcher's sampler adds to stacks sampled off-CPU
+    OFF_CPU_FRAME = "[off-cpu]"
+    
+    def summarize_profile(path, top=10):
+        """Top on-CPU leaf frames and asyncio tasks of the collapsed stacks written by the launcher"""
+        counts = {}
+        try:
+            with open(path) as f:
+                for line in f:
+                    stack, _, count = line.rstrip("\n").rpartition(" ")
+                    counts[stack] = int(count)
+        except (FileNotFoundError, ValueError):
+            pass
+        
+        total = sum(counts.values())
+        off_cpu = 0
+        leaves = {}
+        tasks = {}
+        for stack, count in counts.items():
+            frames = stack.split(";")
+            if frames[-1] == OFF_CPU_FRAME:
+                off_cpu += count
+                continue
+            leaves[frames[-1]] = leaves.get(frames[-1], 0) + count
+            task = next((frame for frame in frames if frame.startswith("[task ")), None)
+            if task:
+                tasks[task] = tasks.get(task, 0) + count
+        
+        def ranking(counter):
+            return [
+                {"frame": frame, "samples": count, "percent": round(100 * count / total, 2)}
+                for frame, count in sorted(counter.items(), key=lambda item: -item[1])[:top]
+            ]
+        
+        return {
+            "samples": total,
+            "stacks": len(counts),
+            "off_cpu_percent": round(100 * off_cpu / total, 2) if total else None,
+            "top_self": ranking(leaves),
+            "top_tasks": ranking(tasks),
+            "file_bytes": os.path.getsize(path) if os.path.exists(path) else 0
+        }
+    
+    def ensure_profile_output():
+        """The artifact always exists: empty when profiling is off or the launcher died early"""
+        if profile_output is not None and not os.path.exists(profile_output.path):
+            open(profile_output.path, "w").close()
+    
+    def save_run_record(success, duration_seconds=None, peak_rss_kb=None, metrics=None, error=None):
+        if results_record is None and results_table is None:
+            return
+        write_run_record(
+            RunRecord(
+                component="simfleet_basic_simulation",
+                started_at=run_started_at,
+                finished_at=datetime.now().isoformat(),
+                success=bool(success),
+                duration_seconds=duration_seconds,
+                config=run_config,
+                config_hash=config_fingerprint(run_config),
+                peak_rss_kb=peak_rss_kb,
+                metrics=metrics or {},
+                error=error
+            ),
+            results_record.path if results_record is not None else None,
+            results_table.path if results_table is not None else None
+        )
+    
     try:
+        scenario = create_simulation_config(None, time_scale)
+        route_report = estimate_routes(scenario["vehicles"])
+        print(f"Route estimates: {route_report['summary']}")
+        
         print("Executing SimFleet simulation...")
-        simulation_results = run_simfleet_headless()
+        resource_sampler = ResourceSampler(lambda: managed_processes, resource_sample_interval)
+        resource_sampler.start()
+        try:
+            simulation_results = run_simfleet_headless(
+                headless, checkpoint_dir, resume, time_scale,
+                profile_output.path if profile and profile_output is not None else None
+            )
+        finally:
+            resource_sampler.stop()
+            ensure_profile_output()
+        simulation_results["resource_usage"] = resource_sampler.report()
+        if profile and profile_output is not None:
+            simulation_results["profile"] = summarize_profile(profile_output.path)
+        
+        profile_report = simulation_results.get("profile")
+        if profile_report and profile_report["samples"]:
+            profile_text = "\n".join(
+                [
+                    f"- {profile_report['samples']} samples, {profile_report['stacks']} distinct stacks",
+                    f"- Off CPU (waits or no thread CPU progress): {profile_report['off_cpu_percent']}%",
+                    "- Top self (on CPU):"
+                ]
+                + [f"  {row['percent']:>6}%  {row['frame']}" for row in profile_report["top_self"]]
+                + ["- Top tasks (on CPU):"]
+                + [f"  {row['percent']:>6}%  {row['frame']}" for row in profile_report["top_tasks"]]
+            )
+        else:
+            profile_text = "- Not run"
+        
+        if headless_benchmark:
+            simulation_results["headless_benchmark"] = run_headless_benchmark(simulation_results)
+        
+        benchmark = simulation_results.get("headless_benchmark")
+        if not benchmark:
+            benchmark_text = "- Not run"
+        elif "error" in benchmark:
+            benchmark_text = f"- Error: {benchmark['error']}"
+        else:
+            benchmark_text = "\n".join(
+                [
+                    f"- {profile}: CPU avg {benchmark[profile]['avg_cpu_percent']}% / "
+                    f"max {benchmark[profile]['max_cpu_percent']}%, RSS max {benchmark[profile]['max_rss_kb']} kB, "
+                    f"fds max {benchmark[profile]['max_num_fds']}, threads max {benchmark[profile]['max_num_threads']}"
+                    for profile in ("web_ui", "headless")
+                ] + [
+                    f"- Headless saves: {benchmark['cpu_reduction_percent']}% CPU, {benchmark['rss_reduction_kb']} kB RSS"
+                ]
+            )
+        
+        # The launcher writes its last snapshot while being stopped, so read it after cleanup
+        checkpoint = simulation_results.setdefault("checkpoint", {"directory": checkpoint_dir})
+        last_snapshot = load_run_snapshot(checkpoint_dir, checkpoint)
+        if last_snapshot is not None:
+            checkpoint["last_snapshot"] = {
+                "snapshot_index": last_snapshot["snapshot_index"],
+                "elapsed_simulated_time": last_snapshot["elapsed_simulated_time"],
+                "finished": last_snapshot["finished"],
+                "written_at": last_snapshot["written_at"]
+            }
+            checkpoint["vehicles"] = last_snapshot["vehicles"]
+        if not simulation_results.get("simulation_success", False) and last_snapshot and not last_snapshot["finished"]:
+            simulation_results["error"] = (
+                f"{simulation_results.get('error', 'Unknown error')} "
+                f"(resume=True restarts from snapshot {last_snapshot['snapshot_index']} "
+                f"at {last_snapshot['elapsed_simulated_time']}s)"
+            )
+        
+        checkpoint_lines = [
+            f"- Directory: {checkpoint.get('directory')}",
+            f"- Resumed From Snapshot: {checkpoint.get('resumed_from_snapshot')} "
+            f"(at {checkpoint.get('resumed_at_simulated_time', 0.0)}s)"
+        ]
+        if "last_snapshot" in checkpoint:
+            last = checkpoint["last_snapshot"]
+            checkpoint_lines.append(
+                f"- Last Snapshot: #{last['snapshot_index']} at {last['elapsed_simulated_time']}s "
+                f"({'finished' if last['finished'] else 'in progress'})"
+            )
+            checkpoint_lines += [
+                f"  {vehicle['name']}: {vehicle['status']} at {vehicle['position']} -> {vehicle['destination']}"
+                for vehicle in checkpoint["vehicles"]
+            ]
+        checkpoint_text = "\n".join(checkpoint_lines)
+        
+        if time_scale_check and time_scale != 1.0:
+            simulation_results["time_scale_check"] = run_time_scale_check(last_snapshot)
+        
+        time_scale_lines = [
+            f"- Factor: {time_scale}x ({max_simulation_time}s simulated in "
+            f"{simulation_results.get('wall_time_seconds', 'N/A')}s of wall time)"
+        ]
+        scale_check = simulation_results.get("time_scale_check")
+        if scale_check and "error" in scale_check:
+            time_scale_lines.append(f"- Real-Time Check: {scale_check['error']}")
+        elif scale_check:
+            time_scale_lines.append(
+                f"- Real-Time Check: {'EQUIVALENT' if scale_check['equivalent'] else 'NOT EQUIVALENT'} "
+                f"(tolerance {scale_check['tolerance']}, real-time run took {scale_check['reference_wall_time_seconds']}s)"
+            )
+            for row in scale_check["vehicles"]:
+                detail = row.get("reason") or (
+                    f"arrived at {row['arrived_at']}s vs {row['reference_arrived_at']}s"
+                    if row["arrived_at"] is not None
+                    else f"final position {row['position_offset_m']} m apart"
+                )
+                time_scale_lines.append(f"  {row['name']}: {detail} (deviation {row.get('deviation', 'N/A')})")
+        time_scale_text = "\n".join(time_scale_lines)
+        
+        if last_snapshot is not None and checkpoint.get("resumed_from_snapshot") is None:
+            route_report["validation"] = validate_trip_times(
+                route_report, last_snapshot,
+                {vehicle["name"]: vehicle["speed"] for vehicle in scenario["vehicles"]},
+                eta_tolerance
+            )
+        simulation_results["route_estimates"] = route_report
+        
+        bbox = route_report["bounding_box"] or {}
+        route_lines = [
+            f"- Bounding Box: {bbox.get('width_m', 'N/A')} m x {bbox.get('height_m', 'N/A')} m "
+            f"around {bbox.get('center', 'N/A')}",
+            f"- ETA (straight line): {route_report['summary'].get('eta_seconds')}"
+        ]
+        validation = route_report.get("validation")
+        if validation is None:
+            route_lines.append("- Trip Time Check: not run (no snapshot, or resumed run)")
+        else:
+            route_lines.append(
+                f"- Trip Time Check: {'VALID' if validation['valid'] else 'INVALID'} (tolerance {validation['tolerance']})"
+            )
+            for row in validation["vehicles"]:
+                route_lines.append(
+                    f"  {row['name']}: straight-line ETA {row['eta_seconds']}s, route ETA {row.get('route_eta_seconds')}s, "
+                    f"reported {row.get('trip_seconds')}s, detour x{row.get('detour_factor')} -> {row['reason']}"
+                )
+        route_text = "\n".join(route_lines)
+        
+        if route_estimates is not None:
+            with open(route_estimates.path, 'w') as f:
+                json.dump({"config": scenario, **route_report}, f, indent=2)
+            print(f"Route estimates saved to artifact: {route_estimates.path}")
+        
+        usage_summary = simulation_results["resource_usage"]["summary"]
+        route_summary = route_report["summary"]
+        save_run_record(
+            simulation_results.get("simulation_success", False),
+            duration_seconds=simulation_results.get("wall_time_seconds"),
+            peak_rss_kb=sum(usage["max_rss_kb"] for usage in usage_summary.values()) or None,
+            metrics={
+                "eta_mean_seconds": (route_summary.get("eta_seconds") or {}).get("mean"),
+                "eta_max_seconds": (route_summary.get("eta_seconds") or {}).get("max"),
+                "total_straight_line_m": route_summary.get("total_straight_line_m"),
+                "max_cpu_percent": max((usage["max_cpu_percent"] for usage in usage_summary.values()), default=None),
+                "simulated_max_time": simulation_results.get("configuration", {}).get("max_time"),
+                "time_scale": time_scale,
+                "return_code": simulation_results.get("return_code"),
+                "trip_times_valid": validation["valid"] if validation is not None else None
+            },
+            error=simulation_results.get("error")
+        )
+        
+        resource_lines = [
+            f"- {name}: CPU avg {usage['avg_cpu_percent']}% / max {usage['max_cpu_percent']}%, "
+            f"RSS max {usage['max_rss_kb']} kB, fds max {usage['max_num_fds']}, "
+            f"threads max {usage['max_num_threads']}, "
+            f"ctx switches {usage['voluntary_ctxt_switches']}/{usage['nonvoluntary_ctxt_switches']}"
+            for name, usage in simulation_results["resource_usage"]["summary"].items()
+        ]
+        resource_text = "\n".join(resource_lines) if resource_lines else "- No samples"
         
         success = simulation_results.get("simulation_success", False)
         config = simulation_results.get("configuration", {})
@@ -181,12 +1457,31 @@ Configuration:
 - Simulation Time: {config.get('max_time', 'Unknown')} seconds
 - Number of Vehicles: {config.get('vehicles', 'Unknown')}
 - Simulation Name: {config.get('simulation_name', 'Unknown')}
+- Headless: {config.get('headless', headless)}
 
 Execution Details:
 - Return Code: {simulation_results.get('return_code', 'N/A')}
 - Execution Time: {simulation_results.get('execution_time', 'N/A')} seconds
 - Error: {simulation_results.get('error', 'None')}
 
+Resource Usage (every {resource_sample_interval}s):
+{resource_text}
+
+Checkpointing (every {checkpoint_interval}s):
+{checkpoint_text}
+
+Headless Benchmark (SimFleet process, web UI vs headless):
+{benchmark_text}
+
+Time Scale:
+{time_scale_text}
+
+Route Estimates:
+{route_text}
+
+Profile (SimFleet process, stack sampling every 10 ms):
+{profile_text}
+
 SimFleet Output:
 {simulation_results.get('simfleet_output', 'No output captured')[:2000]}
 
@@ -198,7 +1493,10 @@ Timestamp: {simulation_results.get('timestamp', 'Unknown')}
 RESULTADO FINAL: {'SUCCESS' if success else 'FAILED'}
 
 ==== DETAILED RESULTS (JSON) ====
-{json.dumps(simulation_results, indent=2)[:1000]}...
+{json.dumps({**simulation_results, "resource_usage": {"summary": simulation_results['resource_usage']['summary']}}, indent=2)}
+
+==== RESOURCE SAMPLES (JSON) ====
+{json.dumps(simulation_results['resource_usage']['series'])}
 """
         
         with open(results_output.path, 'w') as f:
@@ -207,7 +1505,8 @@ RESULTADO FINAL: {'SUCCESS' if success else 'FAILED'}
         print(f"Results saved to artifact: {results_output.path}")
         print(f"Final Status: {'SUCCESS' if success else 'FAILED'}")
         
-        if not success:
+        # In a sweep a failed run still has to reach the aggregator as a success=False row
+        if not success and fail_on_error:
             raise Exception(f"SimFleet simulation failed: {simulation_results.get('error', 'Unknown error')}")
         
     except Exception as e:
@@ -231,7 +1530,82 @@ Traceback:
         with open(results_output.path, 'w') as f:
             f.write(error_text)
         
-        raise
+        ensure_profile_output()
+        save_run_record(False, error=str(e))
+        if fail_on_error:
+            raise
+
+@dsl.component(
+    base_image='python:3.12',
+    packages_to_install=['pandas==2.3.1', 'pyarrow']
+)
+def aggregate_simfleet_runs(
+    run_results: Input[List[Dataset]],
+    aggregated_runs: Output[Dataset],
+    summary_output: Output[Dataset]
+) -> None:
+    """Merges the results_table rows of a sweep into one columnar table plus per-metric statistics"""
+    import json
+    import pandas as pd
+    
+    def load_record(path):
+        """Reads the RunRecord row (results_table) of one run"""
+        record = pd.read_parquet(path).iloc[0].to_dict()
+        record["config"] = json.loads(record["config"])
+        record["metrics"] = dict(record["metrics"])
+        return record
+    
+    def extract(record):
+        config = record["config"]
+        metrics = record["metrics"]
+        return {
+            "max_time": metrics.get("simulated_max_time", config.get("max_simulation_time")),
+            "vehicles": config.get("num_vehicles"),
+            "headless": config.get("headless"),
+            "time_scale": config.get("time_scale"),
+            "success": bool(record["success"]),
+            "return_code": metrics.get("return_code"),
+            "wall_time_seconds": record.get("duration_seconds"),
+            "max_cpu_percent": metrics.get("max_cpu_percent"),
+            "peak_rss_kb": record.get("peak_rss_kb"),
+            "total_straight_line_m": metrics.get("total_straight_line_m"),
+            "eta_mean_seconds": metrics.get("eta_mean_seconds"),
+            "eta_max_seconds": metrics.get("eta_max_seconds"),
+            "trip_times_valid": bool(metrics["trip_times_valid"]) if "trip_times_valid" in metrics else None,
+            "error": record.get("error")
+        }
+    
+    rows = []
+    for index, artifact in enumerate(run_results):
+        try:
+            row = extract(load_record(artifact.path))
+        except (OSError, ValueError, KeyError, IndexError) as e:
+            # A run without a readable record becomes a failed row
+            row = {"success": False, "error": f"Unreadable results: {e}"}
+        rows.append({"run": index, **row})
+    
+    df = pd.DataFrame(rows)
+    df.to_parquet(aggregated_runs.path, index=False)
+    
+    numeric = df.select_dtypes("number").drop(columns=["run"])
+    stats = numeric.describe(percentiles=[0.5, 0.95]).T
+    
+    lines = [
+        "SimFleet Sweep",
+        "==============",
+        f"Runs: {len(df)} ({int(df['success'].fillna(False).astype(bool).sum())} successful)",
+        "",
+        stats.to_string(float_format=lambda value: f"{value:.6g}"),
+        "",
+        "Runs:",
+        df.drop(columns=["error"]).to_string(index=False)
+    ]
+    report = "\n".join(lines)
+    print(report)
+    
+    with open(summary_output.path, 'w') as f:
+        f.write(report + "\n\n==== DETAILED RESULTS (JSON) ====\n")
+        f.write(json.dumps({"runs": rows, "statistics": json.loads(stats.to_json(orient="index"))}, indent=2))
 
 @dsl.pipeline(
     name='simfleet-basic-simulation-pipeline',
@@ -239,11 +1613,33 @@ Traceback:
 )
 def simfleet_basic_pipeline(
     max_simulation_time: int = 30,
-    num_vehicles: int = 2
+    num_vehicles: int = 2,
+    resource_sample_interval: float = 1.0,
+    checkpoint_dir: str = "",
+    checkpoint_interval: float = 10.0,
+    resume: bool = False,
+    headless: bool = True,
+    headless_benchmark: bool = False,
+    time_scale: float = 1.0,
+    time_scale_check: bool = False,
+    time_scale_tolerance: float = 0.05,
+    eta_tolerance: float = 0.1,
+    profile: bool = False
 ):
     simfleet_task = simfleet_basic_simulation(
         max_simulation_time=max_simulation_time,
-        num_vehicles=num_vehicles
+        num_vehicles=num_vehicles,
+        resource_sample_interval=resource_sample_interval,
+        checkpoint_dir=checkpoint_dir,
+        checkpoint_interval=checkpoint_interval,
+        resume=resume,
+        headless=headless,
+        headless_benchmark=headless_benchmark,
+        time_scale=time_scale,
+        time_scale_check=time_scale_check,
+        time_scale_tolerance=time_scale_tolerance,
+        eta_tolerance=eta_tolerance,
+        profile=profile
     )
     
     simfleet_task.set_display_name('SimFleet Real Simulation')
@@ -254,4 +1650,39 @@ def simfleet_basic_pipeline(
         "Ejecuta una simulación real usando SimFleet framework. "
         "Incluye servidor SPADE integrado y vehículos drone con "
         "configuración JSON completa y captura de resultados reales."
-    )
\ No newline at end of file
+    )
+
+# Default sweep configurations (one component run per item)
+DEFAULT_SIMFLEET_SWEEP = [
+    {"max_simulation_time": 30, "num_vehicles": 1},
+    {"max_simulation_time": 30, "num_vehicles": 2},
+    {"max_simulation_time": 60, "num_vehicles": 2}
+]
+
+@dsl.pipeline(
+    name='simfleet-sweep-pipeline',
+    description='Barrido de configuraciones SimFleet repartidas en pods con ParallelFor y agregadas en una tabla'
+)
+def simfleet_sweep_pipeline(
+    configs: list = DEFAULT_SIMFLEET_SWEEP,
+    time_scale: float = 1.0
+):
+    # parallelism must be a compile-time integer
+    with dsl.ParallelFor(items=configs, parallelism=4) as config:
+        run_task = simfleet_basic_simulation(
+            max_simulation_time=config.max_simulation_time,
+            num_vehicles=config.num_vehicles,
+            time_scale=time_scale,
+            # One failed configuration must not fail the ParallelFor and skip the aggregation
+            fail_on_error=False
+        )
+        run_task.set_display_name('SimFleet Simulation (sweep)')
+        run_task.set_cpu_limit('2')
+        run_task.set_memory_limit('2Gi')
+    
+    aggregate_task = aggregate_simfleet_runs(
+        run_results=dsl.Collected(run_task.outputs['results_table'])
+    )
+    aggregate_task.set_display_name('Aggregate sweep results')
+    aggregate_task.set_cpu_limit('0.5')
+    aggregate_task.set_memory_limit('512Mi')
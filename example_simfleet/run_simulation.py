@@ -4,9 +4,109 @@ import json
 import os
 import signal
 import sys
+import tempfile
 from pathlib import Path
 
-def run_simfleet_simulation():
+# Same startup as `simfleet --autorun` without the simulator's web UI
+HEADLESS_LAUNCHER = '''
+import asyncio
+import sys
+
+import spade
+from loguru import logger
+
+from simfleet.communications.protocol import COORDINATION_PROTOCOL, REQUEST_PERFORMATIVE
+from simfleet.config import settings
+from simfleet.simulator import CoordinationBehaviour, SimulatorAgent
+from spade.template import Template
+
+
+class HeadlessSimulatorAgent(SimulatorAgent):
+    async def setup(self):
+        logger.info("Simulator agent running (headless, web interface disabled)")
+        await self.create_directory_agent(
+            name=self.config.directory_name, password=self.config.directory_password
+        )
+        await self.load_scenario()
+        template = Template()
+        template.set_metadata("protocol", COORDINATION_PROTOCOL)
+        template.set_metadata("performative", REQUEST_PERFORMATIVE)
+        self.add_behaviour(CoordinationBehaviour(), template)
+
+
+async def run_simulation(config_file):
+    config = settings.SimfleetConfig(config_file, None, None, 0)
+    simulator = HeadlessSimulatorAgent(
+        config=config,
+        agentjid="simulator_{}@{}".format(config.simulation_name, config.host),
+        password=config.simulation_password
+    )
+    finished = False
+    try:
+        await simulator.start()
+        simulator.run()
+        while not simulator.is_simulation_finished():
+            await asyncio.sleep(0.5)
+        finished = True
+        await simulator.stop()
+        sys.exit(0)
+    except Exception as e:
+        # Only a failure after the simulation finished (SimFleet's metrics step) exits cleanly
+        logger.error(f"An error occurred: {e}")
+        sys.exit(0 if finished else 1)
+
+
+logger.remove()
+logger.add(sys.stderr, level="INFO")
+spade.run(run_simulation(sys.argv[1]))
+# Only reached when spade.run swallowed an exception raised before the simulator started
+sys.exit(1)
+'''
+
+def shutdown_processes(processes, grace_period=5.0, kill_timeout=2.0):
+    """Shuts child processes down concurrently under one global deadline
+    
+    Sends SIGTERM to all of them at once, waits for all against the same deadline and
+    escalates to SIGKILL of the process group for the survivors: total teardown is
+    bounded by grace_period + kill_timeout whatever the number of processes.
+    """
+    def signal_group(process, signum):
+        try:
+            # Signal the group only when the child leads it (start_new_session=True);
+            # if it shares the component's group, killpg would kill the component too
+            if os.getpgid(process.pid) == process.pid:
+                os.killpg(process.pid, signum)
+            else:
+                process.send_signal(signum)
+        except ProcessLookupError:
+            pass
+    
+    def wait_all(pending, timeout):
+        deadline = time.monotonic() + timeout
+        for process in pending:
+            try:
+                process.wait(timeout=max(deadline - time.monotonic(), 0))
+            except subprocess.TimeoutExpired:
+                pass
+        return [process for process in pending if process.poll() is None]
+    
+    running = [process for process in processes if process is not None and process.poll() is None]
+    if not running:
+        return
+    started = time.monotonic()
+    print(f"Terminating {len(running)} processes: {[process.pid for process in running]}")
+    for process in running:
+        signal_group(process, signal.SIGTERM)
+    survivors = wait_all(running, grace_period)
+    if survivors:
+        print(f"Processes not responding, killing their groups: {[process.pid for process in survivors]}")
+        for process in survivors:
+            signal_group(process, signal.SIGKILL)
+        wait_all(survivors, kill_timeout)
+    print(f"{len(running)} processes stopped in {time.monotonic() - started:.2f}s")
+
+
+def run_simfleet_simulation(headless=False):
     print("Starting SimFleet simulation...")
     
     config_file = "vehicles.json"
@@ -20,17 +120,22 @@ def run_simfleet_simulation():
     print(f"Config loaded: {config['simulation_name']}")
     print(f"Vehicles: {len(config['vehicles'])}")
     print(f"Max time: {config['max_time']} seconds")
-    print(f"Web interface: http://localhost:{config['http_port']}/app")
+    if headless:
+        print("Web interface: disabled (headless)")
+    else:
+        print(f"Web interface: http://localhost:{config['http_port']}/app")
     
     spade_process = None
     simfleet_process = None
+    launcher_path = None
     
     try:
         print("\nStep 1: Starting SPADE server...")
         spade_process = subprocess.Popen(
             ["spade", "run"],
             stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
+            stderr=subprocess.PIPE,
+            start_new_session=True
         )
         
         print("SPADE server started (PID: {})".format(spade_process.pid))
@@ -38,27 +143,39 @@ def run_simfleet_simulation():
         time.sleep(5)
         
         print("\nStep 2: Starting SimFleet simulation...")
+        if headless:
+            with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as launcher_file:
+                launcher_file.write(HEADLESS_LAUNCHER)
+                launcher_path = launcher_file.name
+            command = [sys.executable, launcher_path, config_file]
+        else:
+            command = ["simfleet", "--config", config_file, "--autorun"]
         simfleet_process = subprocess.Popen(
-            ["simfleet", "--config", config_file, "--autorun"],
+            command,
             stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
+            stderr=subprocess.PIPE,
+            start_new_session=True
         )
         
         print(f"SimFleet started (PID: {simfleet_process.pid})")
-        print(f"Open browser: http://localhost:{config['http_port']}/app")
+        if not headless:
+            print(f"Open browser: http://localhost:{config['http_port']}/app")
         print("Press Ctrl+C to stop simulation")
         
         simfleet_process.wait()
         
-        print("\nSimFleet simulation completed")
+        print(f"\nSimFleet simulation completed (exit code {simfleet_process.returncode})")
         
         if simfleet_process.stdout:
             stdout = simfleet_process.stdout.read().decode()
             if stdout:
                 print("SimFleet output:")
                 print(stdout)
+        if simfleet_process.returncode != 0 and simfleet_process.stderr:
+            print("SimFleet errors:")
+            print(simfleet_process.stderr.read().decode())
         
-        return True
+        return simfleet_process.returncode == 0
         
     except KeyboardInterrupt:
         print("\nStopping simulation...")
@@ -68,21 +185,10 @@ def run_simfleet_simulation():
         return False
         
     finally:
-        if simfleet_process and simfleet_process.poll() is None:
-            print("Terminating SimFleet...")
-            simfleet_process.terminate()
-            try:
-                simfleet_process.wait(timeout=5)
-            except subprocess.TimeoutExpired:
-                simfleet_process.kill()
+        shutdown_processes([simfleet_process, spade_process])
         
-        if spade_process and spade_process.poll() is None:
-            print("Terminating SPADE server...")
-            spade_process.terminate()
-            try:
-                spade_process.wait(timeout=5)
-            except subprocess.TimeoutExpired:
-                spade_process.kill()
+        if launcher_path:
+            os.unlink(launcher_path)
         
         print("Cleanup completed")
     
@@ -90,11 +196,12 @@ def run_simfleet_simulation():
 
 if __name__ == "__main__":
     try:
-        success = run_simfleet_simulation()
+        success = run_simfleet_simulation(headless="--headless" in sys.argv[1:])
         if success:
             print("Simulation completed successfully")
         else:
             print("Simulation failed")
+            sys.exit(1)
     except Exception as e:
         print(f"Fatal error: {e}")
         sys.exit(1)
\ No newline at end of file
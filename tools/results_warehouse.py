@@ -0,0 +1,360 @@
+"""Almacén local de resultados y detector de regresiones entre ejecuciones
+
+Ingiere los artifacts `results_record` (JSON con el esquema RunRecord) de los componentes
+de ping-pong, del test del servidor SPADE y de SimFleet en una base SQLite, indexados por
+componente y `config_hash`, y compara la última ejecución de cada configuración con una
+línea base móvil de las anteriores.
+
+    python tools/results_warehouse.py ingest artifacts/ --db results.sqlite
+    python tools/results_warehouse.py list --db results.sqlite
+    python tools/results_warehouse.py check --db results.sqlite --window 10 --alpha 0.01
+
+`check` termina con código 1 si detecta alguna regresión o alguna configuración cuyas
+últimas ejecuciones fallan.
+"""
+
+import argparse
+import json
+import math
+import sqlite3
+import statistics
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# Columnas del RunRecord que se guardan como columnas propias (el resto va en JSON)
+RECORD_COLUMNS = (
+    "run_id", "component", "config_hash", "schema_version", "started_at", "finished_at",
+    "success", "duration_seconds", "messages_sent", "messages_received",
+    "throughput_msgs_per_second", "latency_p50_seconds", "latency_p95_seconds",
+    "peak_rss_kb", "error"
+)
+
+# Métrica -> dirección en la que empeora (+1: subir es peor, -1: bajar es peor)
+REGRESSION_METRICS = {
+    "duration_seconds": 1,
+    "throughput_msgs_per_second": -1,
+    "latency_p50_seconds": 1,
+    "latency_p95_seconds": 1
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    component TEXT NOT NULL,
+    config_hash TEXT NOT NULL,
+    schema_version INTEGER,
+    started_at TEXT,
+    finished_at TEXT,
+    success INTEGER,
+    duration_seconds REAL,
+    messages_sent INTEGER,
+    messages_received INTEGER,
+    throughput_msgs_per_second REAL,
+    latency_p50_seconds REAL,
+    latency_p95_seconds REAL,
+    peak_rss_kb INTEGER,
+    error TEXT,
+    config TEXT,
+    metrics TEXT,
+    source_path TEXT,
+    ingested_at TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_by_config ON runs (component, config_hash, started_at);
+"""
+
+
+def connect(db_path):
+    connection = sqlite3.connect(db_path)
+    connection.row_factory = sqlite3.Row
+    connection.executescript(SCHEMA)
+    return connection
+
+
+# =================================================================
+# INGESTA
+# =================================================================
+def iter_record_files(paths):
+    """Ficheros JSON indicados directamente o encontrados recursivamente en directorios"""
+    for path in map(Path, paths):
+        if path.is_dir():
+            yield from sorted(candidate for candidate in path.rglob("*") if candidate.is_file())
+        else:
+            yield path
+
+
+def load_record(path):
+    """RunRecord de un artifact, o None si el fichero no es un registro de resultados"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            record = json.load(f)
+    except (OSError, UnicodeDecodeError, json.JSONDecodeError):
+        return None
+    if not isinstance(record, dict) or not {"run_id", "component", "config_hash"} <= record.keys():
+        return None
+    return record
+
+
+def ingest(connection, paths):
+    """Inserta los registros nuevos; los run_id ya almacenados se ignoran"""
+    counts = {"ingested": 0, "duplicates": 0, "skipped": 0}
+    now = datetime.now().isoformat()
+    for path in iter_record_files(paths):
+        record = load_record(path)
+        if record is None:
+            counts["skipped"] += 1
+            continue
+        row = [record.get(column) for column in RECORD_COLUMNS]
+        row[RECORD_COLUMNS.index("success")] = int(bool(record.get("success")))
+        cursor = connection.execute(
+            f"INSERT OR IGNORE INTO runs ({', '.join(RECORD_COLUMNS)}, config, metrics, source_path, ingested_at) "
+            f"VALUES ({', '.join('?' * (len(RECORD_COLUMNS) + 4))})",
+            row + [
+                json.dumps(record.get("config", {}), sort_keys=True, default=str),
+                json.dumps(record.get("metrics", {}), sort_keys=True),
+                str(path),
+                now
+            ]
+        )
+        counts["ingested" if cursor.rowcount else "duplicates"] += 1
+    connection.commit()
+    return counts
+
+
+# =================================================================
+# DETECCIÓN DE REGRESIONES
+# =================================================================
+def betacf(a, b, x, max_iterations=200, eps=3e-14):
+    """Fracción continua de la beta incompleta (Numerical Recipes, método de Lentz)"""
+    tiny = 1e-300
+    qab, qap, qam = a + b, a + 1.0, a - 1.0
+    c, d = 1.0, 1.0 - qab * x / qap
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    h = d
+    for m in range(1, max_iterations + 1):
+        m2 = 2 * m
+        for aa in (m * (b - m) * x / ((qam + m2) * (a + m2)), -(a + m) * (qab + m) * x / ((a + m2) * (qap + m2))):
+            d = 1.0 + aa * d
+            d = 1.0 / (d if abs(d) > tiny else tiny)
+            c = 1.0 + aa / c
+            c = c if abs(c) > tiny else tiny
+            h *= d * c
+        if abs(d * c - 1.0) < eps:
+            break
+    return h
+
+
+def regularized_beta(a, b, x):
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+    log_front = math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log1p(-x)
+    if x < (a + 1.0) / (a + b + 2.0):
+        return math.exp(log_front) * betacf(a, b, x) / a
+    return 1.0 - math.exp(log_front) * betacf(b, a, 1.0 - x) / b
+
+
+def t_survival(t, df):
+    """P(T > t) para una t de Student con `df` grados de libertad"""
+    tail = 0.5 * regularized_beta(df / 2.0, 0.5, df / (df + t * t))
+    return tail if t > 0 else 1.0 - tail
+
+
+def compare(baseline, candidates, direction):
+    """Test t unilateral de los candidatos frente a la línea base, en la dirección que empeora
+
+    Con un solo candidato se usa el intervalo de predicción de la línea base; con varios,
+    el test de Welch.
+    """
+    n_b, n_c = len(baseline), len(candidates)
+    mean_b, mean_c = statistics.fmean(baseline), statistics.fmean(candidates)
+    var_b = statistics.variance(baseline)
+    if n_c == 1:
+        se = math.sqrt(var_b * (1 + 1 / n_b))
+        df = n_b - 1
+    else:
+        var_c = statistics.variance(candidates)
+        se = math.sqrt(var_b / n_b + var_c / n_c)
+        denominator = (var_b / n_b) ** 2 / (n_b - 1) + (var_c / n_c) ** 2 / (n_c - 1)
+        df = (var_b / n_b + var_c / n_c) ** 2 / denominator if denominator else n_b + n_c - 2
+
+    worse_by = (mean_c - mean_b) * direction
+    if se == 0:
+        # Línea base sin varianza: cualquier empeoramiento es significativo
+        p_value = 0.0 if worse_by > 0 else 1.0
+    else:
+        p_value = t_survival(worse_by / se, df)
+    return {
+        "baseline_mean": mean_b,
+        "baseline_stdev": math.sqrt(var_b),
+        "candidate_mean": mean_c,
+        "relative_change": (mean_c - mean_b) / abs(mean_b) if mean_b else math.inf,
+        "p_value": p_value
+    }
+
+
+def find_regressions(connection, window=10, recent=1, min_baseline=3, alpha=0.01,
+                     min_change=0.05, component=None, config_hash=None):
+    """Compara las `recent` últimas ejecuciones correctas de cada configuración con las
+    `window` anteriores
+
+    Si entre las `recent` ejecuciones más nuevas hay fallos posteriores a la última
+    correcta, la configuración se marca como `failing` sin comparar métricas.
+    """
+    # También las configuraciones sin ninguna ejecución correcta: son las que más fallan
+    conditions, filters = [], []
+    if component:
+        conditions.append("component = ?")
+        filters.append(component)
+    if config_hash:
+        conditions.append("config_hash = ?")
+        filters.append(config_hash)
+    query = "SELECT DISTINCT component, config_hash FROM runs"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+
+    report = []
+    for group in connection.execute(query + " ORDER BY component, config_hash", filters).fetchall():
+        latest = connection.execute(
+            "SELECT run_id, started_at, success, error FROM runs WHERE component = ? AND config_hash = ? "
+            "ORDER BY started_at DESC LIMIT ?",
+            (group["component"], group["config_hash"], recent)
+        ).fetchall()
+        last_success = connection.execute(
+            "SELECT MAX(started_at) FROM runs WHERE success = 1 AND component = ? AND config_hash = ?",
+            (group["component"], group["config_hash"])
+        ).fetchone()[0]
+        failing = [
+            run for run in latest
+            if not run["success"] and (last_success is None or run["started_at"] > last_success)
+        ]
+        if failing:
+            report.append({
+                "component": group["component"],
+                "config_hash": group["config_hash"],
+                "candidate_runs": [run["run_id"] for run in failing],
+                "baseline_runs": 0,
+                "last_success": last_success,
+                "error": failing[0]["error"],
+                "metrics": {},
+                "status": "failing"
+            })
+            continue
+
+        runs = connection.execute(
+            "SELECT * FROM runs WHERE success = 1 AND component = ? AND config_hash = ? "
+            "ORDER BY started_at DESC LIMIT ?",
+            (group["component"], group["config_hash"], window + recent)
+        ).fetchall()
+        candidates, baseline = runs[:recent], runs[recent:]
+        entry = {
+            "component": group["component"],
+            "config_hash": group["config_hash"],
+            "candidate_runs": [run["run_id"] for run in candidates],
+            "baseline_runs": len(baseline),
+            "metrics": {}
+        }
+        if len(baseline) < max(min_baseline, 2):
+            entry["status"] = "insufficient_baseline"
+            report.append(entry)
+            continue
+
+        for metric, direction in REGRESSION_METRICS.items():
+            baseline_values = [run[metric] for run in baseline if run[metric] is not None]
+            candidate_values = [run[metric] for run in candidates if run[metric] is not None]
+            if len(baseline_values) < max(min_baseline, 2) or not candidate_values:
+                continue
+            result = compare(baseline_values, candidate_values, direction)
+            result["regression"] = (
+                result["p_value"] < alpha and result["relative_change"] * direction >= min_change
+            )
+            entry["metrics"][metric] = result
+        entry["status"] = "regression" if any(
+            result["regression"] for result in entry["metrics"].values()
+        ) else "ok"
+        report.append(entry)
+    return report
+
+
+# =================================================================
+# CLI
+# =================================================================
+def command_ingest(connection, args):
+    counts = ingest(connection, args.paths)
+    print(f"Ingested {counts['ingested']} records ({counts['duplicates']} duplicates, "
+          f"{counts['skipped']} files without a RunRecord)")
+    return 0
+
+
+def command_list(connection, args):
+    rows = connection.execute(
+        "SELECT component, config_hash, COUNT(*) AS runs, SUM(success) AS successful, "
+        "MIN(started_at) AS first_run, MAX(started_at) AS last_run "
+        "FROM runs GROUP BY component, config_hash ORDER BY component, last_run DESC"
+    ).fetchall()
+    if not rows:
+        print("No runs stored")
+        return 0
+    for row in rows:
+        print(f"{row['component']:<32} {row['config_hash']}  runs {row['runs']:>4} "
+              f"(ok {row['successful']:>4})  {row['first_run']} .. {row['last_run']}")
+    return 0
+
+
+def command_check(connection, args):
+    report = find_regressions(
+        connection, window=args.window, recent=args.recent, min_baseline=args.min_baseline,
+        alpha=args.alpha, min_change=args.min_change, component=args.component,
+        config_hash=args.config_hash
+    )
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for entry in report:
+            if entry["status"] == "failing":
+                since = f"since the last success at {entry['last_success']}" if entry["last_success"] else "and no success ever"
+                print(f"[FAILING] {entry['component']} {entry['config_hash']} "
+                      f"({len(entry['candidate_runs'])} failed runs {since})")
+                print(f"  !! {entry['error']}")
+                continue
+            print(f"[{entry['status'].upper()}] {entry['component']} {entry['config_hash']} "
+                  f"({len(entry['candidate_runs'])} vs baseline of {entry['baseline_runs']})")
+            for metric, result in entry["metrics"].items():
+                marker = "!!" if result["regression"] else "  "
+                print(f"  {marker} {metric:<28} {result['baseline_mean']:.6g} ± {result['baseline_stdev']:.3g} "
+                      f"-> {result['candidate_mean']:.6g} ({result['relative_change']:+.1%}, "
+                      f"p={result['p_value']:.2g})")
+    return 1 if any(entry["status"] in ("regression", "failing") for entry in report) else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Almacén de resultados de los pipelines y detector de regresiones")
+    parser.add_argument("--db", default="results.sqlite", help="Base SQLite (default: results.sqlite)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = subparsers.add_parser("ingest", help="Ingiere artifacts results_record (ficheros o directorios)")
+    ingest_parser.add_argument("paths", nargs="+")
+    ingest_parser.set_defaults(handler=command_ingest)
+
+    list_parser = subparsers.add_parser("list", help="Ejecuciones almacenadas por componente y config_hash")
+    list_parser.set_defaults(handler=command_list)
+
+    check_parser = subparsers.add_parser("check", help="Detecta regresiones frente a la línea base móvil")
+    check_parser.add_argument("--window", type=int, default=10, help="Ejecuciones de la línea base (default: 10)")
+    check_parser.add_argument("--recent", type=int, default=1, help="Últimas ejecuciones a evaluar (default: 1)")
+    check_parser.add_argument("--min-baseline", type=int, default=3, help="Mínimo de ejecuciones en la línea base (default: 3)")
+    check_parser.add_argument("--alpha", type=float, default=0.01, help="Nivel de significación unilateral (default: 0.01)")
+    check_parser.add_argument("--min-change", type=float, default=0.05, help="Cambio relativo mínimo a reportar (default: 0.05)")
+    check_parser.add_argument("--component")
+    check_parser.add_argument("--config-hash")
+    check_parser.add_argument("--json", action="store_true", help="Salida en JSON")
+    check_parser.set_defaults(handler=command_check)
+
+    args = parser.parse_args(argv)
+    with connect(args.db) as connection:
+        return args.handler(connection, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())